@@ -10,7 +10,7 @@ class PermitsConfig(AppConfig):
         Initialize app when Django starts.
         Only import signals here to avoid circular imports.
         """
-        try:
-            import permits.signals  # type: ignore # noqa: F401
-        except ImportError:
-            pass
+        import permits.signals  # noqa: F401
+        from utils.reference_cache import connect_invalidation
+
+        connect_invalidation(self.label)
@@ -0,0 +1,223 @@
+"""
+Async-native versions of the hottest permit read endpoints.
+
+Under daphne a sync DRF view occupies a thread for the whole request. These views
+run on the event loop and reach the database only through the async ORM, so slow
+clients do not pin worker threads. Responses match their sync counterparts in
+PermitApplicationViewSet.
+"""
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Q
+
+from users.authentication import get_principal
+from utils.async_views import api_response, apaginate, async_api_view
+from utils.db_routing import reads_from_replica
+from .dashboard import broadcast_bulk_status_change
+from .filters import PermitApplicationFilter
+from .grades import aweighted_totals, grade_registry
+from .models import CoffeeQuantity, PermitApplication
+from .serializers import PermitApplicationSerializer
+from .throttling import (
+    AnonRateThrottle,
+    FarmerRateThrottle,
+    SocietyManagerRateThrottle,
+    StaffRateThrottle,
+)
+from .views import PermitApplicationViewSet, filter_my_permits, scope_permits
+
+
+def permit_throttles(request):
+    principal = get_principal(request)
+    if principal.is_staff:
+        return [StaffRateThrottle()]
+    elif principal.is_society_manager:
+        return [SocietyManagerRateThrottle()]
+    return [FarmerRateThrottle()]
+
+
+def analytics_throttles(request):
+    return [AnonRateThrottle(), StaffRateThrottle()]
+
+
+async def visible_permits(request):
+    """Async PermitApplicationViewSet.get_queryset: expire overdue permits, then scope by role."""
+    expired = await PermitApplication.aexpire_overdue()
+    if expired:
+        await sync_to_async(broadcast_bulk_status_change)(expired, "APPROVED", "EXPIRED")
+
+    return scope_permits(PermitApplicationViewSet.queryset.all(), get_principal(request))
+
+
+async def filter_permits(request, queryset):
+    """Apply PermitApplicationFilter; returns (queryset, errors)."""
+    if not request.GET:
+        return queryset, None
+    filterset = PermitApplicationFilter(request.GET, queryset=queryset, request=request)
+    # Validating society/factory/warehouse looks the objects up with the sync ORM
+    if not await sync_to_async(filterset.is_valid)():
+        return None, filterset.errors
+    return filterset.qs, None
+
+
+def serialize_permits(request):
+    async def serialize(permits):
+        # total_weight reads the grade registry; load every grade the page refers to first
+        await grade_registry.aensure(
+            quantity.coffee_grade_id for permit in permits for quantity in permit.coffee_quantities.all()
+        )
+        return PermitApplicationSerializer(permits, many=True, context={"request": request}).data
+    return serialize
+
+
+@async_api_view(throttles=permit_throttles)
+async def permit_list(request):
+    queryset, errors = await filter_permits(request, await visible_permits(request))
+    if errors:
+        return api_response(errors, status=400)
+    page = await apaginate(request, queryset, serialize_permits(request))
+    if page is None:
+        return api_response({"detail": "Invalid page."}, status=404)
+    return api_response(page)
+
+
+@async_api_view(throttles=permit_throttles)
+async def permit_detail(request, pk):
+    queryset = await visible_permits(request)
+    permits = [permit async for permit in queryset.filter(pk=pk)]
+    if not permits:
+        return api_response({"detail": "No PermitApplication matches the given query."}, status=404)
+    return api_response((await serialize_permits(request)(permits))[0])
+
+
+@async_api_view(throttles=permit_throttles)
+async def my_permits(request):
+    queryset = PermitApplicationViewSet.queryset.all()
+    principal = get_principal(request)
+    if principal.is_society_manager:
+        queryset = queryset.filter(society_id=principal.managed_society_id)
+    else:
+        queryset = queryset.filter(farmer=request.user)
+    queryset = filter_my_permits(queryset, request.GET).order_by("-application_date")
+    permits = [permit async for permit in queryset]
+    return api_response(await serialize_permits(request)(permits))
+
+
+@async_api_view(throttles=permit_throttles)
+@reads_from_replica
+async def society_metrics(request):
+    principal = get_principal(request)
+    if not principal.is_society_manager:
+        return api_response({"error": "Only society managers can access these metrics"}, status=403)
+    counts = await PermitApplication.objects.filter(society_id=principal.managed_society_id).aaggregate(
+        total_permits=Count("id"),
+        active_permits=Count("id", filter=Q(status="APPROVED")),
+        pending_permits=Count("id", filter=Q(status="PENDING")),
+        expired_permits=Count("id", filter=Q(status="EXPIRED")),
+    )
+    return api_response(counts)
+
+
+@async_api_view(throttles=permit_throttles)
+@reads_from_replica
+async def staff_metrics(request):
+    if not request.user.is_staff:
+        return api_response({"error": "Only staff members can access these metrics"}, status=403)
+    counts = await (await visible_permits(request)).aaggregate(
+        total_permits=Count("id"),
+        active_permits=Count("id", filter=Q(status="APPROVED")),
+        pending_permits=Count("id", filter=Q(status="PENDING")),
+        expired_permits=Count("id", filter=Q(status="EXPIRED")),
+        rejected_permits=Count("id", filter=Q(status="REJECTED")),
+    )
+    return api_response(counts)
+
+
+async def analytics_permits(request, approved_only=True):
+    """Permits the top-* analytics aggregate over, with the shared date filters applied."""
+    permits, errors = await filter_permits(request, await visible_permits(request))
+    if errors:
+        return None, errors
+    if approved_only:
+        permits = permits.filter(status="APPROVED")
+    start_date = request.GET.get("start_date")
+    end_date = request.GET.get("end_date")
+    if start_date:
+        permits = permits.filter(application_date__date__gte=start_date)
+    if end_date:
+        permits = permits.filter(application_date__date__lte=end_date)
+    return permits, None
+
+
+async def grade_filtered_quantities(request, permits):
+    quantities = CoffeeQuantity.objects.filter(application__in=permits)
+    exclude_grades = request.GET.get("exclude_grades")
+    if exclude_grades:
+        await grade_registry.aall()
+        quantities = quantities.exclude(coffee_grade_id__in=grade_registry.ids_for(exclude_grades.split(",")))
+    return quantities
+
+
+async def paginated_rows(request, rows):
+    page = await apaginate(request, rows, list)
+    if page is None:
+        return api_response({"detail": "Invalid page."}, status=404)
+    return api_response(page)
+
+
+@async_api_view(throttles=analytics_throttles)
+@reads_from_replica
+async def top_societies(request):
+    permits, errors = await analytics_permits(request)
+    if errors:
+        return api_response(errors, status=400)
+    grouped = await aweighted_totals(
+        CoffeeQuantity.objects.filter(application__in=permits),
+        ["application__society__id", "application__society__name"],
+    )
+    return await paginated_rows(request, [
+        {
+            "society_id": row["application__society__id"],
+            "society": row["application__society__name"],
+            "totalKg": row["total_kg"] or 0,
+        }
+        for row in grouped
+    ])
+
+
+@async_api_view(throttles=analytics_throttles)
+@reads_from_replica
+async def top_grades(request):
+    permits, errors = await analytics_permits(request)
+    if errors:
+        return api_response(errors, status=400)
+    grouped = await aweighted_totals(await grade_filtered_quantities(request, permits), ["grade"])
+    return await paginated_rows(request, [
+        {"grade": row["grade"], "totalKg": row["total_kg"] or 0}
+        for row in grouped
+    ])
+
+
+@async_api_view(throttles=analytics_throttles)
+@reads_from_replica
+async def top_factories(request):
+    permits, errors = await analytics_permits(request, approved_only=False)
+    if errors:
+        return api_response(errors, status=400)
+    society = request.GET.get("society")
+    warehouse = request.GET.get("warehouse")
+    if society:
+        permits = permits.filter(society_id=society)
+    if warehouse:
+        permits = permits.filter(warehouse_id=warehouse)
+    grouped = await aweighted_totals(
+        await grade_filtered_quantities(request, permits),
+        ["application__factory__id", "application__factory__name"],
+    )
+    return await paginated_rows(request, [
+        {
+            "factory_id": row["application__factory__id"],
+            "factory": row["application__factory__name"],
+            "totalKg": row["total_kg"] or 0,
+        }
+        for row in grouped
+    ])
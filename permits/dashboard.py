@@ -0,0 +1,188 @@
+"""
+Live dashboard metrics pushed over websockets.
+
+A snapshot is computed once when a dashboard socket connects; afterwards every
+permit status change is turned into a small delta that is published once to the
+staff dashboard group and once to the owning society's group.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .grades import weighted_totals
+from .models import CoffeeQuantity, PermitApplication
+
+logger = logging.getLogger(__name__)
+
+STAFF_DASHBOARD_GROUP = "dashboard_staff"
+
+# Permit status -> metric key, matching the keys returned by staff_metrics / society_metrics
+STATUS_METRICS = {
+    "APPROVED": "active_permits",
+    "PENDING": "pending_permits",
+    "EXPIRED": "expired_permits",
+    "REJECTED": "rejected_permits",
+}
+
+
+def society_dashboard_group(society_id):
+    return f"dashboard_society_{society_id}"
+
+
+def metrics_snapshot(society_id=None):
+    """Status counts and kg approved today, in two aggregate queries."""
+    permits = PermitApplication.objects.all()
+    if society_id is not None:
+        permits = permits.filter(society_id=society_id)
+
+    counts = permits.aggregate(
+        total_permits=Count("id"),
+        **{
+            key: Count("id", filter=Q(status=status))
+            for status, key in STATUS_METRICS.items()
+        },
+    )
+    today = timezone.localdate()
+    approved_kg = sum(
+        row["total_kg"]
+        for row in weighted_totals(
+            CoffeeQuantity.objects.filter(
+                application__in=permits.filter(status="APPROVED", approved_at__date=today)
+            ),
+            [],
+        )
+    )
+
+    return {**counts, "approved_kg_today": approved_kg, "date": today.isoformat()}
+
+
+def status_delta(previous_status, new_status):
+    """Metric deltas for a permit moving from previous_status (None if new) to new_status."""
+    delta = {}
+    if previous_status is None:
+        delta["total_permits"] = 1
+    elif previous_status in STATUS_METRICS:
+        delta[STATUS_METRICS[previous_status]] = -1
+    if new_status in STATUS_METRICS:
+        key = STATUS_METRICS[new_status]
+        delta[key] = delta.get(key, 0) + 1
+    return delta
+
+
+def broadcast_permit_change(permit, previous_status):
+    """Publish the metric delta for one permit state change to the dashboard groups."""
+    if previous_status == permit.status:
+        return
+    delta = status_delta(previous_status, permit.status)
+    today = timezone.localdate()
+    if (
+        "APPROVED" in (previous_status, permit.status)
+        and permit.approved_at
+        and timezone.localdate(permit.approved_at) == today
+    ):
+        # Weight only matters (and is only queried) on transitions into or out of APPROVED;
+        # a permit approved today and then cancelled or expired no longer counts
+        weight = permit.total_weight
+        delta["approved_kg_today"] = weight if permit.status == "APPROVED" else -weight
+    if not delta:
+        return
+
+    message = {
+        "type": "dashboard_delta",
+        "content": {
+            "event": "PERMIT_STATUS_CHANGED",
+            "permit_id": permit.id,
+            "society_id": permit.society_id,
+            "previous_status": previous_status,
+            "status": permit.status,
+            "delta": delta,
+            "date": today.isoformat(),
+        },
+    }
+    society_id = permit.society_id
+    # Only publish changes that actually committed
+    transaction.on_commit(lambda: _publish(message, society_id))
+
+
+def broadcast_bulk_status_change(permits, previous_status, new_status):
+    """
+    Publish one aggregated delta per group for permits changed with a queryset UPDATE.
+    permits is a list of (id, society_id) pairs.
+    """
+    if not permits or previous_status == new_status:
+        return
+    by_society = {}
+    for permit_id, society_id in permits:
+        by_society.setdefault(society_id, []).append(permit_id)
+
+    today = timezone.localdate()
+    # Permits approved today that leave APPROVED take their weight off approved_kg_today
+    approved_kg = {}
+    if previous_status == "APPROVED":
+        approved_kg = {
+            row["application__society_id"]: row["total_kg"]
+            for row in weighted_totals(
+                CoffeeQuantity.objects.filter(
+                    application_id__in=[permit_id for permit_id, _ in permits],
+                    application__approved_at__date=today,
+                ),
+                ["application__society_id"],
+            )
+        }
+
+    def scaled_delta(count, society_ids):
+        delta = {key: value * count for key, value in status_delta(previous_status, new_status).items()}
+        kg = sum(approved_kg.get(society_id, 0) for society_id in society_ids)
+        if kg:
+            delta["approved_kg_today"] = -kg
+        return delta
+
+    today = today.isoformat()
+
+    def message(permit_ids, society_id=None):
+        return {
+            "type": "dashboard_delta",
+            "content": {
+                "event": "PERMITS_STATUS_CHANGED",
+                "permit_ids": permit_ids,
+                "society_id": society_id,
+                "previous_status": previous_status,
+                "status": new_status,
+                "delta": scaled_delta(len(permit_ids), by_society if society_id is None else [society_id]),
+                "date": today,
+            },
+        }
+
+    def publish():
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        try:
+            async_to_sync(channel_layer.group_send)(
+                STAFF_DASHBOARD_GROUP, message([permit_id for permit_id, _ in permits])
+            )
+            for society_id, permit_ids in by_society.items():
+                async_to_sync(channel_layer.group_send)(
+                    society_dashboard_group(society_id), message(permit_ids, society_id)
+                )
+        except Exception as e:
+            # The change has committed; a channel-layer outage must not fail the request
+            logger.error(f"Dashboard delta publish failed: {str(e)}")
+
+    transaction.on_commit(publish)
+
+
+def _publish(message, society_id):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(STAFF_DASHBOARD_GROUP, message)
+        async_to_sync(channel_layer.group_send)(society_dashboard_group(society_id), message)
+    except Exception as e:
+        # The change has committed; a channel-layer outage must not fail the request
+        logger.error(f"Dashboard delta publish failed: {str(e)}")
@@ -0,0 +1,158 @@
+"""
+Bulk permit export for reconciliation: one row per coffee quantity, with the permit's
+details repeated on each row.
+
+Permits are read in keyset chunks (``id > last id``) as ``values_list`` tuples, so the
+cost of each chunk stays flat however deep into the table the export is and no model
+instances or serializers are involved. Grade names and weights come from the grade
+registry instead of a join. The encoders are lazy sync generators; the view streams them
+with utils.exports.streaming_response(), one sync_to_async step per piece under ASGI.
+"""
+from collections import defaultdict
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from utils.exports import csv_chunks
+
+from .grades import grade_registry
+from .models import CoffeeQuantity
+
+# (column, permit lookup) for the permit part of each row
+PERMIT_COLUMNS = [
+    ("permit_id", "id"),
+    ("ref_no", "ref_no"),
+    ("status", "status"),
+    ("application_date", "application_date"),
+    ("delivery_start", "delivery_start"),
+    ("delivery_end", "delivery_end"),
+    ("approved_at", "approved_at"),
+    ("farmer_email", "farmer__email"),
+    ("farmer_first_name", "farmer__first_name"),
+    ("farmer_last_name", "farmer__last_name"),
+    ("society", "society__name"),
+    ("factory", "factory__name"),
+    ("warehouse", "warehouse__name"),
+]
+QUANTITY_COLUMNS = ["grade", "bags", "weight_per_bag_kg", "total_kg"]
+COLUMNS = [column for column, _ in PERMIT_COLUMNS] + QUANTITY_COLUMNS
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def iter_permit_chunks(permits, chunk_size):
+    """
+    Yield lists of export rows (tuples in COLUMNS order) for the ``permits`` queryset.
+    Each chunk costs two queries: up to ``chunk_size`` permits, then their quantities.
+    Permits without quantities still get one row with empty quantity columns.
+    """
+    permits = permits.select_related(None).prefetch_related(None).order_by("id")
+    lookups = [lookup for _, lookup in PERMIT_COLUMNS]
+    last_id = 0
+    while True:
+        chunk = list(permits.filter(id__gt=last_id).values_list(*lookups)[:chunk_size])
+        if not chunk:
+            return
+        last_id = chunk[-1][0]
+
+        quantities = defaultdict(list)
+        for application_id, grade_id, bags in (
+            CoffeeQuantity.objects.using(permits.db).filter(application_id__in=[row[0] for row in chunk])
+            .order_by("application_id", "id")
+            .values_list("application_id", "coffee_grade_id", "bags_quantity")
+        ):
+            quantities[application_id].append((grade_id, bags))
+
+        rows = []
+        for permit in chunk:
+            for grade_id, bags in quantities[permit[0]] or [(None, None)]:
+                info = grade_registry.get(grade_id) if grade_id is not None else None
+                if info is None:
+                    rows.append(permit + (None, bags, None, None))
+                else:
+                    rows.append(permit + (info.grade, bags, info.weight_per_bag, bags * info.weight_per_bag))
+        yield rows
+
+
+def ndjson_chunks(chunks):
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+    for rows in chunks:
+        yield "".join(encoder.encode(dict(zip(COLUMNS, row))) + "\n" for row in rows)
+
+
+class _ChunkSink:
+    """Write-only file object that hands back what was written since the last take()."""
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    text = pa.string()
+    timestamp = pa.timestamp("us", tz="UTC")
+    return pa.schema([
+        ("permit_id", pa.int64()), ("ref_no", text), ("status", text),
+        ("application_date", timestamp), ("delivery_start", pa.date32()), ("delivery_end", pa.date32()),
+        ("approved_at", timestamp), ("farmer_email", text), ("farmer_first_name", text),
+        ("farmer_last_name", text), ("society", text), ("factory", text), ("warehouse", text),
+        ("grade", text), ("bags", pa.int64()), ("weight_per_bag_kg", pa.float64()), ("total_kg", pa.float64()),
+    ])
+
+
+def parquet_chunks(chunks):
+    """One Parquet row group per chunk, streamed as it is written. Requires pyarrow."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def encode_chunks(fmt, chunks):
+    """Encode row chunks from iter_permit_chunks() as ``fmt``: str pieces for csv/ndjson, bytes for parquet."""
+    if fmt == "csv":
+        return csv_chunks(COLUMNS, chunks)
+    elif fmt == "ndjson":
+        return ndjson_chunks(chunks)
+    return parquet_chunks(chunks)
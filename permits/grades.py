@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import namedtuple
+
+import pandas as pd
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import SynchronousOnlyOperation
+from django.db.models import Sum
+
+from utils.reference_cache import get_versions
+
+logger = logging.getLogger(__name__)
+
+GradeInfo = namedtuple("GradeInfo", ["grade", "weight_per_bag"])
+
+
+def _in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _current_version():
+    try:
+        return get_versions(["grades"])[0]
+    except Exception as e:
+        # Without the shared version, rely on local invalidation until the cache is back
+        logger.error(f"Could not read the grades version: {str(e)}")
+        return None
+
+
+class GradeRegistry:
+    """
+    Process-local copy of the CoffeeGrade table: id -> GradeInfo(grade, weight_per_bag).
+
+    The table is a handful of rows that almost never change, so weight math looks the
+    weight up here instead of joining or dereferencing CoffeeGrade. The copy is reloaded
+    when this process saves a grade, when the shared "grades" reference-data version
+    changes (checked at most every GRADE_REGISTRY_CHECK_INTERVAL seconds), or when an
+    unknown grade id is requested.
+
+    Async code awaits aall() or aensure() first. The sync lookups then only read the
+    loaded copy when called from the event loop, and never query the database or cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._grades = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def invalidate(self):
+        self._grades = None
+
+    def _rows(self):
+        from .models import CoffeeGrade
+        return CoffeeGrade.objects.order_by("id").values_list("id", "grade", "weight_per_bag")
+
+    def _store(self, version, rows):
+        grades = {
+            grade_id: GradeInfo(grade, float(weight_per_bag)) for grade_id, grade, weight_per_bag in rows
+        }
+        with self._lock:
+            self._grades, self._version, self._checked_at = grades, version, time.monotonic()
+        return grades
+
+    def reload(self):
+        return self._store(_current_version(), list(self._rows()))
+
+    async def areload(self):
+        version = await sync_to_async(_current_version, thread_sensitive=False)()
+        return self._store(version, [row async for row in self._rows()])
+
+    def _is_stale(self, version_of):
+        if self._grades is None:
+            return True
+        if time.monotonic() - self._checked_at >= getattr(settings, "GRADE_REGISTRY_CHECK_INTERVAL", 5):
+            version = version_of()
+            if version is not None and version != self._version:
+                return True
+            self._checked_at = time.monotonic()
+        return False
+
+    def all(self):
+        if _in_event_loop():
+            if self._grades is None:
+                raise SynchronousOnlyOperation("Await grade_registry.aall() before using it from async code.")
+            return self._grades
+        if self._is_stale(_current_version):
+            return self.reload()
+        return self._grades
+
+    async def aall(self):
+        """all() for async code; call it before sync helpers so they never reload from the event loop."""
+        if self._grades is None:
+            return await self.areload()
+        version = None
+        if time.monotonic() - self._checked_at >= getattr(settings, "GRADE_REGISTRY_CHECK_INTERVAL", 5):
+            version = await sync_to_async(_current_version, thread_sensitive=False)()
+        if self._is_stale(lambda: version):
+            return await self.areload()
+        return self._grades
+
+    async def aensure(self, grade_ids):
+        """aall(), reloading when any of ``grade_ids`` is unknown (e.g. created by another process)."""
+        grades = await self.aall()
+        if any(grade_id not in grades for grade_id in grade_ids):
+            grades = await self.areload()
+        return grades
+
+    def get(self, grade_id):
+        info = self.all().get(grade_id)
+        if info is None and not _in_event_loop():
+            info = self.reload().get(grade_id)
+        return info
+
+    def weight(self, grade_id):
+        info = self.get(grade_id)
+        return info.weight_per_bag if info else 0.0
+
+    def names(self):
+        return [info.grade for info in self.all().values()]
+
+    def ids_for(self, names):
+        names = set(names)
+        return [grade_id for grade_id, info in self.all().items() if info.grade in names]
+
+
+grade_registry = GradeRegistry()
+
+
+def weighted_totals(quantities, fields, total="total_kg"):
+    """
+    Total kilograms of a CoffeeQuantity queryset grouped by ``fields``.
+
+    The database only sums bags per (fields, grade id), so the aggregate reads the
+    quantity table without joining CoffeeGrade. Bags are converted to kilograms in one
+    vectorised step using the grade registry. Rows come back as dicts with ``fields`` and
+    ``total``, heaviest first; a "grade" field may be requested to get the grade name.
+    """
+    rows = list(_bags_by_grade(quantities, fields))
+    grades = grade_registry.all()
+    if any(row["coffee_grade_id"] not in grades for row in rows):
+        grades = grade_registry.reload()
+    return _weigh(rows, grades, fields, total)
+
+
+async def aweighted_totals(quantities, fields, total="total_kg"):
+    """weighted_totals() using the async ORM."""
+    rows = [row async for row in _bags_by_grade(quantities, fields)]
+    grades = await grade_registry.aensure(row["coffee_grade_id"] for row in rows)
+    return _weigh(rows, grades, fields, total)
+
+
+def _bags_by_grade(quantities, fields):
+    db_fields = [field for field in fields if field != "grade"]
+    return quantities.values(*db_fields, "coffee_grade_id").annotate(bags=Sum("bags_quantity")).order_by()
+
+
+def _weigh(rows, grades, fields, total):
+    if not rows:
+        return []
+    frame = pd.DataFrame.from_records(rows)
+    frame[total] = frame["bags"] * frame["coffee_grade_id"].map(
+        {grade_id: info.weight_per_bag for grade_id, info in grades.items()}
+    ).fillna(0.0)
+    if not fields:
+        return [{total: float(frame[total].sum())}]
+    if "grade" in fields:
+        frame["grade"] = frame["coffee_grade_id"].map({grade_id: info.grade for grade_id, info in grades.items()})
+    grouped = frame.groupby(list(fields), dropna=False, sort=False)[total].sum().reset_index()
+    return grouped.sort_values(total, ascending=False, kind="stable").to_dict("records")
@@ -0,0 +1,224 @@
+"""
+Bulk permit import for society managers submitting many applications at once.
+
+Applications come from a CSV file (one line per coffee quantity, grouped by the
+``application`` column) or a JSON list shaped like PermitApplicationCreateSerializer
+input. Factories, warehouses and grades are validated against maps loaded once per
+import, valid applications are inserted with bulk_create in batches, and admins get a
+single summary notification. Invalid applications are reported per row and skipped.
+"""
+import csv
+import io
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.db import transaction
+
+from societies.models import Factory, Society
+from users.utils import notify_admins_later
+from utils.metrics import PERMITS_CREATED
+from warehouse.models import Warehouse
+from .dashboard import broadcast_bulk_status_change
+from .grades import grade_registry
+from .models import CoffeeQuantity, PermitApplication
+
+CSV_COLUMNS = ["application", "factory", "warehouse", "grade", "bags_quantity"]
+
+ImportResult = namedtuple("ImportResult", ["permit_ids", "errors"])
+
+
+class PermitImportError(Exception):
+    """The upload as a whole cannot be imported (unreadable file, not a society manager, ...)."""
+
+
+def parse_csv(text):
+    """Group CSV lines into applications, keyed by the ``application`` column."""
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [column for column in CSV_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise PermitImportError(f"CSV is missing columns: {', '.join(missing)}")
+
+    applications = {}
+    for line, row in enumerate(reader, start=2):
+        key = (row["application"] or "").strip() or f"line {line}"
+        application = applications.setdefault(key, {
+            "row": key,
+            "factory": row["factory"],
+            "warehouse": row["warehouse"],
+            "coffee_quantities": [],
+        })
+        application["coffee_quantities"].append({"grade": row["grade"], "bags_quantity": row["bags_quantity"]})
+    return list(applications.values())
+
+
+def parse_json(data):
+    """Accept a list (or ``{"applications": [...]}``) of create-serializer style objects."""
+    if isinstance(data, dict):
+        data = data.get("applications")
+    if not isinstance(data, list):
+        raise PermitImportError("Expected a list of applications")
+
+    applications = []
+    for index, item in enumerate(data, start=1):
+        if not isinstance(item, dict):
+            applications.append({"row": index, "invalid": "Each application must be an object"})
+            continue
+        quantities = item.get("coffee_quantities")
+        if quantities is None:
+            quantities = []
+        if not isinstance(quantities, list):
+            applications.append({"row": item.get("reference", index), "invalid": "coffee_quantities must be a list"})
+            continue
+        if not all(isinstance(quantity, dict) for quantity in quantities):
+            applications.append({"row": item.get("reference", index), "invalid": "Each coffee quantity must be an object"})
+            continue
+        applications.append({
+            "row": item.get("reference", index),
+            "society": item.get("society_id"),
+            "factory": item.get("factory_id", item.get("factory")),
+            "warehouse": item.get("warehouse_id", item.get("warehouse")),
+            "coffee_quantities": [
+                {
+                    "grade": quantity.get("coffee_grade_id", quantity.get("grade")),
+                    "bags_quantity": quantity.get("bags_quantity"),
+                }
+                for quantity in quantities
+            ],
+        })
+    return applications
+
+
+def _lookup(by_id, by_name, value, label, not_found=None):
+    """Resolve an id or a (case-insensitive) name; returns (object, error)."""
+    value = "" if value is None else str(value).strip()
+    if not value:
+        return None, f"{label} is required"
+    if value.isdigit() and int(value) in by_id:
+        return by_id[int(value)], None
+    matches = by_name.get(value.lower(), [])
+    if len(matches) == 1:
+        return matches[0], None
+    if matches:
+        return None, f"{label} name '{value}' is ambiguous, use its id"
+    return None, not_found or f"{label} '{value}' not found"
+
+
+def _by_name(objects, name):
+    index = defaultdict(list)
+    for obj in objects:
+        index[name(obj).lower()].append(obj)
+    return index
+
+
+class PermitImporter:
+    """Validates and inserts applications for the society ``user`` manages."""
+
+    def __init__(self, user, batch_size=None):
+        try:
+            self.society = Society.objects.get(manager=user)
+        except Society.DoesNotExist:
+            raise PermitImportError("Only society managers can apply for permits")
+        self.batch_size = batch_size or getattr(settings, "PERMIT_IMPORT_BATCH_SIZE", 500)
+
+        factories = list(Factory.objects.filter(society=self.society))
+        self.factories = {factory.id: factory for factory in factories}
+        self.factories_by_name = _by_name(factories, lambda factory: factory.name)
+        warehouses = list(Warehouse.objects.all())
+        self.warehouses = {warehouse.id: warehouse for warehouse in warehouses}
+        self.warehouses_by_name = _by_name(warehouses, lambda warehouse: warehouse.name)
+        self.grades = dict(grade_registry.all())
+        self.grade_ids = {grade_id: grade_id for grade_id in self.grades}
+        self.grades_by_name = _by_name(self.grades, lambda grade_id: self.grades[grade_id].grade)
+
+    def validate(self, application):
+        """Return ((factory_id, warehouse_id, [(grade_id, bags)]), errors) for one application."""
+        if "invalid" in application:
+            return None, [application["invalid"]]
+        errors = []
+        society = application.get("society")
+        if society not in (None, "") and str(society) != str(self.society.id):
+            errors.append("You can only apply for permits for your own society")
+
+        factory, error = _lookup(
+            self.factories, self.factories_by_name, application["factory"], "Factory",
+            not_found="Factory must belong to the selected society",
+        )
+        if error:
+            errors.append(error)
+        elif not factory.is_active:
+            errors.append("Selected factory is not active")
+
+        warehouse, error = _lookup(self.warehouses, self.warehouses_by_name, application["warehouse"], "Warehouse")
+        if error:
+            errors.append(error)
+        elif not warehouse.is_active:
+            errors.append("Selected warehouse is not active")
+
+        quantities = []
+        seen = set()
+        if not application["coffee_quantities"]:
+            errors.append("At least one coffee quantity is required")
+        for quantity in application["coffee_quantities"]:
+            grade_id, error = _lookup(self.grade_ids, self.grades_by_name, quantity["grade"], "Coffee grade")
+            if error:
+                errors.append(error)
+                continue
+            if grade_id in seen:
+                errors.append(f"Coffee grade {self.grades[grade_id].grade} is listed more than once")
+            seen.add(grade_id)
+            try:
+                bags = int(str(quantity["bags_quantity"]).strip())
+            except ValueError:
+                errors.append("Number of bags must be a whole number")
+                continue
+            if bags < 1:
+                errors.append("Number of bags must be at least 1")
+                continue
+            quantities.append((grade_id, bags))
+
+        if errors:
+            return None, errors
+        return (factory.id, warehouse.id, quantities), []
+
+    def run(self, applications):
+        """Insert every valid application; returns ImportResult(permit_ids, errors)."""
+        valid, errors = [], []
+        for application in applications:
+            cleaned, row_errors = self.validate(application)
+            if row_errors:
+                errors.append({"row": application["row"], "errors": row_errors})
+            else:
+                valid.append(cleaned)
+
+        permit_ids = []
+        for start in range(0, len(valid), self.batch_size):
+            batch = valid[start:start + self.batch_size]
+            with transaction.atomic():
+                permits = PermitApplication.objects.bulk_create([
+                    PermitApplication(
+                        farmer_id=self.society.manager_id,
+                        society=self.society,
+                        factory_id=factory_id,
+                        warehouse_id=warehouse_id,
+                    )
+                    for factory_id, warehouse_id, _ in batch
+                ])
+                CoffeeQuantity.objects.bulk_create([
+                    CoffeeQuantity(application=permit, coffee_grade_id=grade_id, bags_quantity=bags)
+                    for permit, (_, _, quantities) in zip(permits, batch)
+                    for grade_id, bags in quantities
+                ])
+                # bulk_create skips post_save, so publish the dashboard delta here
+                broadcast_bulk_status_change(
+                    [(permit.id, self.society.id) for permit in permits], None, "PENDING"
+                )
+            permit_ids.extend(permit.id for permit in permits)
+            PERMITS_CREATED.labels(source="import").inc(len(permits))
+
+        if permit_ids:
+            notify_admins_later(
+                type="NEW_PERMIT",
+                message=f"{self.society.name} submitted {len(permit_ids)} new permit applications.",
+                link="/admin/permits",
+            )
+        return ImportResult(permit_ids, errors)
@@ -0,0 +1,310 @@
+import json
+import logging
+import statistics
+import subprocess
+import time
+import tracemalloc
+from contextlib import ExitStack
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from permits import synthetic
+from permits.models import PermitApplication
+from utils.throttling import RedisRateThrottle
+
+# GET routes that change state and must not be replayed
+SKIP = {'logout', 'rest_logout'}
+
+# Models for detail routes whose view does not declare one
+MODELS = {'permit_id': PermitApplication, 'async_permit_detail': PermitApplication}
+
+# model -> lookup from an object to the user it belongs to, used to pick detail objects
+OWNERS = {
+    'PermitApplication': 'society__manager',
+    'CoffeeQuantity': 'application__society__manager',
+    'Society': 'manager',
+    'Factory': 'society__manager',
+    'CoffeePrice': 'society__manager',
+    'Notification': 'recipient',
+}
+
+
+def iter_patterns(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_patterns(pattern.url_patterns)
+        else:
+            yield pattern
+
+
+def route_model(name, kwarg, callback):
+    if name in MODELS:
+        return MODELS[name]
+    if kwarg in MODELS:
+        return MODELS[kwarg]
+    cls = getattr(callback, 'cls', None)
+    if getattr(cls, 'queryset', None) is not None:
+        return cls.queryset.model
+    serializer_class = getattr(cls, 'serializer_class', None)
+    return getattr(getattr(serializer_class, 'Meta', None), 'model', None)
+
+
+def discover_endpoints():
+    """
+    Map URL name -> (kwarg, model) for every GET route under /api/: viewset
+    list/detail routes and actions, DRF API views and async views. Detail routes are
+    only included for integer ``pk``/``permit_id`` parameters; format-suffix variants
+    are skipped.
+    """
+    endpoints = {}
+    for pattern in iter_patterns(get_resolver().url_patterns):
+        name, callback = pattern.name, pattern.callback
+        if not name or name in SKIP or name in endpoints:
+            continue
+        actions = getattr(callback, 'actions', None)
+        if actions is not None:
+            if 'get' not in actions:
+                continue
+        elif not (hasattr(getattr(callback, 'cls', None), 'get') or iscoroutinefunction(callback)):
+            continue
+
+        params = set(pattern.pattern.regex.groupindex)
+        if params - {'pk', 'permit_id'}:
+            continue
+        kwarg = params.pop() if params else None
+        try:
+            path = reverse(name, kwargs={kwarg: 0} if kwarg else None)
+        except Exception:
+            continue
+        if not path.startswith('/api/'):
+            continue
+        model = route_model(name, kwarg, callback) if kwarg else None
+        if kwarg and model is None:
+            continue
+        endpoints[name] = (kwarg, model)
+    return endpoints
+
+
+def pick_object(model, user, fallback_user):
+    """Prefer an object belonging to ``user``, then to ``fallback_user``, then any."""
+    owner = OWNERS.get(model.__name__)
+    objects = model.objects.order_by('pk')
+    if owner:
+        for candidate in (user, fallback_user):
+            pk = objects.filter(**{owner: candidate}).values_list('pk', flat=True).first()
+            if pk is not None:
+                return pk
+    return objects.values_list('pk', flat=True).first()
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def find_regressions(results, baseline, options):
+    regressions = []
+    for key, base in baseline.get('results', {}).items():
+        current = results.get(key)
+        if current is None:
+            continue
+        if current['status'] != base['status']:
+            regressions.append(f"{key}: status {base['status']} -> {current['status']}")
+        if current['queries'] > base['queries'] + options['max_query_increase']:
+            regressions.append(f"{key}: queries {base['queries']} -> {current['queries']}")
+        if (current['time_ms'] > base['time_ms'] * options['max_time_ratio']
+                and current['time_ms'] - base['time_ms'] > options['min_time_delta']):
+            regressions.append(f"{key}: time {base['time_ms']:.1f}ms -> {current['time_ms']:.1f}ms")
+        if (current['peak_kb'] > base['peak_kb'] * options['max_alloc_ratio']
+                and current['peak_kb'] - base['peak_kb'] > options['min_alloc_delta']):
+            regressions.append(f"{key}: peak allocations {base['peak_kb']:.0f}KB -> {current['peak_kb']:.0f}KB")
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a synthetic dataset and GETs every API endpoint as staff, society manager and farmer, '
+        'recording query count, median wall time and peak allocations per endpoint. Results are written '
+        'as JSON and can be compared against a previous run, failing on regressions'
+    )
+
+    def add_arguments(self, parser):
+        sizes = synthetic.DEFAULT_SIZES
+        parser.add_argument('--societies', type=int, default=sizes['societies'])
+        parser.add_argument('--factories-per-society', type=int, default=sizes['factories_per_society'])
+        parser.add_argument('--warehouses', type=int, default=sizes['warehouses'])
+        parser.add_argument('--permits', type=int, default=sizes['permits'])
+        parser.add_argument('--notifications', type=int, default=sizes['notifications'])
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic dataset')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed requests per endpoint and role')
+        parser.add_argument('--endpoint', action='append', metavar='URL_NAME',
+                            help='Only benchmark this URL name (repeatable, default: all)')
+        parser.add_argument('--current-db', action='store_true',
+                            help='Seed and benchmark the configured database instead of a throwaway test '
+                                 'database; the synthetic rows are removed afterwards')
+        parser.add_argument('--keepdb', action='store_true', help='Reuse the throwaway test database if it exists')
+        parser.add_argument('--output', metavar='PATH', help='Write results as JSON to this file')
+        parser.add_argument('--baseline', metavar='PATH', help='Fail if results regress against this JSON file')
+        parser.add_argument('--max-query-increase', type=int, default=0,
+                            help='Extra queries per endpoint allowed over the baseline')
+        parser.add_argument('--max-time-ratio', type=float, default=2.0,
+                            help='Allowed median time as a multiple of the baseline')
+        parser.add_argument('--min-time-delta', type=float, default=10.0,
+                            help='Time differences below this many ms are never regressions')
+        parser.add_argument('--max-alloc-ratio', type=float, default=1.5,
+                            help='Allowed peak allocations as a multiple of the baseline')
+        parser.add_argument('--min-alloc-delta', type=float, default=256.0,
+                            help='Allocation differences below this many KB are never regressions')
+
+    def handle(self, *args, **options):
+        if options['repeat'] <= 0:
+            raise CommandError('--repeat must be positive')
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read baseline: {e}')
+
+        sizes = {
+            'societies': options['societies'],
+            'factories_per_society': options['factories_per_society'],
+            'warehouses': options['warehouses'],
+            'permits': options['permits'],
+            'notifications': options['notifications'],
+        }
+        if sizes['societies'] <= 0 or sizes['factories_per_society'] <= 0 or sizes['warehouses'] <= 0:
+            raise CommandError('--societies, --factories-per-society and --warehouses must be positive')
+
+        old_name = None
+        if not options['current_db']:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+            # A configured read replica must not be read from; point it at the test database too
+            for alias in connections:
+                if connections[alias].settings_dict.get('TEST', {}).get('MIRROR') == connection.alias:
+                    connections[alias].close()
+                    connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+        try:
+            if options['current_db'] or options['keepdb']:
+                synthetic.clear_dataset()
+            started = time.perf_counter()
+            users = synthetic.seed_dataset(sizes, seed=options['seed'], log=lambda m: self.stderr.write(f'Seeded {m}'))
+            self.stderr.write(f'Seeding took {time.perf_counter() - started:.1f}s')
+            results = self._benchmark(users, options)
+        finally:
+            if options['current_db']:
+                synthetic.clear_dataset()
+            else:
+                connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        report = {
+            'meta': {
+                'commit': git_revision(),
+                'timestamp': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'seed': options['seed'],
+                'sizes': sizes,
+                'repeat': options['repeat'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stderr.write(f'Results written to {options["output"]}')
+
+        if baseline is not None:
+            regressions = find_regressions(results, baseline, options)
+            if regressions:
+                for regression in regressions:
+                    self.stderr.write(self.style.ERROR(regression))
+                raise CommandError(f'{len(regressions)} regressions against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {options["baseline"]}'))
+        self.stdout.write(self.style.SUCCESS(f'Benchmarked {len(results)} endpoint/role combinations'))
+
+    def _benchmark(self, users, options):
+        endpoints = discover_endpoints()
+        if options['endpoint']:
+            unknown = set(options['endpoint']) - set(endpoints)
+            if unknown:
+                raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}')
+            endpoints = {name: endpoints[name] for name in options['endpoint']}
+
+        results = {}
+        # 403/404s are expected for some roles; don't log a warning for each of them
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            # Throttling would turn repeated requests into 429s; it is measured separately
+            with override_settings(ALLOWED_HOSTS=['*']), \
+                    mock.patch.object(RedisRateThrottle, 'allow_request', return_value=True):
+                for role, user in users.items():
+                    client = Client(raise_request_exception=False)
+                    client.cookies['access_token'] = str(AccessToken.for_user(user))
+                    for name, (kwarg, model) in sorted(endpoints.items()):
+                        kwargs = None
+                        if kwarg:
+                            pk = pick_object(model, user, users['manager'])
+                            if pk is None:
+                                continue
+                            kwargs = {kwarg: pk}
+                        path = reverse(name, kwargs=kwargs)
+                        results[f'{role} {name}'] = result = self._measure(client, path, options['repeat'])
+                        self.stdout.write(
+                            f'{role:<8} {name:<45} {result["status"]:>3} queries={result["queries"]:<4} '
+                            f'median={result["time_ms"]:.1f}ms peak={result["peak_kb"]:.0f}KB'
+                        )
+        finally:
+            request_logger.setLevel(level)
+        return results
+
+    def _measure(self, client, path, repeat):
+        client.get(path, secure=True)  # warm up caches and the grade registry
+
+        timings = []
+        for _ in range(repeat):
+            # Count reads routed to a read replica as well
+            with ExitStack() as stack:
+                captured = []
+                for db in connections.all():
+                    try:
+                        captured.append(stack.enter_context(CaptureQueriesContext(db)))
+                    except DatabaseError:
+                        pass  # unreachable replica; its reads fall back to the primary
+                started = time.perf_counter()
+                response = client.get(path, secure=True)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                timings.append(time.perf_counter() - started)
+            query_count = sum(len(queries) for queries in captured)
+
+        # Allocations are measured on a separate request; tracing slows everything down
+        tracemalloc.start()
+        try:
+            client.get(path, secure=True)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'path': path,
+            'status': response.status_code,
+            'queries': query_count,
+            'time_ms': statistics.median(timings) * 1000,
+            'peak_kb': peak / 1024,
+        }
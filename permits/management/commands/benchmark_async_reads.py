@@ -0,0 +1,98 @@
+import asyncio
+import statistics
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from utils.throttling import RedisRateThrottle
+
+# (sync route, async route) pairs that return the same payload
+ENDPOINTS = {
+    'permits': ('/api/permits/permits/', '/api/permits/async/permits/'),
+    'my_permits': ('/api/permits/permits/my_permits/', '/api/permits/async/permits/my_permits/'),
+    'staff_metrics': ('/api/permits/permits/staff_metrics/', '/api/permits/async/permits/staff_metrics/'),
+    'top_grades': ('/api/permits/permits/top-grades/', '/api/permits/async/permits/top-grades/'),
+    'notifications': ('/api/auth/notifications/', '/api/auth/async/notifications/'),
+}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Sends concurrent GETs through the Django ASGI handler to the sync DRF read endpoints and '
+        'their async-native counterparts and reports throughput and latency for each mode'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint and mode')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at the same time')
+        parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), action='append',
+                            help='Endpoint to benchmark (repeatable, default: all)')
+        parser.add_argument('--email', help='User to authenticate as (default: first active staff user)')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = User.objects.filter(is_active=True)
+        user = users.filter(email=options['email']).first() if options['email'] else users.filter(is_staff=True).first()
+        if user is None:
+            raise CommandError('No matching active user found.')
+        token = str(AccessToken.for_user(user))
+
+        # Throttling would cut the benchmark short; it is measured separately
+        with override_settings(ALLOWED_HOSTS=['*']), \
+                mock.patch.object(RedisRateThrottle, 'allow_request', return_value=True):
+            for name in options['endpoint'] or sorted(ENDPOINTS):
+                for mode, path in zip(('sync', 'async'), ENDPOINTS[name]):
+                    latencies, errors, elapsed = asyncio.run(
+                        self._run(path, token, options['requests'], options['concurrency'])
+                    )
+                    ms = sorted(value * 1000 for value in latencies)
+                    self.stdout.write(
+                        f'{name:<14} {mode:<5} {len(ms) / elapsed if elapsed else 0:8.1f} req/s  '
+                        f'mean={statistics.mean(ms) if ms else 0:.1f}ms p50={percentile(ms, 50):.1f}ms '
+                        f'p99={percentile(ms, 99):.1f}ms errors={errors}'
+                    )
+        self.stdout.write(self.style.SUCCESS('Async read benchmark finished'))
+
+    async def _run(self, path, token, total, concurrency):
+        from channels.testing import HttpCommunicator
+
+        application = get_asgi_application()
+        headers = [
+            (b'host', b'localhost'),
+            (b'x-forwarded-proto', b'https'),
+            (b'cookie', f'access_token={token}'.encode()),
+        ]
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        errors = 0
+
+        async def fetch():
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                communicator = HttpCommunicator(application, 'GET', path, headers=headers)
+                response = await communicator.get_response(timeout=60)
+                latencies.append(time.perf_counter() - started)
+                await communicator.send_input({'type': 'http.disconnect'})
+                await communicator.wait()
+            if response['status'] != 200:
+                errors += 1
+
+        await fetch()  # warm up caches and connections
+        latencies.clear()
+        errors = 0
+        started = time.perf_counter()
+        await asyncio.gather(*(fetch() for _ in range(total)))
+        return latencies, errors, time.perf_counter() - started
@@ -0,0 +1,93 @@
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from permits.dashboard import broadcast_bulk_status_change
+from permits.exports import FORMATS, encode_chunks, iter_permit_chunks, parquet_available
+from permits.filters import PermitApplicationFilter
+from permits.models import PermitApplication
+from permits.views import scope_permits
+from users.authentication import Principal
+from utils.db_routing import replica_db
+from utils.exports import export_chunk_size
+
+
+class Command(BaseCommand):
+    help = (
+        'Streams permits, one row per coffee quantity, to a CSV, NDJSON or Parquet file. '
+        'Accepts the PermitApplicationFilter filters and reports throughput in rows/s'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv', help='Output format')
+        parser.add_argument('--output', metavar='PATH', help='File to write (default: stdout for csv/ndjson)')
+        parser.add_argument('--filter', metavar='NAME=VALUE', action='append', default=[],
+                            help='PermitApplicationFilter filter, e.g. status=APPROVED or start_date=2025-01-01 (repeatable)')
+        parser.add_argument('--user', metavar='EMAIL',
+                            help='Only export permits this user can see (default: all permits)')
+        parser.add_argument('--chunk-size', type=int, default=export_chunk_size(),
+                            help='Permits fetched per keyset query')
+
+    def handle(self, *args, **options):
+        fmt = options['format']
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size must be positive')
+        if fmt == 'parquet':
+            if not parquet_available():
+                raise CommandError('Parquet export requires pyarrow')
+            if not options['output']:
+                raise CommandError('--output is required for parquet')
+
+        permits = PermitApplication.objects.all()
+        if options['user']:
+            user = get_user_model().objects.select_related('managed_society').filter(email=options['user']).first()
+            if user is None:
+                raise CommandError(f'No user with email {options["user"]}')
+            permits = scope_permits(permits, Principal.for_user(user))
+
+        data = {}
+        for item in options['filter']:
+            name, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f'--filter expects NAME=VALUE, got {item!r}')
+            data[name] = value
+        if data:
+            filterset = PermitApplicationFilter(data, queryset=permits)
+            if not filterset.is_valid():
+                raise CommandError(f'Invalid filters: {dict(filterset.errors)}')
+            permits = filterset.qs
+
+        # Export the same statuses the API would show
+        expired = PermitApplication.expire_overdue()
+        broadcast_bulk_status_change(expired, 'APPROVED', 'EXPIRED')
+        if not expired:
+            # Nothing changed just now, so a read replica (if configured) is up to date enough
+            permits = permits.using(replica_db())
+
+        if not options['output']:
+            out = sys.stdout
+        elif fmt == 'parquet':
+            out = open(options['output'], 'wb')
+        else:
+            out = open(options['output'], 'w', encoding='utf-8', newline='')
+        rows = 0
+
+        def counted(chunks):
+            nonlocal rows
+            for chunk in chunks:
+                rows += len(chunk)
+                yield chunk
+
+        started = time.perf_counter()
+        try:
+            for piece in encode_chunks(fmt, counted(iter_permit_chunks(permits, options['chunk_size']))):
+                out.write(piece)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        elapsed = time.perf_counter() - started
+        self.stderr.write(self.style.SUCCESS(
+            f'Exported {rows} rows in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)'
+        ))
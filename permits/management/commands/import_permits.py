@@ -0,0 +1,49 @@
+import json
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from permits.imports import PermitImporter, PermitImportError, parse_csv, parse_json
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports permit applications for a society manager from a CSV or JSON file, '
+        'creating the valid ones in batches and reporting errors per row'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (application,factory,warehouse,grade,bags_quantity) or JSON file')
+        parser.add_argument('--manager', metavar='EMAIL', required=True,
+                            help='Society manager the applications are submitted as')
+        parser.add_argument('--format', choices=['csv', 'json'],
+                            help='File format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int,
+                            default=getattr(settings, 'PERMIT_IMPORT_BATCH_SIZE', 500),
+                            help='Applications inserted per transaction')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+        user = get_user_model().objects.filter(email=options['manager']).first()
+        if user is None:
+            raise CommandError(f'No user with email {options["manager"]}')
+
+        fmt = options['format'] or ('csv' if options['path'].lower().endswith('.csv') else 'json')
+        try:
+            with open(options['path'], encoding='utf-8-sig') as f:
+                applications = parse_csv(f.read()) if fmt == 'csv' else parse_json(json.load(f))
+            started = time.perf_counter()
+            result = PermitImporter(user, batch_size=options['batch_size']).run(applications)
+        except (OSError, ValueError, PermitImportError) as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        for error in result.errors:
+            self.stderr.write(f'{error["row"]}: {"; ".join(error["errors"])}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(result.permit_ids)} of {len(applications)} applications in {elapsed:.2f}s '
+            f'({len(result.errors)} rejected)'
+        ))
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from permits import synthetic
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds synthetic societies, factories, warehouses, permits, coffee quantities and notifications '
+        'for load testing, with bulk_create in large batches. The same --seed produces the same data. '
+        'Example: seed_load_data --societies 5000 --permits 1000000 --clear'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--societies', type=int, default=2000, help='Societies, each with its own manager')
+        parser.add_argument('--factories-per-society', type=int, default=3)
+        parser.add_argument('--warehouses', type=int, default=150)
+        parser.add_argument('--permits', type=int, default=100000)
+        parser.add_argument('--max-grades-per-permit', type=int,
+                            default=synthetic.DEFAULT_SIZES['max_grades_per_permit'])
+        parser.add_argument('--notifications', type=int, default=100000)
+        parser.add_argument('--coffee-years', type=int, default=3,
+                            help='Coffee years (October to September) the applications are spread over')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create batch')
+        parser.add_argument('--clear', action='store_true', help='Delete previously seeded data first')
+        parser.add_argument('--clear-only', action='store_true', help='Delete previously seeded data and exit')
+
+    def handle(self, *args, **options):
+        positive = ['societies', 'factories_per_society', 'warehouses', 'max_grades_per_permit',
+                    'coffee_years', 'batch_size']
+        for name in positive:
+            if options[name] <= 0:
+                raise CommandError(f'--{name.replace("_", "-")} must be positive')
+        if options['permits'] < 0 or options['notifications'] < 0:
+            raise CommandError('--permits and --notifications cannot be negative')
+
+        def log(message):
+            self.stdout.write(f'  {message}')
+
+        started = time.perf_counter()
+        if options['clear'] or options['clear_only']:
+            self.stdout.write('Deleting previously seeded data')
+            synthetic.clear_dataset(batch_size=options['batch_size'], log=log)
+            if options['clear_only']:
+                self.stdout.write(self.style.SUCCESS(f'Cleared in {time.perf_counter() - started:.1f}s'))
+                return
+        elif CustomUser.objects.filter(email__startswith=f'{synthetic.PREFIX}-').exists():
+            raise CommandError('Synthetic data already exists; rerun with --clear to replace it')
+
+        sizes = {name: options[name] for name in synthetic.DEFAULT_SIZES}
+        self.stdout.write('Seeding')
+        users = synthetic.seed_dataset(sizes, seed=options['seed'], batch_size=options['batch_size'], log=log)
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {options["permits"]} permits in {time.perf_counter() - started:.1f}s. '
+            f'Log in as {users["staff"].email} (staff) or {users["manager"].email} (society manager) '
+            f'after setting a password'
+        ))
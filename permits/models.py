@@ -1,12 +1,15 @@
+from asgiref.sync import sync_to_async
 from django.db import models
 from django.utils import timezone
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from datetime import timedelta
-from django.db import transaction
+from django.db import DEFAULT_DB_ALIAS, transaction
 from django.core.exceptions import ValidationError
 
 from users.models import CustomUser
+from utils.db_routing import untracked_writes
+from utils.metrics import PERMIT_TRANSITIONS
 from societies.models import CoffeePrice
 import decimal
 
@@ -115,8 +118,11 @@ class PermitApplication(models.Model):
             self.ref_no = f"MCG-CD/{distribution_year} MP {new_number:03d}"
 
         # Handle delivery dates based on status changes
+        # (the previous status is kept for the post_save dashboard broadcast)
+        self._previous_status = None
         if self.pk:
             original = PermitApplication.objects.get(pk=self.pk)
+            self._previous_status = original.status
             if original.status != self.status:
                 if self.status == "APPROVED":
                     self.delivery_start = timezone.now().date()
@@ -148,6 +154,8 @@ class PermitApplication(models.Model):
     @property
     def total_bags(self):
         """Calculate total number of bags across all coffee grades"""
+        if "coffee_quantities" in getattr(self, "_prefetched_objects_cache", {}):
+            return sum(quantity.bags_quantity for quantity in self.coffee_quantities.all())
         return (
             self.coffee_quantities.aggregate(total=models.Sum("bags_quantity"))["total"]
             or 0
@@ -156,19 +164,55 @@ class PermitApplication(models.Model):
     @property
     def total_weight(self):
         """Calculate total weight across all coffee grades"""
+        from .grades import grade_registry
         total = 0
         for quantity in self.coffee_quantities.all():
-            # Ensure the related coffee_grade is fetched
-            if hasattr(quantity, 'coffee_grade') and quantity.coffee_grade:
-                weight_per_bag = float(quantity.coffee_grade.weight_per_bag)
-                total += quantity.bags_quantity * weight_per_bag
+            total += quantity.bags_quantity * grade_registry.weight(quantity.coffee_grade_id)
         return total
 
+    @classmethod
+    def _overdue(cls):
+        # Always the primary, even inside replica_reads(): these rows are updated next
+        return cls.objects.using(DEFAULT_DB_ALIAS).filter(status="APPROVED", delivery_end__lt=timezone.now().date())
+
+    @classmethod
+    def _expire_locked(cls):
+        # Lock the rows before updating them, so that when two requests sweep at the same
+        # time each permit is reported (and broadcast) by exactly one of them. The sweep
+        # does not count as the request's write, so read-only views stay on the replica
+        with untracked_writes(), transaction.atomic(using=DEFAULT_DB_ALIAS):
+            expired = list(cls._overdue().select_for_update(skip_locked=True).values_list("id", "society_id"))
+            if not expired:
+                return []
+            updated = cls.objects.filter(
+                id__in=[permit_id for permit_id, _ in expired], status="APPROVED"
+            ).update(status="EXPIRED")
+        PERMIT_TRANSITIONS.labels(status="EXPIRED").inc(updated)
+        return expired if updated else []
+
+    @classmethod
+    def expire_overdue(cls):
+        """
+        Mark every approved permit past its delivery window as EXPIRED with a single UPDATE.
+        Returns (id, society_id) pairs of the permits this call expired.
+        """
+        if not cls._overdue().exists():
+            return []
+        return cls._expire_locked()
+
+    @classmethod
+    async def aexpire_overdue(cls):
+        """expire_overdue() for async code; only the rare locked update leaves the event loop."""
+        if not await cls._overdue().aexists():
+            return []
+        return await sync_to_async(cls._expire_locked)()
+
     def update_status(self):
         """Update permit status based on delivery end date"""
         if self.status == "APPROVED" and self.delivery_end and timezone.now().date() > self.delivery_end:
             self.status = "EXPIRED"
             self.save()
+            PERMIT_TRANSITIONS.labels(status="EXPIRED").inc()
         return self.status
 
     @property
@@ -215,4 +259,5 @@ class CoffeeQuantity(models.Model):
     @property
     def total_weight(self):
         """Calculate total weight for this specific coffee grade"""
-        return self.bags_quantity * float(self.coffee_grade.weight_per_bag)
+        from .grades import grade_registry
+        return self.bags_quantity * grade_registry.weight(self.coffee_grade_id)
@@ -7,7 +7,9 @@ from societies.serializers import SocietySerializer, FactorySerializer
 from warehouse.models import Warehouse
 from warehouse.serializers import WarehouseSerializer
 from django.core.validators import MinValueValidator
-from users.utils import notify_admins
+from django.db import transaction
+from utils.metrics import PERMITS_CREATED
+from users.utils import notify_admins_later
 
 
 class CoffeeGradeSerializer(serializers.ModelSerializer):
@@ -17,9 +19,34 @@ class CoffeeGradeSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that first looks the object up in ``root.preloaded[model]``,
+    filled in one pass by the root serializer, and only queries on a miss.
+    """
+
+    def to_internal_value(self, data):
+        preloaded = getattr(self.root, "preloaded", {}).get(self.get_queryset().model, {})
+        obj = preloaded.get(_pk(data))
+        if obj is not None:
+            return obj
+        # Invalid ids (including booleans) get PrimaryKeyRelatedField's own errors
+        return super().to_internal_value(data)
+
+
+def _pk(value):
+    # int(True) is 1; a boolean is never an id
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
 class CoffeeQuantitySerializer(serializers.ModelSerializer):
     coffee_grade = CoffeeGradeSerializer(read_only=True)
-    coffee_grade_id = serializers.PrimaryKeyRelatedField(
+    coffee_grade_id = PreloadedPrimaryKeyRelatedField(
         queryset=CoffeeGrade.objects.all(),
         source='coffee_grade',
         write_only=True
@@ -121,17 +148,17 @@ class PermitApplicationSerializer(serializers.ModelSerializer):
 
 class PermitApplicationCreateSerializer(serializers.ModelSerializer):
     coffee_quantities = CoffeeQuantitySerializer(many=True)
-    society_id = serializers.PrimaryKeyRelatedField(
+    society_id = PreloadedPrimaryKeyRelatedField(
         queryset=Society.objects.all(),
         source='society',
         write_only=True
     )
-    factory_id = serializers.PrimaryKeyRelatedField(
+    factory_id = PreloadedPrimaryKeyRelatedField(
         queryset=Factory.objects.all(),
         source='factory',
         write_only=True
     )
-    warehouse_id = serializers.PrimaryKeyRelatedField(
+    warehouse_id = PreloadedPrimaryKeyRelatedField(
         queryset=Warehouse.objects.all(),
         source='warehouse',
         write_only=True
@@ -145,6 +172,47 @@ class PermitApplicationCreateSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id']
 
+    def to_internal_value(self, data):
+        self.preloaded = self.preload(data)
+        return super().to_internal_value(data)
+
+    def preload(self, data):
+        """
+        Load every related object the payload refers to in one pass: the factory with its
+        society and manager in one query, the warehouse, and all grades in one query.
+        The request user's managed society is already loaded by authentication.
+        """
+        preloaded = {Society: {}, Factory: {}, Warehouse: {}, CoffeeGrade: {}}
+        if not hasattr(data, 'get'):
+            return preloaded
+
+        try:
+            managed_society = self.context['request'].user.managed_society
+        except Society.DoesNotExist:
+            managed_society = None
+        if managed_society is not None:
+            preloaded[Society][managed_society.pk] = managed_society
+
+        factory_id = _pk(data.get('factory_id'))
+        if factory_id is not None:
+            for factory in Factory.objects.select_related('society__manager').filter(pk=factory_id):
+                preloaded[Factory][factory.pk] = factory
+                preloaded[Society].setdefault(factory.society_id, factory.society)
+
+        warehouse_id = _pk(data.get('warehouse_id'))
+        if warehouse_id is not None:
+            preloaded[Warehouse] = Warehouse.objects.in_bulk([warehouse_id])
+
+        quantities = data.get('coffee_quantities')
+        if isinstance(quantities, list):
+            grade_ids = {
+                _pk(quantity.get('coffee_grade_id'))
+                for quantity in quantities if isinstance(quantity, dict)
+            } - {None}
+            if grade_ids:
+                preloaded[CoffeeGrade] = CoffeeGrade.objects.in_bulk(grade_ids)
+        return preloaded
+
     def validate(self, data):
         user = self.context['request'].user
         
@@ -183,30 +251,40 @@ class PermitApplicationCreateSerializer(serializers.ModelSerializer):
         # Set the farmer to the society manager
         validated_data['farmer'] = society.manager
 
-        # Create the PermitApplication instance first. This will assign its PK.
-        permit = PermitApplication.objects.create(
-            society=society,
-            factory=factory,
-            warehouse=warehouse,
-            **validated_data
-        )
-
-        # Create CoffeeQuantity instances AFTER permit is created to link them
-        for cq_data in coffee_quantities_data:
-            coffee_grade = cq_data.pop('coffee_grade')
-            CoffeeQuantity.objects.create(
-                application=permit,
-                coffee_grade=coffee_grade,
-                bags_quantity=cq_data['bags_quantity']
+        with transaction.atomic():
+            # Create the PermitApplication instance first. This will assign its PK.
+            permit = PermitApplication.objects.create(
+                society=society,
+                factory=factory,
+                warehouse=warehouse,
+                **validated_data
             )
 
-        # Notify admins of new permit application
-        notify_admins(
-            type="NEW_PERMIT",
-            message=f"A new permit application has been submitted by {society.name}.",
-            link=f"/admin/permits/{permit.id}"
-        )
+            # Create all CoffeeQuantity rows in one INSERT and keep them on the permit so
+            # the response is serialized without reading them back
+            quantities = CoffeeQuantity.objects.bulk_create([
+                CoffeeQuantity(
+                    application=permit,
+                    coffee_grade=cq_data['coffee_grade'],
+                    bags_quantity=cq_data['bags_quantity']
+                )
+                for cq_data in coffee_quantities_data
+            ])
+            # A result-cached queryset, as prefetch_related() leaves it, so .count()
+            # and .exists() still work on permit.coffee_quantities.all()
+            prefetched = permit.coffee_quantities.all()
+            prefetched._result_cache = quantities
+            prefetched._prefetch_done = True
+            permit._prefetched_objects_cache = {'coffee_quantities': prefetched}
+
+            # Notify admins of new permit application once the permit is committed
+            notify_admins_later(
+                type="NEW_PERMIT",
+                message=f"A new permit application has been submitted by {society.name}.",
+                link=f"/admin/permits/{permit.id}"
+            )
 
+        PERMITS_CREATED.labels(source="api").inc()
         return permit
 
 
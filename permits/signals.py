@@ -0,0 +1,22 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .dashboard import broadcast_permit_change
+from .grades import grade_registry
+from .models import CoffeeGrade, PermitApplication
+
+
+@receiver(post_save, sender=PermitApplication)
+def push_dashboard_delta(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous_status = None if created else getattr(instance, "_previous_status", instance.status)
+    # Mark the change as published so a repeated save of the same instance is not counted twice
+    instance._previous_status = instance.status
+    broadcast_permit_change(instance, previous_status)
+
+
+@receiver(post_save, sender=CoffeeGrade)
+@receiver(post_delete, sender=CoffeeGrade)
+def reload_grade_registry(sender, **kwargs):
+    grade_registry.invalidate()
@@ -0,0 +1,256 @@
+"""
+Deterministic synthetic data for benchmarks and load tests.
+
+Everything is written with bulk_create in large batches, so no model signals fire and
+no notifications or emails are sent. Generated rows are recognisable by the ``loadgen``
+prefix on user emails, society names and warehouse licence numbers, which is what
+clear_dataset() deletes.
+"""
+import random
+import time
+from calendar import monthrange
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from societies.models import Factory, Society
+from users.models import CustomUser, Notification
+from utils.reference_cache import bump_versions
+from warehouse.models import Warehouse
+from .models import CoffeeGrade, CoffeeQuantity, PermitApplication
+
+PREFIX = "loadgen"
+
+# grade -> (kg per bag, share of coffee quantities)
+GRADES = {
+    "AA": ("60.00", 0.18), "AB": ("60.00", 0.30), "PB": ("60.00", 0.06), "C": ("60.00", 0.14),
+    "E": ("60.00", 0.02), "T": ("60.00", 0.07), "TT": ("60.00", 0.08), "MH": ("60.00", 0.10),
+    "ML": ("60.00", 0.05),
+}
+
+# status -> share of permits applied for in the last 30 days. Older approved permits have
+# run past their delivery window and are EXPIRED, and none of them are still PENDING.
+STATUS_MIX = {"PENDING": 0.25, "APPROVED": 0.55, "REJECTED": 0.12, "CANCELLED": 0.08}
+OLD_STATUS_MIX = {"EXPIRED": 0.8, "REJECTED": 0.14, "CANCELLED": 0.06}
+RECENT_DAYS = 30
+
+# Share of a coffee year's (October to September) applications falling in each month,
+# following the main (Oct-Dec) and fly (Apr-Jun) crops.
+MONTH_MIX = [0.16, 0.18, 0.14, 0.07, 0.04, 0.04, 0.09, 0.1, 0.08, 0.04, 0.03, 0.03]
+
+DEFAULT_SIZES = {
+    "societies": 20,
+    "factories_per_society": 3,
+    "warehouses": 10,
+    "permits": 2000,
+    "max_grades_per_permit": 3,
+    "notifications": 2000,
+    "coffee_years": 2,
+}
+
+
+@contextmanager
+def _explicit_timestamps(*fields):
+    """Let bulk_create keep the auto_now_add timestamps set on the objects."""
+    previous = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in zip(fields, previous):
+            field.auto_now_add = value
+
+
+def _created(model, objects, batch_size):
+    with transaction.atomic():
+        return model.objects.bulk_create(objects, batch_size=batch_size)
+
+
+def _cumulative(weights):
+    return list(accumulate(weights))
+
+
+class _Calendar:
+    """Application timestamps spread over the last ``coffee_years`` coffee years."""
+
+    def __init__(self, rng, now, coffee_years):
+        self.rng, self.now = rng, now
+        first = now.year if now.month >= 10 else now.year - 1
+        self.years = [first - offset for offset in range(coffee_years)]
+        self.months = [(10 + i - 1) % 12 + 1 for i in range(12)]
+        self.month_weights = _cumulative(MONTH_MIX)
+
+    def applied(self):
+        rng = self.rng
+        for _ in range(20):
+            year = rng.choice(self.years)
+            month = rng.choices(self.months, cum_weights=self.month_weights)[0]
+            if month < 10:
+                year += 1
+            start = datetime(year, month, 1, tzinfo=self.now.tzinfo)
+            moment = start + timedelta(seconds=rng.randrange(monthrange(year, month)[1] * 86400))
+            # The rest of the current coffee year hasn't happened yet
+            if moment <= self.now:
+                return moment
+        return self.now - timedelta(seconds=rng.randrange(RECENT_DAYS * 86400))
+
+
+def seed_dataset(sizes=None, seed=0, batch_size=5000, log=None):
+    """
+    Create a synthetic dataset and return the users to benchmark as:
+    ``{"staff": user, "manager": user, "farmer": user}``.
+    ``sizes`` overrides DEFAULT_SIZES. The same ``seed`` always produces the same data
+    relative to the current date.
+    """
+    sizes = {**DEFAULT_SIZES, **(sizes or {})}
+    rng = random.Random(seed)
+    now = timezone.now()
+    today = timezone.localdate()
+    log = log or (lambda message: None)
+    password = make_password(None)
+
+    grades, grade_weights = [], []
+    for name, (weight, share) in GRADES.items():
+        grade, _ = CoffeeGrade.objects.get_or_create(grade=name, defaults={"weight_per_bag": Decimal(weight)})
+        grades.append(grade.pk)
+        grade_weights.append(share)
+    grade_weights = _cumulative(grade_weights)
+    max_grades = min(sizes["max_grades_per_permit"], len(grades))
+
+    staff, farmer = _created(CustomUser, [
+        CustomUser(email=f"{PREFIX}-staff@example.com", role="ADMIN", is_staff=True, is_active=True,
+                   password=password, first_name="Load", last_name="Staff"),
+        CustomUser(email=f"{PREFIX}-farmer@example.com", role="FARMER", is_active=True,
+                   password=password, first_name="Load", last_name="Farmer"),
+    ], batch_size)
+    managers = _created(CustomUser, [
+        CustomUser(email=f"{PREFIX}-manager-{i}@example.com", role="FARMER", is_active=True,
+                   password=password, first_name="Manager", last_name=str(i))
+        for i in range(sizes["societies"])
+    ], batch_size)
+    log(f"{len(managers) + 2} users")
+
+    societies = _created(Society, [
+        Society(name=f"{PREFIX} society {i}", manager=manager, county="Nyeri", sub_county=f"Ward {i % 25}",
+                is_approved=True, date_approved=now, approved_by=staff)
+        for i, manager in enumerate(managers)
+    ], batch_size)
+    factories = _created(Factory, [
+        Factory(society=society, name=f"{PREFIX} factory {i}-{j}", county="Nyeri")
+        for i, society in enumerate(societies)
+        for j in range(sizes["factories_per_society"])
+    ], batch_size)
+    warehouses = _created(Warehouse, [
+        Warehouse(name=f"{PREFIX} warehouse {i}", county="Nairobi", sub_county="Industrial Area",
+                  licence_number=f"{PREFIX}-{seed}-{i}", created_by=staff)
+        for i in range(sizes["warehouses"])
+    ], batch_size)
+    log(f"{len(societies)} societies, {len(factories)} factories, {len(warehouses)} warehouses")
+
+    factories_by_society = {}
+    for factory in factories:
+        factories_by_society.setdefault(factory.society_id, []).append(factory.pk)
+    society_rows = [(society.pk, society.manager_id, factories_by_society[society.pk]) for society in societies]
+    warehouse_ids = [warehouse.pk for warehouse in warehouses]
+    recent_statuses, recent_weights = list(STATUS_MIX), _cumulative(STATUS_MIX.values())
+    old_statuses, old_weights = list(OLD_STATUS_MIX), _cumulative(OLD_STATUS_MIX.values())
+    recent = now - timedelta(days=RECENT_DAYS)
+    calendar = _Calendar(rng, now, sizes["coffee_years"])
+
+    created = 0
+    started = time.perf_counter()
+    date_field = PermitApplication._meta.get_field("application_date")
+    for start in range(0, sizes["permits"], batch_size):
+        permits = []
+        for number in range(start, min(start + batch_size, sizes["permits"])):
+            society_id, manager_id, society_factories = rng.choice(society_rows)
+            applied = calendar.applied()
+            if applied >= recent:
+                status = rng.choices(recent_statuses, cum_weights=recent_weights)[0]
+            else:
+                status = rng.choices(old_statuses, cum_weights=old_weights)[0]
+            permit = PermitApplication(
+                farmer_id=manager_id, society_id=society_id,
+                factory_id=rng.choice(society_factories), warehouse_id=rng.choice(warehouse_ids),
+                application_date=applied, status=status,
+            )
+            decided = applied + timedelta(hours=rng.randint(2, 72))
+            if status in ("APPROVED", "EXPIRED"):
+                permit.approved_by_id, permit.approved_at = staff.pk, decided
+                permit.ref_no = f"MCG-CD/{PREFIX}/MP {number:07d}"
+                permit.delivery_start = decided.date()
+                if status == "APPROVED":
+                    # Keep approved permits valid so the expiry sweep leaves the dataset alone
+                    permit.delivery_end = today + timedelta(days=7 + rng.randrange(30))
+                else:
+                    permit.delivery_end = permit.delivery_start + timedelta(days=14)
+            elif status == "REJECTED":
+                permit.rejected_by_id, permit.rejected_at = staff.pk, decided
+                permit.ref_no = f"MCG-CD/{PREFIX}/MP {number:07d}"
+                permit.rejection_reason = "Synthetic rejection"
+            permits.append(permit)
+        with _explicit_timestamps(date_field):
+            permits = _created(PermitApplication, permits, batch_size)
+
+        quantities = []
+        for permit in permits:
+            count = rng.randint(1, max_grades)
+            picked = set()
+            while len(picked) < count:
+                picked.add(rng.choices(grades, cum_weights=grade_weights)[0])
+            quantities.extend(
+                CoffeeQuantity(application_id=permit.pk, coffee_grade_id=grade_id, bags_quantity=rng.randint(1, 500))
+                for grade_id in sorted(picked)
+            )
+        _created(CoffeeQuantity, quantities, batch_size)
+        created += len(permits)
+        log(f"{created} permits ({created / (time.perf_counter() - started):.0f}/s)")
+
+    recipients = [staff.pk, *(manager.pk for manager in managers[:50])]
+    days = sizes["coffee_years"] * 365
+    created_field = Notification._meta.get_field("created_at")
+    for start in range(0, sizes["notifications"], batch_size):
+        with _explicit_timestamps(created_field):
+            _created(Notification, [
+                Notification(
+                    recipient_id=rng.choice(recipients), type="NEW_PERMIT",
+                    message="A new permit application has been submitted.", link="/admin/permits",
+                    is_read=rng.random() < 0.7,
+                    created_at=now - timedelta(days=rng.randrange(days), seconds=rng.randrange(86400)),
+                )
+                for _ in range(start, min(start + batch_size, sizes["notifications"]))
+            ], batch_size)
+    log(f"{sizes['notifications']} notifications")
+
+    # bulk_create skips the post_save receivers that invalidate cached reference data
+    bump_versions(["factories", "warehouses", "prices"])
+    return {"staff": staff, "manager": managers[0], "farmer": farmer}
+
+
+def clear_dataset(batch_size=5000, log=None):
+    """Delete everything seed_dataset() created (grades are kept), permits in batches."""
+    log = log or (lambda message: None)
+    permits = PermitApplication.objects.filter(society__name__startswith=f"{PREFIX} ").order_by("id")
+    deleted = 0
+    while True:
+        ids = list(permits.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            CoffeeQuantity.objects.filter(application_id__in=ids).delete()
+            PermitApplication.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+        log(f"{deleted} permits")
+
+    users = CustomUser.objects.filter(email__startswith=f"{PREFIX}-")
+    with transaction.atomic():
+        Notification.objects.filter(recipient__in=users).delete()
+        Warehouse.objects.filter(licence_number__startswith=f"{PREFIX}-").delete()
+        Society.objects.filter(name__startswith=f"{PREFIX} ").delete()
+        users.delete()
@@ -1,3 +1,794 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.exceptions import SynchronousOnlyOperation
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.models import F, Sum
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from utils import db_routing, instrumentation
+from utils.db_routing import REPLICA, ReplicaRouter, ReplicaRoutingMiddleware, replica_reads
+from utils.metrics import PERMIT_TRANSITIONS
+from utils.reference_cache import bump_versions
+from utils.testing import LOCAL_SERVICES, client_for, reset_process_state
+from societies.models import Factory, Society
+from users.authentication import PrincipalJWTCookieAuthentication, Principal
+from users.models import CustomUser, Notification
+from warehouse.models import Warehouse
+from . import dashboard, exports
+from .grades import grade_registry, weighted_totals
+from .imports import PermitImportError, PermitImporter, parse_csv, parse_json
+from .models import CoffeeGrade, CoffeeQuantity, PermitApplication
+from .serializers import PermitApplicationCreateSerializer
+from . import synthetic
+
+SIZES = {"societies": 3, "factories_per_society": 2, "warehouses": 2, "permits": 40, "notifications": 10}
+
+
+@LOCAL_SERVICES
+class PrincipalQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = synthetic.seed_dataset(SIZES)
+
+    def setUp(self):
+        # Start every test from the same process-wide state
+        reset_process_state()
+
+    def test_user_and_managed_society_load_in_one_query(self):
+        auth = PrincipalJWTCookieAuthentication()
+        manager = self.users["manager"]
+        with self.assertNumQueries(1):
+            principal = Principal.for_user(auth.load_user(manager.pk))
+        self.assertEqual(principal.managed_society_id, manager.managed_society.pk)
+
+        # Users without a society must not trigger a reverse lookup either
+        with self.assertNumQueries(1):
+            principal = Principal.for_user(auth.load_user(self.users["farmer"].pk))
+        self.assertFalse(principal.is_society_manager)
+
+    def test_request_resolves_principal_once(self):
+        client = client_for(self.client, self.users["manager"])
+        # Cold adds the user with their society and the grade registry
+        with self.assertNumQueries(5):
+            response = client.get("/api/permits/permits/my_permits/", secure=True)
+        self.assertEqual(response.status_code, 200)
+        # Warm: the user comes from the authentication cache
+        with self.assertNumQueries(3):
+            client.get("/api/permits/permits/my_permits/", secure=True)
+
+
+@LOCAL_SERVICES
+class PermitCreateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = synthetic.seed_dataset(SIZES)["manager"]
+        society = cls.manager.managed_society
+        cls.payload = {
+            "society_id": society.pk,
+            "factory_id": society.factories.first().pk,
+            "warehouse_id": Warehouse.objects.first().pk,
+            "coffee_quantities": [
+                {"coffee_grade_id": grade.pk, "bags_quantity": 10} for grade in CoffeeGrade.objects.all()[:3]
+            ],
+        }
+
+    def setUp(self):
+        reset_process_state()
+
+    def test_create_in_fixed_queries(self):
+        client = client_for(self.client, self.manager)
+        # Revocation filter, user with society, factory, warehouse, grades, then the
+        # savepoint, permit INSERT, one quantity INSERT and release
+        with self.assertNumQueries(9):
+            response = client.post("/api/permits/permits/", self.payload, content_type="application/json", secure=True)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()["coffee_quantities"]), 3)
+
+    def test_boolean_ids_are_rejected(self):
+        grade = CoffeeGrade.objects.get(pk=1)
+        self.assertEqual(grade.pk, int(True))
+        payload = dict(self.payload, coffee_quantities=[{"coffee_grade_id": True, "bags_quantity": 10}])
+        serializer = PermitApplicationCreateSerializer(data=payload, context={"request": mock.Mock(user=self.manager)})
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors["coffee_quantities"][0]["coffee_grade_id"][0].code, "incorrect_type")
+
+    def test_created_quantities_behave_like_a_prefetch(self):
+        request = mock.Mock(user=self.manager)
+        serializer = PermitApplicationCreateSerializer(data=self.payload, context={"request": request})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with self.captureOnCommitCallbacks():
+            permit = serializer.save()
+        with self.assertNumQueries(0):
+            quantities = permit.coffee_quantities.all()
+            self.assertEqual(quantities.count(), 3)
+            self.assertTrue(quantities.exists())
+        # Further filtering queries, as after prefetch_related()
+        self.assertEqual(quantities.filter(bags_quantity=10).count(), 3)
+
+
+@LOCAL_SERVICES
+class ExpireOverdueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        synthetic.seed_dataset(SIZES)
+
+    def test_each_permit_is_reported_once(self):
+        ids = PermitApplication.objects.order_by("id").values_list("id", flat=True)[:5]
+        PermitApplication.objects.filter(id__in=list(ids)).update(
+            status="APPROVED", delivery_end=timezone.localdate() - timedelta(days=1)
+        )
+        overdue = set(PermitApplication.objects.filter(id__in=list(ids)).values_list("id", "society_id"))
+
+        self.assertEqual(set(PermitApplication.expire_overdue()), overdue)
+        self.assertEqual(PermitApplication.expire_overdue(), [])
+        # A sweep that lost the race finds nothing left to lock
+        self.assertEqual(PermitApplication._expire_locked(), [])
+
+
+@LOCAL_SERVICES
+class ReferenceCacheOutageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = synthetic.seed_dataset(SIZES)
+
+    def test_reference_data_is_served_uncached_when_the_cache_is_down(self):
+        client = client_for(self.client, self.users["farmer"])
+        broken = mock.Mock(**{f"{name}.side_effect": ConnectionError("cache down")
+                              for name in ("get", "get_many", "add", "set", "set_many")})
+        with mock.patch("utils.reference_cache.cache", broken), self.assertLogs("utils.reference_cache", "ERROR"):
+            response = client.get("/api/permits/coffee-grades/", secure=True)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()), CoffeeGrade.objects.count())
+
+            # The body hash still answers conditional requests
+            response = client.get("/api/permits/coffee-grades/", secure=True, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(response.status_code, 304)
+
+            # Invalidation logs instead of failing the write
+            with self.captureOnCommitCallbacks(execute=True):
+                CoffeeGrade.objects.update_or_create(grade="AA", defaults={"weight_per_bag": 60})
+
+
+@LOCAL_SERVICES
+class GradeRegistryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = synthetic.seed_dataset(SIZES)
+
+    def setUp(self):
+        reset_process_state()
+
+    def test_weighted_totals_match_a_grade_join(self):
+        approved = CoffeeQuantity.objects.filter(application__status="APPROVED")
+        joined = {
+            row["coffee_grade__grade"]: float(row["kg"])
+            for row in approved.values("coffee_grade__grade").annotate(
+                kg=Sum(F("bags_quantity") * F("coffee_grade__weight_per_bag"))
+            )
+        }
+        grade_registry.all()
+        with CaptureQueriesContext(connection) as queries:
+            totals = weighted_totals(approved, ["grade"])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("permits_coffeegrade", queries[0]["sql"])
+        self.assertEqual({row["grade"]: row["total_kg"] for row in totals}, joined)
+        self.assertEqual([row["total_kg"] for row in totals], sorted(joined.values(), reverse=True))
+
+        client = client_for(self.client, self.users["staff"])
+        response = client.get("/api/permits/permits/top-grades/", {"exclude_grades": "AA"}, secure=True)
+        self.assertEqual({row["grade"]: row["totalKg"] for row in response.json()["results"]},
+                         {grade: kg for grade, kg in joined.items() if grade != "AA"})
+
+    def test_saving_or_deleting_a_grade_reloads_the_registry(self):
+        grade = CoffeeGrade.objects.create(grade="ZZ", weight_per_bag=50)
+        self.assertEqual(grade_registry.weight(grade.pk), 50.0)
+
+        grade.weight_per_bag = 55
+        grade.save()
+        self.assertEqual(grade_registry.weight(grade.pk), 55.0)
+
+        grade_id = grade.pk
+        grade.delete()
+        self.assertNotIn(grade_id, grade_registry.all())
+        self.assertEqual(grade_registry.weight(grade_id), 0.0)
+
+    @override_settings(GRADE_REGISTRY_CHECK_INTERVAL=0)
+    def test_another_process_changing_the_grades_is_picked_up(self):
+        grade = CoffeeGrade.objects.first()
+        grade_registry.all()
+        # A queryset update sends no signal; the version bump is all this process sees
+        CoffeeGrade.objects.filter(pk=grade.pk).update(weight_per_bag=99)
+        self.assertNotEqual(grade_registry.weight(grade.pk), 99.0)
+        bump_versions(["grades"])
+        self.assertEqual(grade_registry.weight(grade.pk), 99.0)
+
+    def test_unknown_grade_id_reloads(self):
+        grade_registry.all()
+        [grade] = CoffeeGrade.objects.bulk_create([CoffeeGrade(grade="ZZ", weight_per_bag=42)])
+        self.assertEqual(grade_registry.weight(grade.pk), 42.0)
+
+    async def test_async_lookups_never_query_from_the_event_loop(self):
+        await grade_registry.aall()
+        grade = (await CoffeeGrade.objects.abulk_create([CoffeeGrade(grade="ZZ", weight_per_bag=42)]))[0]
+        # Unknown ids read as missing instead of reloading with the sync ORM
+        self.assertEqual(grade_registry.weight(grade.pk), 0.0)
+        await grade_registry.aensure([grade.pk])
+        self.assertEqual(grade_registry.weight(grade.pk), 42.0)
+
+        grade_registry.invalidate()
+        with self.assertRaises(SynchronousOnlyOperation):
+            grade_registry.all()
+
+    async def test_async_views_weigh_grades_created_elsewhere(self):
+        await grade_registry.aall()
+        permit = await PermitApplication.objects.afirst()
+        grade = (await CoffeeGrade.objects.abulk_create([CoffeeGrade(grade="ZZ", weight_per_bag=42)]))[0]
+        await CoffeeQuantity.objects.acreate(application=permit, coffee_grade=grade, bags_quantity=2)
+
+        client_for(self.async_client, self.users["staff"])
+        response = await self.async_client.get(f"/api/permits/async/permits/{permit.pk}/", secure=True)
+        self.assertEqual(response.status_code, 200)
+        expected = await sync_to_async(lambda: PermitApplication.objects.get(pk=permit.pk).total_weight)()
+        self.assertEqual(response.json()["total_weight"], f"{expected:.2f}")
+        self.assertEqual(grade_registry.weight(grade.pk), 42.0)
+
+
+@LOCAL_SERVICES
+class DashboardDeltaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = synthetic.seed_dataset(SIZES)
+
+    def setUp(self):
+        reset_process_state()
+        layer = mock.Mock(group_send=mock.AsyncMock())
+        patcher = mock.patch("permits.dashboard.get_channel_layer", return_value=layer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.group_send = layer.group_send
+
+    def assertDeltasApply(self, before, society_id):
+        """The published deltas turn ``before`` into the current snapshot, for staff and the society."""
+        for group, society in ((dashboard.STAFF_DASHBOARD_GROUP, None),
+                               (dashboard.society_dashboard_group(society_id), society_id)):
+            expected = dict(before[group])
+            for call in self.group_send.call_args_list:
+                if call.args[0] == group:
+                    for key, value in call.args[1]["content"]["delta"].items():
+                        expected[key] += value
+            after = dashboard.metrics_snapshot(society)
+            self.assertEqual(set(expected), set(after))
+            for key, value in after.items():
+                if key == "approved_kg_today":
+                    self.assertAlmostEqual(expected[key], value)
+                else:
+                    self.assertEqual(expected[key], value, key)
+        self.group_send.reset_mock()
+
+    def snapshots(self, society_id):
+        return {
+            dashboard.STAFF_DASHBOARD_GROUP: dashboard.metrics_snapshot(),
+            dashboard.society_dashboard_group(society_id): dashboard.metrics_snapshot(society_id),
+        }
+
+    def pending_permit(self):
+        permit = PermitApplication.objects.filter(status="PENDING", coffee_quantities__isnull=False).first()
+        # Still inside its delivery window once approved
+        permit.delivery_end = timezone.localdate() + timedelta(days=30)
+        with self.captureOnCommitCallbacks(execute=True):
+            permit.save()
+        self.group_send.reset_mock()
+        return permit
+
+    def test_approving_then_cancelling_today_nets_out(self):
+        permit = self.pending_permit()
+        before = self.snapshots(permit.society_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            permit.approve(self.users["staff"])
+        self.assertGreater(self.group_send.call_args_list[0].args[1]["content"]["delta"]["approved_kg_today"], 0)
+        self.assertDeltasApply(before, permit.society_id)
+
+        before = self.snapshots(permit.society_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            permit.status = "CANCELLED"
+            permit.save()
+        self.assertEqual(self.group_send.call_args_list[0].args[1]["content"]["delta"],
+                         {"active_permits": -1, "approved_kg_today": -permit.total_weight})
+        self.assertDeltasApply(before, permit.society_id)
+
+    def test_bulk_expiry_removes_todays_approved_weight(self):
+        permit = self.pending_permit()
+        PermitApplication.objects.filter(status="APPROVED", delivery_end__lt=timezone.localdate()).update(
+            status="EXPIRED"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            permit.approve(self.users["staff"])
+        PermitApplication.objects.filter(pk=permit.pk).update(delivery_end=timezone.localdate() - timedelta(days=1))
+
+        before = self.snapshots(permit.society_id)
+        self.group_send.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            dashboard.broadcast_bulk_status_change(PermitApplication.expire_overdue(), "APPROVED", "EXPIRED")
+        self.assertLess(self.group_send.call_args_list[0].args[1]["content"]["delta"]["approved_kg_today"], 0)
+        self.assertDeltasApply(before, permit.society_id)
+
+
+@LOCAL_SERVICES
+class BulkTransitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = synthetic.seed_dataset(SIZES)["staff"]
+
+    def test_bulk_actions_count_every_transition(self):
+        client = client_for(self.client, self.staff)
+        pending = list(PermitApplication.objects.filter(status="PENDING").values_list("id", flat=True))
+        half = len(pending) // 2
+        for action, status, ids, extra in (
+            ("bulk_approve", "APPROVED", pending[:half], {}),
+            ("bulk_reject", "REJECTED", pending[half:], {"rejection_reason": "Incomplete"}),
+        ):
+            counter = PERMIT_TRANSITIONS.labels(status=status)
+            before = counter._value.get()
+            response = client.post(f"/api/permits/permits/{action}/", {"permit_ids": ids, **extra},
+                                   content_type="application/json", secure=True)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(counter._value.get() - before, len(ids))
+
+
+@LOCAL_SERVICES
+@skipUnless(db_routing.replica_configured(), "needs a 'replica' database alias")
+class ReplicaRoutingTests(TestCase):
+    # The runner sets up every alias listed, even for a skipped class
+    databases = {"default", REPLICA} if db_routing.replica_configured() else {"default"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = synthetic.seed_dataset(SIZES)
+
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+        self.request = RequestFactory().get("/")
+        self.request.user = self.users["staff"]
+
+    def handle(self, view):
+        """Run ``view`` as a request through ReplicaRoutingMiddleware."""
+        return ReplicaRoutingMiddleware(lambda request: view())(self.request)
+
+    def test_reads_inside_replica_reads_use_the_replica(self):
+        def view():
+            self.assertIsNone(self.router.db_for_read(PermitApplication))
+            with replica_reads(self.request):
+                self.assertEqual(self.router.db_for_read(PermitApplication), REPLICA)
+
+        self.handle(view)
+
+    def test_writes_keep_the_request_and_the_user_on_the_primary(self):
+        def view():
+            with replica_reads(self.request):
+                self.router.db_for_write(PermitApplication)
+                self.assertIsNone(self.router.db_for_read(PermitApplication))
+
+        self.handle(view)
+        # The next request by the same user reads its own write from the primary
+        self.handle(lambda: self.assertFalse(self.route_replica()))
+
+    def route_replica(self):
+        with replica_reads(self.request):
+            return self.router.db_for_read(PermitApplication) == REPLICA
+
+    def test_expiry_sweep_does_not_pin_the_request(self):
+        PermitApplication.objects.filter(pk__in=PermitApplication.objects.values("pk")[:3]).update(
+            status="APPROVED", delivery_end=timezone.localdate() - timedelta(days=1)
+        )
+
+        def view():
+            with replica_reads(self.request):
+                self.assertEqual(len(PermitApplication.expire_overdue()), 3)
+                self.assertEqual(self.router.db_for_read(PermitApplication), REPLICA)
+
+        self.handle(view)
+        self.handle(lambda: self.assertTrue(self.route_replica()))
+
+    def test_unreachable_replica_falls_back_to_the_primary(self):
+        replica = mock.Mock(connection=None, **{"ensure_connection.side_effect": OperationalError("down")})
+        with mock.patch.object(db_routing, "connections", {REPLICA: replica}), \
+                mock.patch.object(db_routing, "_retry_after", 0.0), \
+                self.assertLogs("utils.db_routing", "WARNING"):
+            self.handle(lambda: self.assertFalse(self.route_replica()))
+            # Not retried until REPLICA_RETRY_INTERVAL has passed
+            self.handle(lambda: self.assertFalse(self.route_replica()))
+            self.assertEqual(replica.ensure_connection.call_count, 1)
+
+
+@LOCAL_SERVICES
+@override_settings(EXPORT_CHUNK_SIZE=7)
+class PermitExportTests(TestCase):
+    URL = "/api/permits/permits/export/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = synthetic.seed_dataset(SIZES)
+
+    def setUp(self):
+        reset_process_state()
+
+    def export(self, user, **params):
+        response = client_for(self.client, user).get(self.URL, params, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content)
+
+    def permit_ids(self, content):
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        return rows, {int(row["permit_id"]) for row in rows}
+
+    def test_csv_has_one_row_per_quantity_for_every_visible_permit(self):
+        rows, ids = self.permit_ids(self.export(self.users["staff"]))
+        self.assertEqual(list(rows[0]), exports.COLUMNS)
+        self.assertEqual(ids, set(PermitApplication.objects.values_list("id", flat=True)))
+        self.assertEqual(len(rows), CoffeeQuantity.objects.count()
+                         + PermitApplication.objects.filter(coffee_quantities__isnull=True).count())
+
+    def test_managers_only_export_their_own_society(self):
+        manager = self.users["manager"]
+        _, ids = self.permit_ids(self.export(manager))
+        self.assertEqual(ids, set(PermitApplication.objects.filter(
+            society=manager.managed_society).values_list("id", flat=True)))
+        self.assertLess(len(ids), PermitApplication.objects.count())
+
+    def test_export_applies_the_list_filters(self):
+        _, ids = self.permit_ids(self.export(self.users["staff"], status="REJECTED"))
+        self.assertEqual(ids, set(PermitApplication.objects.filter(status="REJECTED").values_list("id", flat=True)))
+
+    def test_ndjson(self):
+        lines = self.export(self.users["staff"], export_format="ndjson").decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(list(records[0]), exports.COLUMNS)
+        self.assertEqual({record["permit_id"] for record in records},
+                         set(PermitApplication.objects.values_list("id", flat=True)))
+
+    @skipUnless(exports.parquet_available(), "needs pyarrow")
+    def test_parquet(self):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(io.BytesIO(self.export(self.users["staff"], export_format="parquet")))
+        self.assertEqual(table.column_names, exports.COLUMNS)
+        self.assertEqual(set(table.column("permit_id").to_pylist()),
+                         set(PermitApplication.objects.values_list("id", flat=True)))
+
+    def test_parquet_without_pyarrow_is_not_implemented(self):
+        client = client_for(self.client, self.users["staff"])
+        with mock.patch("permits.views.parquet_available", return_value=False):
+            response = client.get(self.URL, {"export_format": "parquet"}, secure=True)
+        self.assertEqual(response.status_code, 501)
+
+    def test_unknown_format_is_rejected(self):
+        response = client_for(self.client, self.users["staff"]).get(self.URL, {"export_format": "xlsx"}, secure=True)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_export_is_an_async_stream_under_asgi(self):
+        client_for(self.async_client, self.users["staff"])
+        response = await self.async_client.get(self.URL, {"export_format": "ndjson"}, secure=True)
+        self.assertTrue(response.is_async)
+        pieces = [piece async for piece in response.streaming_content]
+        # One piece per keyset chunk of permits
+        permits = await PermitApplication.objects.acount()
+        self.assertEqual(len(pieces), -(-permits // 7))
+        ids = {json.loads(line)["permit_id"] for line in b"".join(pieces).decode().splitlines()}
+        self.assertEqual(len(ids), permits)
+
+
+@LOCAL_SERVICES
+class PermitImportTests(TestCase):
+    URL = "/api/permits/permits/import/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = synthetic.seed_dataset(SIZES)["manager"]
+        society = cls.manager.managed_society
+        cls.factory = society.factories.first()
+        cls.warehouse = Warehouse.objects.first()
+        cls.grades = list(CoffeeGrade.objects.order_by("id")[:2])
+
+    def setUp(self):
+        reset_process_state()
+        client_for(self.client, self.manager)
+
+    def test_csv_groups_lines_into_applications(self):
+        a, b = self.grades
+        text = (
+            "application,factory,warehouse,grade,bags_quantity\n"
+            f"A1,{self.factory.name},{self.warehouse.pk},{a.grade},10\n"
+            f"A1,{self.factory.pk},{self.warehouse.pk},{b.pk},5\n"
+            f"A2,{self.factory.pk},{self.warehouse.name},{a.grade},3\n"
+        )
+        applications = parse_csv(text)
+        self.assertEqual([application["row"] for application in applications], ["A1", "A2"])
+        self.assertEqual(len(applications[0]["coffee_quantities"]), 2)
+
+        upload = SimpleUploadedFile("permits.csv", text.encode(), content_type="text/csv")
+        response = self.client.post(self.URL, {"file": upload}, secure=True)
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body["created"], body["errors"]), (2, []))
+        permit = PermitApplication.objects.get(pk=body["permit_ids"][0])
+        self.assertEqual(
+            sorted(permit.coffee_quantities.values_list("coffee_grade_id", "bags_quantity")),
+            [(a.pk, 10), (b.pk, 5)],
+        )
+
+    def test_csv_without_required_columns_is_rejected(self):
+        with self.assertRaises(PermitImportError):
+            parse_csv("application,factory\nA1,1\n")
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        valid = {"factory_id": self.factory.pk, "warehouse_id": self.warehouse.pk,
+                 "coffee_quantities": [{"coffee_grade_id": self.grades[0].pk, "bags_quantity": 4}]}
+        applications = [
+            valid,
+            {**valid, "coffee_quantities": 5},
+            {**valid, "coffee_quantities": [7]},
+            {**valid, "coffee_quantities": []},
+            {**valid, "factory_id": 999999},
+            {**valid, "coffee_quantities": [{"coffee_grade_id": self.grades[0].pk, "bags_quantity": "lots"}]},
+            "not an application",
+        ]
+        response = self.client.post(self.URL, applications, content_type="application/json", secure=True)
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(body["created"], 1)
+        self.assertEqual({error["row"]: error["errors"] for error in body["errors"]}, {
+            2: ["coffee_quantities must be a list"],
+            3: ["Each coffee quantity must be an object"],
+            4: ["At least one coffee quantity is required"],
+            5: ["Factory must belong to the selected society"],
+            6: ["Number of bags must be a whole number"],
+            7: ["Each application must be an object"],
+        })
+
+    def test_malformed_upload_is_a_bad_request(self):
+        response = self.client.post(self.URL, {"applications": "nope"}, content_type="application/json", secure=True)
+        self.assertEqual(response.status_code, 400)
+
+    def test_applications_are_inserted_in_batches(self):
+        applications = parse_json([
+            {"factory_id": self.factory.pk, "warehouse_id": self.warehouse.pk,
+             "coffee_quantities": [{"coffee_grade_id": grade.pk, "bags_quantity": 2} for grade in self.grades]}
+            for _ in range(5)
+        ])
+        importer = PermitImporter(self.manager, batch_size=2)
+        # Per batch of up to 2: savepoint, permit INSERT, quantity INSERT, release
+        with self.captureOnCommitCallbacks(), self.assertNumQueries(3 * 4):
+            result = importer.run(applications)
+        self.assertEqual((len(result.permit_ids), result.errors), (5, []))
+        self.assertEqual(CoffeeQuantity.objects.filter(application_id__in=result.permit_ids).count(), 10)
+
+
+@LOCAL_SERVICES
+class BenchmarkCommandTests(TestCase):
+    # The command captures queries on every alias, including a configured replica
+    databases = {"default", REPLICA} if db_routing.replica_configured() else {"default"}
+    SIZES = ["--societies", "2", "--factories-per-society", "1", "--warehouses", "1", "--permits", "10",
+             "--notifications", "5"]
+    ENDPOINTS = ["--endpoint", "permitapplication-list", "--endpoint", "async_permit_detail"]
+    # Only query counts and statuses are stable enough to compare in a test run
+    TOLERANT = ["--max-time-ratio", "1000", "--max-alloc-ratio", "1000"]
+
+    def setUp(self):
+        reset_process_state()
+
+    def benchmark(self, *args):
+        out = io.StringIO()
+        call_command("benchmark_api", "--current-db", "--repeat", "1", *self.SIZES, *self.ENDPOINTS, *args,
+                     stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_run_records_every_role_and_compares_with_a_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.json")
+            self.benchmark("--output", output)
+            with open(output) as f:
+                report = json.load(f)
+            self.assertEqual(set(report["results"]), {
+                f"{role} {name}" for role in ("staff", "manager", "farmer")
+                for name in ("permitapplication-list", "async_permit_detail")
+            })
+            self.assertEqual(report["results"]["staff permitapplication-list"]["status"], 200)
+            # The synthetic rows are removed again
+            self.assertFalse(PermitApplication.objects.exists())
+
+            self.assertIn("No regressions", self.benchmark("--baseline", output, *self.TOLERANT))
+
+            report["results"]["staff permitapplication-list"]["queries"] -= 1
+            with open(output, "w") as f:
+                json.dump(report, f)
+            with self.assertRaisesMessage(CommandError, "1 regressions"):
+                self.benchmark("--baseline", output, *self.TOLERANT)
+
+
+@LOCAL_SERVICES
+class SeedLoadDataTests(TestCase):
+    ARGS = ["--societies", "3", "--factories-per-society", "2", "--warehouses", "2", "--permits", "50",
+            "--notifications", "20", "--batch-size", "7"]
+
+    def seed(self, *args):
+        call_command("seed_load_data", *self.ARGS, *args, stdout=io.StringIO())
+
+    def snapshot(self):
+        permits = PermitApplication.objects.order_by("id")
+        return (
+            list(permits.values_list("status", "society__name", "factory__name", "warehouse__name",
+                                     "application_date", "delivery_end")),
+            list(CoffeeQuantity.objects.order_by("application_id", "coffee_grade__grade")
+                 .values_list("coffee_grade__grade", "bags_quantity")),
+            list(Notification.objects.order_by("id").values_list("recipient__email", "is_read", "created_at")),
+        )
+
+    def test_sizes_determinism_and_clearing(self):
+        with mock.patch("django.utils.timezone.now", return_value=timezone.now()):
+            self.seed()
+            self.assertEqual(Society.objects.count(), 3)
+            self.assertEqual(Factory.objects.count(), 6)
+            self.assertEqual(Warehouse.objects.count(), 2)
+            self.assertEqual(PermitApplication.objects.count(), 50)
+            self.assertEqual(Notification.objects.count(), 20)
+            self.assertTrue(all(1 <= len(permit.coffee_quantities.all()) <= 3
+                                for permit in PermitApplication.objects.prefetch_related("coffee_quantities")))
+            # No approved permit is already past its delivery window
+            self.assertFalse(PermitApplication.objects.filter(
+                status="APPROVED", delivery_end__lt=timezone.localdate()).exists())
+            first = self.snapshot()
+
+            with self.assertRaises(CommandError):
+                self.seed()
+            self.seed("--clear")
+            self.assertEqual(self.snapshot(), first)
+
+        call_command("seed_load_data", "--clear-only", stdout=io.StringIO())
+        self.assertFalse(PermitApplication.objects.exists())
+        self.assertFalse(CustomUser.objects.exists())
+        self.assertTrue(CoffeeGrade.objects.exists())
+
+
+@LOCAL_SERVICES
+@override_settings(REQUEST_INSTRUMENTATION=True, REQUEST_INSTRUMENTATION_SLOW_MS=60000)
+class RequestInstrumentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = synthetic.seed_dataset(SIZES)
+
+    def setUp(self):
+        reset_process_state()
+        client_for(self.client, self.users["staff"])
+        client_for(self.async_client, self.users["staff"])
+
+    def record(self, logs):
+        [line] = logs.output
+        return json.loads(line.split(":", 2)[2])
+
+    def assertTimingMatches(self, response, record):
+        match = re.fullmatch(r'db;dur=[\d.]+;desc="(\d+) queries", app;dur=[\d.]+', response["Server-Timing"])
+        self.assertIsNotNone(match, response["Server-Timing"])
+        self.assertEqual(int(match.group(1)), record["queries"])
+
+    def test_sync_request_counts_every_query(self):
+        with CaptureQueriesContext(connection) as queries, \
+                self.assertLogs("utils.instrumentation", "INFO") as logs:
+            response = self.client.get("/api/permits/permits/", secure=True)
+        record = self.record(logs)
+        self.assertEqual(record["queries"], len(queries))
+        self.assertEqual((record["view"], record["status"]), ("permitapplication-list", 200))
+        self.assertEqual(record["response_bytes"], len(response.content))
+        self.assertTimingMatches(response, record)
+
+    async def test_async_request_counts_queries_from_worker_threads(self):
+        # The test database connection was opened before the middleware was enabled
+        await sync_to_async(instrumentation._install_on_open_connections)()
+        with self.assertLogs("utils.instrumentation", "INFO") as logs:
+            response = await self.async_client.get("/api/permits/async/permits/", secure=True)
+        record = self.record(logs)
+        self.assertEqual((record["view"], record["status"]), ("async_permit_list", 200))
+        # The count and the page, at least
+        self.assertGreaterEqual(record["queries"], 2)
+        self.assertTimingMatches(response, record)
+
+    @override_settings(REQUEST_INSTRUMENTATION_SLOW_MS=0, REQUEST_INSTRUMENTATION_SLOW_SAMPLE_RATE=1.0,
+                       REQUEST_INSTRUMENTATION_DUPLICATE_THRESHOLD=2)
+    def test_slow_requests_log_their_queries_and_repeated_shapes(self):
+        with self.assertLogs("utils.instrumentation", "WARNING") as logs:
+            self.client.get("/api/permits/permits/", secure=True)
+        record = self.record(logs)
+        self.assertEqual(len(record["query_log"]), record["queries"])
+
+        self.assertEqual(instrumentation.fingerprint("SELECT * FROM t WHERE id IN (%s, %s) AND name = 'a'"),
+                         instrumentation.fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'b'"))
+        stats = instrumentation.RequestStats()
+        stats.queries = [("SELECT * FROM t WHERE id = 1", 0), ("SELECT * FROM t WHERE id = 2", 0),
+                         ("SELECT * FROM u", 0)]
+        self.assertEqual(stats.duplicates(2), [{"sql": "SELECT * FROM t WHERE id = ?", "count": 2}])
+
+    @override_settings(REQUEST_INSTRUMENTATION=False)
+    def test_off_by_default(self):
+        self.assertNotIn("Server-Timing", self.client.get("/api/permits/permits/", secure=True))
+
+
+@LOCAL_SERVICES
+class MetricsEndpointTests(TestCase):
+    URL = "/metrics/"
+
+    def scrape(self, **headers):
+        return self.client.get(self.URL, secure=True, headers=headers)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_disabled_without_a_token(self):
+        self.assertEqual(self.scrape(Authorization="Bearer anything").status_code, 404)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_requires_the_bearer_token(self):
+        for headers in ({}, {"Authorization": "Bearer wrong"}, {"Authorization": "Basic s3cret"},
+                        {"Authorization": "s3cret"}):
+            response = self.scrape(**headers)
+            self.assertEqual(response.status_code, 401, headers)
+            self.assertEqual(response["WWW-Authenticate"], 'Bearer realm="metrics"')
+
+        PERMIT_TRANSITIONS.labels(status="APPROVED").inc()
+        response = self.scrape(Authorization="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn(b'permits_status_transitions_total{status="APPROVED"}', response.content)
+
+
+@LOCAL_SERVICES
+class ProfilingTests(TestCase):
+    URL = "/api/permits/coffee-grades/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = CustomUser.objects.create_user("staff@example.com", "pass", is_staff=True, is_active=True)
+        cls.farmer = CustomUser.objects.create_user("farmer@example.com", "pass", role="FARMER", is_active=True)
+
+    def setUp(self):
+        reset_process_state()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enabled = override_settings(PROFILING_ENABLED=True, PROFILING_DIR=directory.name)
+
+    def profile(self, user, **headers):
+        return client_for(self.client, user).get(self.URL, secure=True, headers={"X-Profile": "1", **headers})
+
+    def test_off_by_default(self):
+        response = self.profile(self.staff)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response)
+
+    def test_profile_ids_are_generated_by_the_server(self):
+        with self.enabled, self.assertLogs("utils.profiling", "INFO"):
+            first = self.profile(self.staff, **{"X-Request-ID": "req-1"})["X-Profile-Id"]
+            second = self.profile(self.staff, **{"X-Request-ID": "req-1"})["X-Profile-Id"]
+            unsafe = self.profile(self.staff, **{"X-Request-ID": "../../settings"})["X-Profile-Id"]
+            self.assertRegex(first, r"^[0-9a-f]{32}-req-1$")
+            self.assertNotEqual(first, second)
+            self.assertRegex(unsafe, r"^[0-9a-f]{32}$")
+            # Only staff can ask for a profile
+            self.assertNotIn("X-Profile-Id", self.profile(self.farmer))
+
+            response = client_for(self.client, self.staff).get(f"/api/profiles/{first}/", secure=True)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(client_for(self.client, self.farmer).get(
+                f"/api/profiles/{first}/", secure=True).status_code, 403)
+            self.assertEqual(client_for(self.client, self.staff).get(
+                "/api/profiles/not.a.profile/", secure=True).status_code, 404)
@@ -1,13 +1,16 @@
-from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
+from utils.throttling import RedisRateThrottle, RedisAnonRateThrottle
 
-class SocietyManagerRateThrottle(UserRateThrottle):
+class SocietyManagerRateThrottle(RedisRateThrottle):
+    scope = 'society_manager'
     rate = '100000/day'  # 100 requests per day for society managers
 
-class StaffRateThrottle(UserRateThrottle):
+class StaffRateThrottle(RedisRateThrottle):
+    scope = 'staff'
     rate = '2000000/day'  # 200 requests per day for staff members
 
-class FarmerRateThrottle(UserRateThrottle):
+class FarmerRateThrottle(RedisRateThrottle):
+    scope = 'farmer'
     rate = '500000/day'   # 50 requests per day for regular farmers
 
-class AnonRateThrottle(AnonRateThrottle):
+class AnonRateThrottle(RedisAnonRateThrottle):
     rate = '20000000/day'   # 20 requests per day for anonymous users
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import views, async_views
 
 router = DefaultRouter()
 router.register(r'coffee-grades', views.CoffeeGradeViewSet)
@@ -9,6 +9,16 @@ router.register(r'coffee-quantities', views.CoffeeQuantityViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('reference-data/', views.reference_data, name='reference_data'),
+    # Async-native read endpoints, same responses as the viewset routes above
+    path('async/permits/', async_views.permit_list, name='async_permit_list'),
+    path('async/permits/<int:pk>/', async_views.permit_detail, name='async_permit_detail'),
+    path('async/permits/my_permits/', async_views.my_permits, name='async_my_permits'),
+    path('async/permits/society_metrics/', async_views.society_metrics, name='async_society_metrics'),
+    path('async/permits/staff_metrics/', async_views.staff_metrics, name='async_staff_metrics'),
+    path('async/permits/top-societies/', async_views.top_societies, name='async_top_societies'),
+    path('async/permits/top-grades/', async_views.top_grades, name='async_top_grades'),
+    path('async/permits/top-factories/', async_views.top_factories, name='async_top_factories'),
     path('permits/<int:permit_id>/pdf/', views.generate_permit_pdf, name='permit_pdf'),
     path('analytics-report-pdf/', views.analytics_report_pdf, name='analytics_report_pdf'),
 ]
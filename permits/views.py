@@ -16,6 +16,8 @@ from .serializers import (
     CoffeeGradeSerializer,
     CoffeeQuantitySerializer,
 )
+from societies.serializers import SocietySerializer
+from users.serializers import UserSerializer
 from django.db.models import Q, F, Sum, FloatField, Count
 from django_filters.rest_framework import DjangoFilterBackend
 from .filters import PermitApplicationFilter
@@ -36,17 +38,31 @@ from .throttling import (
 )
 from django.db.models.functions import TruncDay, TruncWeek, TruncMonth, TruncQuarter
 import datetime
+import json
 from datetime import timedelta
 import pandas as pd
-from rest_framework.pagination import PageNumberPagination
+from utils.db_routing import reads_from_replica, replica_db
+from utils.exports import export_chunk_size, streaming_response
+from utils.metrics import PDF_RENDER_SECONDS, PERMIT_TRANSITIONS
+from utils.pagination import StandardResultsSetPagination
 from users.utils import notify_user
+from users.authentication import get_principal
+from .dashboard import broadcast_bulk_status_change
+from .grades import grade_registry, weighted_totals
+from .exports import FORMATS as EXPORT_FORMATS, encode_chunks, iter_permit_chunks, parquet_available
+from .imports import PermitImporter, PermitImportError, parse_csv, parse_json
+from utils.reference_cache import cached_reference_response, scope_for_user
+from societies.models import Factory, CoffeePrice
+from societies.serializers import FactorySerializer, CoffeePriceSerializer
+from warehouse.models import Warehouse
+from warehouse.serializers import WarehouseSerializer
 
 logger = logging.getLogger(__name__)
 
 
 class IsSocietyManager(BasePermission):
     def has_permission(self, request, view):
-        return request.user.managed_society is not None
+        return get_principal(request).is_society_manager
 
 
 class CoffeeGradeViewSet(viewsets.ModelViewSet):
@@ -60,30 +76,77 @@ class CoffeeGradeViewSet(viewsets.ModelViewSet):
             return [permissions.IsAuthenticated()]
         return [permissions.IsAdminUser()]
 
+    def list(self, request, *args, **kwargs):
+        return cached_reference_response(
+            request, ["grades"], "all",
+            lambda: self.get_serializer(self.filter_queryset(self.get_queryset()), many=True).data,
+        )
+
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 100
-    page_size_query_param = 'page_size'
-    max_page_size = 1000
+def filter_my_permits(queryset, params):
+    """Apply the query-string filters accepted by ``my_permits``."""
+    status = params.get("status")
+    if status:
+        queryset = queryset.filter(status=status)
+    start_date = params.get("start_date")
+    if start_date:
+        queryset = queryset.filter(application_date__gte=start_date)
+    end_date = params.get("end_date")
+    if end_date:
+        queryset = queryset.filter(application_date__lte=end_date)
+    society = params.get("society")
+    if society:
+        queryset = queryset.filter(society_id=society)
+    factory = params.get("factory")
+    if factory:
+        queryset = queryset.filter(factory_id=factory)
+    warehouse = params.get("warehouse")
+    if warehouse:
+        queryset = queryset.filter(warehouse_id=warehouse)
+    min_quantity = params.get("min_quantity")
+    if min_quantity:
+        queryset = queryset.filter(total_weight__gte=min_quantity)
+    max_quantity = params.get("max_quantity")
+    if max_quantity:
+        queryset = queryset.filter(total_weight__lte=max_quantity)
+
+    return queryset
+
+
+def scope_permits(queryset, principal):
+    """Limit permits to what ``principal`` may see: staff everything, managers their society, farmers their own."""
+    if principal.is_staff:
+        return queryset
+    elif principal.is_society_manager:
+        return queryset.filter(society_id=principal.managed_society_id)
+    return queryset.filter(farmer_id=principal.user_id)
 
 
 class PermitApplicationViewSet(viewsets.ModelViewSet):
-    queryset = PermitApplication.objects.all().order_by("-application_date")
+    queryset = PermitApplication.objects.select_related(
+        "factory",
+        "warehouse",
+        *SocietySerializer.select_related_paths("society__"),
+        *UserSerializer.select_related_paths("farmer__"),
+        *UserSerializer.select_related_paths("approved_by__"),
+        *UserSerializer.select_related_paths("rejected_by__"),
+    ).prefetch_related("coffee_quantities__coffee_grade").order_by("-application_date")
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_class = PermitApplicationFilter
     pagination_class = StandardResultsSetPagination
 
     def get_throttles(self):
-        if self.request.user.is_staff:
+        principal = get_principal(self.request)
+        if principal.is_staff:
             return [StaffRateThrottle()]
-        elif self.request.user.managed_society is not None:
+        elif principal.is_society_manager:
             return [SocietyManagerRateThrottle()]
         else:
             return [FarmerRateThrottle()]
 
     def get_permissions(self):
-        if self.action in ["create", "update", "partial_update", "destroy"]:
+        if self.action in ["create", "update", "partial_update", "destroy", "bulk_import"]:
             return [IsSocietyManager()]
         return [permissions.IsAuthenticated()]
 
@@ -109,24 +172,13 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
             )
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        user = self.request.user
-
-        # Update status for each permit in the queryset
-        for permit in queryset:
-            permit.update_status()
+        # Expire overdue permits once per request with a single UPDATE
+        if not getattr(self, "_expired_overdue", False):
+            self._expired_overdue = True
+            broadcast_bulk_status_change(PermitApplication.expire_overdue(), "APPROVED", "EXPIRED")
 
-        # Filter based on user role
-        if user.is_staff:
-            return queryset  # Staff sees all permits
-        elif user.managed_society is not None:
-            return queryset.filter(
-                society__manager=user
-            )  # Manager sees only their society's permits
-        else:
-            return queryset.filter(
-                farmer=user
-            )  # Regular farmers see only their permits
+        # Staff see all permits, managers their society's, farmers their own
+        return scope_permits(super().get_queryset(), get_principal(self.request))
 
     @action(detail=True, methods=["post"])
     def approve(self, request, pk=None):
@@ -142,6 +194,7 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
         permit.approved_by = request.user
         permit.approved_at = timezone.now()
         permit.save()
+        PERMIT_TRANSITIONS.labels(status="APPROVED").inc()
 
         # Notify the permit owner (society manager)
         notify_user(permit.society.manager,
@@ -182,6 +235,7 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
         permit.rejected_by = request.user
         permit.rejected_at = timezone.now()
         permit.save()
+        PERMIT_TRANSITIONS.labels(status="REJECTED").inc()
 
         # Notify the permit owner (society manager)
         notify_user(permit.society.manager,
@@ -212,6 +266,7 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
 
         permit.status = "CANCELLED"
         permit.save()
+        PERMIT_TRANSITIONS.labels(status="CANCELLED").inc()
 
         # Notify the permit owner (society manager)
         notify_user(permit.society.manager,
@@ -232,38 +287,14 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=["get"])
     def my_permits(self, request):
-        queryset = PermitApplication.objects.all()
-        if request.user.managed_society is not None:
-            queryset = queryset.filter(society__manager=request.user)
+        queryset = self.queryset.all()
+        principal = get_principal(request)
+        if principal.is_society_manager:
+            queryset = queryset.filter(society_id=principal.managed_society_id)
         else:
             queryset = queryset.filter(farmer=request.user)
 
-        # Apply filters
-        status = request.query_params.get("status")
-        if status:
-            queryset = queryset.filter(status=status)
-        start_date = request.query_params.get("start_date")
-        if start_date:
-            queryset = queryset.filter(application_date__gte=start_date)
-        end_date = request.query_params.get("end_date")
-        if end_date:
-            queryset = queryset.filter(application_date__lte=end_date)
-        society = request.query_params.get("society")
-        if society:
-            queryset = queryset.filter(society_id=society)
-        factory = request.query_params.get("factory")
-        if factory:
-            queryset = queryset.filter(factory_id=factory)
-        warehouse = request.query_params.get("warehouse")
-        if warehouse:
-            queryset = queryset.filter(warehouse_id=warehouse)
-        min_quantity = request.query_params.get("min_quantity")
-        if min_quantity:
-            queryset = queryset.filter(total_weight__gte=min_quantity)
-        max_quantity = request.query_params.get("max_quantity")
-        if max_quantity:
-            queryset = queryset.filter(total_weight__lte=max_quantity)
-
+        queryset = filter_my_permits(queryset, request.query_params)
         queryset = queryset.order_by("-application_date")
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
@@ -276,10 +307,11 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
         pending_permits = queryset.filter(status="PENDING")
 
         # Apply role-based filtering
-        if not request.user.is_staff:
-            if request.user.managed_society is not None:
+        principal = get_principal(request)
+        if not principal.is_staff:
+            if principal.is_society_manager:
                 # For society managers, show only their society's pending permits
-                pending_permits = pending_permits.filter(society__manager=request.user)
+                pending_permits = pending_permits.filter(society_id=principal.managed_society_id)
             else:
                 # For regular farmers, show only their pending permits
                 pending_permits = pending_permits.filter(farmer=request.user)
@@ -288,15 +320,17 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=["get"])
+    @reads_from_replica
     def society_metrics(self, request):
-        if not request.user.managed_society is not None:
+        principal = get_principal(request)
+        if not principal.is_society_manager:
             return Response(
                 {"error": "Only society managers can access these metrics"},
                 status=status.HTTP_403_FORBIDDEN,
             )
 
         society_permits = PermitApplication.objects.filter(
-            society__manager=request.user
+            society_id=principal.managed_society_id
         )
         total_permits = society_permits.count()
         active_permits = society_permits.filter(status="APPROVED").count()
@@ -313,6 +347,7 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
         )
 
     @action(detail=False, methods=["get"])
+    @reads_from_replica
     def staff_metrics(self, request):
 
         if not request.user.is_staff:
@@ -341,6 +376,41 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
             }
         )
 
+    @action(detail=False, methods=["post"], url_path="import")
+    def bulk_import(self, request):
+        """
+        Creates many applications for the manager's society at once from an uploaded
+        CSV or JSON ``file``, or a JSON list in the body. Valid applications are created
+        even when others fail; the response lists the errors per row.
+        """
+        upload = request.FILES.get("file")
+        try:
+            if upload is not None:
+                text = upload.read().decode("utf-8-sig")
+                if upload.name.lower().endswith(".csv") or upload.content_type == "text/csv":
+                    applications = parse_csv(text)
+                else:
+                    applications = parse_json(json.loads(text))
+            else:
+                applications = parse_json(request.data)
+            max_applications = getattr(settings, "PERMIT_IMPORT_MAX_APPLICATIONS", 1000)
+            if len(applications) > max_applications:
+                raise PermitImportError(
+                    f"At most {max_applications} applications can be imported per request"
+                )
+            result = PermitImporter(request.user).run(applications)
+        except (PermitImportError, UnicodeDecodeError, ValueError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            {
+                "created": len(result.permit_ids),
+                "permit_ids": result.permit_ids,
+                "errors": result.errors,
+            },
+            status=status.HTTP_201_CREATED if result.permit_ids else status.HTTP_400_BAD_REQUEST,
+        )
+
     @action(detail=False, methods=["post"])
     def bulk_approve(self, request):
         if not request.user.is_staff:
@@ -365,6 +435,7 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
             permit.approved_by = request.user
             permit.approved_at = current_time
             permit.save()
+        PERMIT_TRANSITIONS.labels(status="APPROVED").inc(len(permits))
         serializer = self.get_serializer(permits, many=True)
         return Response(
             {
@@ -404,6 +475,7 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
             permit.rejected_by = request.user
             permit.rejected_at = current_time
             permit.save()
+        PERMIT_TRANSITIONS.labels(status="REJECTED").inc(len(permits))
         serializer = self.get_serializer(permits, many=True)
         return Response(
             {
@@ -412,7 +484,36 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
             }
         )
 
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """
+        Streams the filtered permits, one row per coffee quantity, as CSV, NDJSON or
+        Parquet (``?export_format=``). Accepts the same filters as the list endpoint.
+        """
+        fmt = request.query_params.get("export_format", "csv")
+        if fmt not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"export_format must be one of: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if fmt == "parquet" and not parquet_available():
+            return Response(
+                {"error": "Parquet export is not available on this server"},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+
+        # Rows are read while the response streams, after the view has returned
+        permits = self.filter_queryset(self.get_queryset()).using(replica_db(request))
+        content_type, extension = EXPORT_FORMATS[fmt]
+        return streaming_response(
+            request,
+            encode_chunks(fmt, iter_permit_chunks(permits, export_chunk_size())),
+            content_type,
+            f"permits.{extension}",
+        )
+
     @action(detail=False, methods=["get"], url_path="analytics")
+    @reads_from_replica
     def analytics(self, request):
         """
         Returns permit counts grouped by period (day/week/month) and status.
@@ -476,6 +577,7 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
         return Response(chart_data)
 
     @action(detail=False, methods=["get"], url_path="coffee-analytics", throttle_classes=[AnonRateThrottle, StaffRateThrottle])
+    @reads_from_replica
     def coffee_analytics(self, request):
         """
         Returns total coffee moved grouped by period (day/week/month) and grade.
@@ -511,12 +613,8 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
         coffee_quantities = CoffeeQuantity.objects.filter(application__in=permits)
 
         # Annotate period and grade, sum total_weight
-        grouped = (
-            coffee_quantities
-            .annotate(period=trunc_func)
-            .values("period", "coffee_grade__grade")
-            .annotate(total_weight=Sum(F("bags_quantity") * F("coffee_grade__weight_per_bag"), output_field=FloatField()))
-            .order_by("period")
+        grouped = weighted_totals(
+            coffee_quantities.annotate(period=trunc_func), ["period", "grade"], total="total_weight"
         )
 
         # Pivot to {period: {grade1: total, grade2: total, ...}}
@@ -534,10 +632,10 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
                 period = str(row["period"])
             if period not in result:
                 result[period] = {}
-            result[period][row["coffee_grade__grade"]] = row["total_weight"]
+            result[period][row["grade"]] = row["total_weight"]
 
         # Get all grades
-        all_grades = list(CoffeeGrade.objects.values_list("grade", flat=True))
+        all_grades = grade_registry.names()
         chart_data = []
 
         # --- NEW: Ensure all periods (weeks/quarters) in range are present ---
@@ -593,6 +691,7 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
         return Response(chart_data)
 
     @action(detail=False, methods=["get"], url_path="top-societies", throttle_classes=[AnonRateThrottle, StaffRateThrottle])
+    @reads_from_replica
     def top_societies(self, request):
         """
         Returns top societies by total coffee moved (with filters).
@@ -612,12 +711,7 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
 
         # Join CoffeeQuantity and group by society
         coffee_quantities = CoffeeQuantity.objects.filter(application__in=permits)
-        grouped = (
-            coffee_quantities
-            .values("application__society__id", "application__society__name")
-            .annotate(total_kg=Sum(F("bags_quantity") * F("coffee_grade__weight_per_bag"), output_field=FloatField()))
-            .order_by("-total_kg")
-        )
+        grouped = weighted_totals(coffee_quantities, ["application__society__id", "application__society__name"])
 
         # Return top 3 (or all if you want)
         result = [
@@ -634,6 +728,7 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
         return Response(result)
 
     @action(detail=False, methods=["get"], url_path="top-grades", throttle_classes=[AnonRateThrottle, StaffRateThrottle])
+    @reads_from_replica
     def top_grades(self, request):
         """
         Returns top coffee grades by total coffee moved (with filters).
@@ -655,17 +750,12 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
 
         coffee_quantities = CoffeeQuantity.objects.filter(application__in=permits)
         if exclude_grades:
-            coffee_quantities = coffee_quantities.exclude(coffee_grade__grade__in=exclude_grades)
-        grouped = (
-            coffee_quantities
-            .values("coffee_grade__grade")
-            .annotate(total_kg=Sum(F("bags_quantity") * F("coffee_grade__weight_per_bag"), output_field=FloatField()))
-            .order_by("-total_kg")
-        )
+            coffee_quantities = coffee_quantities.exclude(coffee_grade_id__in=grade_registry.ids_for(exclude_grades))
+        grouped = weighted_totals(coffee_quantities, ["grade"])
 
         result = [
             {
-                "grade": row["coffee_grade__grade"],
+                "grade": row["grade"],
                 "totalKg": row["total_kg"] or 0,
             }
             for row in grouped
@@ -676,6 +766,7 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
         return Response(result)
 
     @action(detail=False, methods=["get"], url_path="permits-cumulative-status")
+    @reads_from_replica
     def permits_cumulative_status(self, request):
         """
         Returns cumulative count of approved and rejected permits by day.
@@ -725,6 +816,7 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
         return Response(result)
 
     @action(detail=False, methods=["get"], url_path="top-factories", throttle_classes=[AnonRateThrottle, StaffRateThrottle])
+    @reads_from_replica
     def top_factories(self, request):
         """
         Returns top factories by total coffee moved (with filters).
@@ -752,13 +844,8 @@ class PermitApplicationViewSet(viewsets.ModelViewSet):
         # Join CoffeeQuantity and group by factory
         coffee_quantities = CoffeeQuantity.objects.filter(application__in=permits)
         if exclude_grades:
-            coffee_quantities = coffee_quantities.exclude(coffee_grade__grade__in=exclude_grades)
-        grouped = (
-            coffee_quantities
-            .values("application__factory__id", "application__factory__name")
-            .annotate(total_kg=Sum(F("bags_quantity") * F("coffee_grade__weight_per_bag"), output_field=FloatField()))
-            .order_by("-total_kg")
-        )
+            coffee_quantities = coffee_quantities.exclude(coffee_grade_id__in=grade_registry.ids_for(exclude_grades))
+        grouped = weighted_totals(coffee_quantities, ["application__factory__id", "application__factory__name"])
 
         # Return top 3 (or all if you want)
         result = [
@@ -788,6 +875,39 @@ class CoffeeQuantityViewSet(viewsets.ModelViewSet):
         return CoffeeQuantity.objects.filter(application__farmer=user)
 
 
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated])
+def reference_data(request):
+    """
+    Everything the permit form needs in one conditional GET: coffee grades, active
+    warehouses, the user's active factories and this coffee year's active prices.
+    """
+    user = request.user
+    coffee_year = CoffeePrice.get_current_coffee_year()
+
+    def build():
+        factories = Factory.objects.filter(is_active=True).order_by("-date_added")
+        prices = CoffeePrice.objects.select_related("society", "coffee_grade").filter(
+            coffee_year=coffee_year, is_active=True
+        )
+        if user.role != "ADMIN":
+            factories = factories.filter(society__manager=user)
+            prices = prices.filter(society__manager=user)
+        return {
+            "grades": CoffeeGradeSerializer(CoffeeGrade.objects.all(), many=True).data,
+            "warehouses": WarehouseSerializer(Warehouse.objects.filter(is_active=True), many=True).data,
+            "factories": FactorySerializer(factories, many=True).data,
+            "prices": CoffeePriceSerializer(prices, many=True).data,
+        }
+
+    return cached_reference_response(
+        request,
+        ["grades", "warehouses", "factories", "prices"],
+        f"{scope_for_user(user)}|{coffee_year}",
+        build,
+    )
+
+
 @api_view(["GET"])
 @permission_classes([permissions.IsAuthenticated])
 def generate_permit_pdf(request, permit_id):
@@ -850,8 +970,8 @@ def generate_permit_pdf(request, permit_id):
                 "permit": permit_data,
             },
         )
-        html = HTML(string=html_string)
-        pdf = html.write_pdf()
+        with PDF_RENDER_SECONDS.labels(document="permit").time():
+            pdf = HTML(string=html_string).write_pdf()
         response = HttpResponse(pdf, content_type="application/pdf")
         response["Content-Disposition"] = (
             f'attachment; filename="permit_{permit.ref_no}.pdf"'
@@ -864,6 +984,7 @@ def generate_permit_pdf(request, permit_id):
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 @throttle_classes([AnonRateThrottle, StaffRateThrottle])
+@reads_from_replica
 def analytics_report_pdf(request):
     try:
         user = request.user
@@ -885,12 +1006,13 @@ def analytics_report_pdf(request):
         else:
             exclude_grades = []
         # Role-based access control
-        if user.is_staff:
+        principal = get_principal(request)
+        if principal.is_staff:
             permitted_society_id = society_id
-        elif hasattr(user, "managed_society") and user.managed_society is not None:
-            if society_id is not None and int(society_id) != int(user.managed_society.id):
+        elif principal.is_society_manager:
+            if society_id is not None and int(society_id) != principal.managed_society_id:
                 raise PermissionDenied("You are not authorized to access this society's data.")
-            permitted_society_id = user.managed_society.id
+            permitted_society_id = principal.managed_society_id
         else:
             farmer_permits = PermitApplication.objects.filter(farmer=user)
             farmer_society_ids = set(farmer_permits.values_list("society_id", flat=True))
@@ -902,16 +1024,16 @@ def analytics_report_pdf(request):
             permits = permits.filter(application_date__date__gte=start_date)
         if end_date:
             permits = permits.filter(application_date__date__lte=end_date)
-        if user.is_staff:
+        if principal.is_staff:
             if permitted_society_id:
                 permits = permits.filter(society_id=permitted_society_id)
-        elif hasattr(user, "managed_society") and user.managed_society is not None:
+        elif principal.is_society_manager:
             permits = permits.filter(society_id=permitted_society_id)
         else:
             permits = permits.filter(society_id__in=permitted_society_id, farmer=user)
         # --- Total Coffee Moved (by period and grade) ---
         total_coffee = []
-        all_grades = list(CoffeeGrade.objects.values_list("grade", flat=True))
+        all_grades = grade_registry.names()
         if include_total:
             from .models import CoffeeQuantity
             # Choose truncation function based on granularity
@@ -926,13 +1048,9 @@ def analytics_report_pdf(request):
 
             coffee_quantities = CoffeeQuantity.objects.filter(application__in=permits)
             if exclude_grades:
-                coffee_quantities = coffee_quantities.exclude(coffee_grade__grade__in=exclude_grades)
-            grouped = (
-                coffee_quantities
-                .annotate(period=trunc_func)
-                .values("period", "coffee_grade__grade")
-                .annotate(total_weight=Sum(F("bags_quantity") * F("coffee_grade__weight_per_bag"), output_field=FloatField()))
-                .order_by("period")
+                coffee_quantities = coffee_quantities.exclude(coffee_grade_id__in=grade_registry.ids_for(exclude_grades))
+            grouped = weighted_totals(
+                coffee_quantities.annotate(period=trunc_func), ["period", "grade"], total="total_weight"
             )
             # Pivot to {period: {grade1: total, grade2: total, ...}}
             result = {}
@@ -949,7 +1067,7 @@ def analytics_report_pdf(request):
                     period = str(row["period"])
                 if period not in result:
                     result[period] = {}
-                result[period][row["coffee_grade__grade"]] = row["total_weight"]
+                result[period][row["grade"]] = row["total_weight"]
             # Format for template
             for period in sorted(result.keys()):
                 entry = {"period": period}
@@ -962,12 +1080,7 @@ def analytics_report_pdf(request):
         if include_top_factories:
             from .models import CoffeeQuantity
             coffee_quantities = CoffeeQuantity.objects.filter(application__in=permits)
-            grouped = (
-                coffee_quantities
-                .values("application__factory__id", "application__factory__name")
-                .annotate(total_kg=Sum(F("bags_quantity") * F("coffee_grade__weight_per_bag"), output_field=FloatField()))
-                .order_by("-total_kg")
-            )
+            grouped = weighted_totals(coffee_quantities, ["application__factory__id", "application__factory__name"])
             top_factories = [
                 {
                     "factory_id": row["application__factory__id"],
@@ -982,12 +1095,7 @@ def analytics_report_pdf(request):
         if include_top_societies:
             from .models import CoffeeQuantity
             coffee_quantities = CoffeeQuantity.objects.filter(application__in=permits)
-            grouped = (
-                coffee_quantities
-                .values("application__society__id", "application__society__name")
-                .annotate(total_kg=Sum(F("bags_quantity") * F("coffee_grade__weight_per_bag"), output_field=FloatField()))
-                .order_by("-total_kg")
-            )
+            grouped = weighted_totals(coffee_quantities, ["application__society__id", "application__society__name"])
             top_societies = [
                 {
                     "society_id": row["application__society__id"],
@@ -1002,15 +1110,10 @@ def analytics_report_pdf(request):
         if include_top_grades:
             from .models import CoffeeQuantity
             coffee_quantities = CoffeeQuantity.objects.filter(application__in=permits)
-            grouped = (
-                coffee_quantities
-                .values("coffee_grade__grade")
-                .annotate(total_kg=Sum(F("bags_quantity") * F("coffee_grade__weight_per_bag"), output_field=FloatField()))
-                .order_by("-total_kg")
-            )
+            grouped = weighted_totals(coffee_quantities, ["grade"])
             top_grades = [
                 {
-                    "grade": row["coffee_grade__grade"],
+                    "grade": row["grade"],
                     "totalKg": row["total_kg"] or 0,
                 }
                 for row in grouped
@@ -1040,8 +1143,8 @@ def analytics_report_pdf(request):
                 "all_grades": all_grades,
             },
         )
-        html = HTML(string=html_string)
-        pdf = html.write_pdf()
+        with PDF_RENDER_SECONDS.labels(document="analytics_report").time():
+            pdf = HTML(string=html_string).write_pdf()
         response = HttpResponse(pdf, content_type="application/pdf")
         response["Content-Disposition"] = 'attachment; filename="analytics_report.pdf"'
         return response
@@ -55,6 +55,15 @@ SIMPLE_JWT = {
     "REFRESH_COOKIE_SECURE": True,
 }
 
+# Authentication caches (users.authentication.CachedJWTCookieAuthentication)
+AUTH_USER_CACHE_TTL = config("AUTH_USER_CACHE_TTL", default=30, cast=int)  # seconds, 0 disables
+AUTH_USER_CACHE_MAX_SIZE = 10000
+REVOCATION_SYNC_INTERVAL = 30  # seconds between blacklist top-ups of the in-process filter
+REVOCATION_REBUILD_INTERVAL = 600  # seconds between full filter rebuilds
+REVOCATION_FILTER_CAPACITY = 100000
+TOKEN_COMPACTION_BATCH_SIZE = 1000  # manage.py compact_token_blacklist
+TOKEN_COMPACTION_INTERVAL = 3600
+
 # dj-rest-auth Configuration
 REST_AUTH = {
     "USE_JWT": True,
@@ -178,6 +187,8 @@ CORS_ALLOW_HEADERS = [
 ]
 
 MIDDLEWARE = [
+    "utils.instrumentation.RequestInstrumentationMiddleware",  # No-op unless REQUEST_INSTRUMENTATION is set
+    "utils.db_routing.ReplicaRoutingMiddleware",  # No-op unless a read replica is configured
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -190,11 +201,68 @@ MIDDLEWARE = [
     "csp.middleware.CSPMiddleware",  # Changed from django_csp to csp
     "users.middleware.CsrfTokenMiddleware",  # Add our custom CSRF middleware
     "users.middleware.SecurityMiddleware",
+    "utils.profiling.ProfilingMiddleware",  # Last, so it runs in the same thread as sync views
 ]
 
 # Security settings
 MAX_FAILED_ATTEMPTS = 5
 ACCOUNT_LOCKOUT_DURATION = 30  # minutes
+IP_TRACKING_FLUSH_INTERVAL = 60  # seconds between last_login_ip write-backs
+
+# Password hashing offload (users.hashing.password_hasher)
+PASSWORD_HASH_WORKERS = config("PASSWORD_HASH_WORKERS", default=2, cast=int)  # threads for async logins; 0 hashes inline
+PASSWORD_HASH_MAX_CONCURRENCY = config("PASSWORD_HASH_MAX_CONCURRENCY", default=16, cast=int)  # beyond this, answer 503
+
+# Notification retention (see `manage.py prune_notifications`)
+NOTIFICATION_RETENTION_DAYS = config("NOTIFICATION_RETENTION_DAYS", default=90, cast=int)
+NOTIFICATION_RETENTION_BATCH_SIZE = 1000
+
+# Reference data (grades, warehouses, factories, prices) served with ETags by utils.reference_cache
+REFERENCE_DATA_MAX_AGE = 60  # seconds browsers may reuse a response without revalidating
+REFERENCE_DATA_CACHE_TIMEOUT = 86400  # seconds a built payload stays in the shared cache
+GRADE_REGISTRY_CHECK_INTERVAL = 5  # seconds between checks of the shared grades version (permits.grades)
+
+# Streaming exports (utils.exports)
+EXPORT_CHUNK_SIZE = config("EXPORT_CHUNK_SIZE", default=2000, cast=int)  # rows read per keyset query
+
+# Bulk permit import (permits.imports)
+PERMIT_IMPORT_BATCH_SIZE = 500  # applications inserted per transaction
+PERMIT_IMPORT_MAX_APPLICATIONS = 1000  # per API request; manage.py import_permits has no limit
+
+# Per-request SQL and timing instrumentation (utils.instrumentation), logged as JSON lines
+REQUEST_INSTRUMENTATION = config("REQUEST_INSTRUMENTATION", default=False, cast=bool)
+REQUEST_INSTRUMENTATION_SLOW_MS = config("REQUEST_INSTRUMENTATION_SLOW_MS", default=500, cast=int)
+REQUEST_INSTRUMENTATION_SLOW_SAMPLE_RATE = 0.1  # share of slow requests logged with their queries
+REQUEST_INSTRUMENTATION_MAX_LOGGED_QUERIES = 100
+REQUEST_INSTRUMENTATION_DUPLICATE_THRESHOLD = 3  # same query shape this often in one request is reported
+
+# Sampling profiler (utils.profiling): staff profile a request with ?profile=1 or an X-Profile: 1 header.
+# Opt-in: while enabled the middleware is sync-only and pins async views to the sync thread
+PROFILING_ENABLED = config("PROFILING_ENABLED", default=False, cast=bool)
+PROFILING_SAMPLE_EVERY = config("PROFILING_SAMPLE_EVERY", default=0, cast=int)  # also profile ~1 in N requests (0 disables)
+PROFILING_INTERVAL = 0.005  # seconds between stack samples
+PROFILING_DIR = BASE_DIR / "logs" / "profiles"
+PROFILING_MAX_FILES = 200  # oldest profiles are deleted beyond this
+
+# Read replica (utils.db_routing): a user's reads stay on the primary for this many seconds
+# after they write, and reference data changed more recently than this is built from the primary
+DATABASE_REPLICA_LAG = config("DATABASE_REPLICA_LAG", default=10, cast=int)
+
+# Prometheus scrape endpoint (utils.metrics); disabled unless a bearer token is set.
+# Set PROMETHEUS_MULTIPROC_DIR in the environment when running several worker processes.
+METRICS_TOKEN = config("METRICS_TOKEN", default=None)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "utils.instrumentation": {"handlers": ["console"], "level": "INFO", "propagate": False},
+        "utils.profiling": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
 
 
 ROOT_URLCONF = "server.urls"
@@ -255,6 +323,20 @@ DATABASES = {
     }
 }
 
+# Optional read replica for analytics, exports and reference data (utils.db_routing).
+# Writes always go to "default"; reads fall back to it when the replica is unreachable.
+# For local testing point DB_REPLICA_NAME at a copy of the primary database.
+if config("DB_REPLICA_HOST", default=None) or config("DB_REPLICA_NAME", default=None):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": config("DB_REPLICA_NAME", default=DATABASES["default"]["NAME"]),
+        "HOST": config("DB_REPLICA_HOST", default=DATABASES["default"]["HOST"]),
+        "PORT": config("DB_REPLICA_PORT", default=DATABASES["default"]["PORT"]),
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["utils.db_routing.ReplicaRouter"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -303,7 +385,7 @@ AUTH_USER_MODEL = "users.CustomUser"
 # REST Framework settings
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "dj_rest_auth.jwt_auth.JWTCookieAuthentication",
+        "users.authentication.CachedJWTCookieAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "DEFAULT_THROTTLE_CLASSES": [
@@ -385,4 +467,35 @@ CHANNEL_LAYERS = {
         },
     },
 }
+
+# Shared cache; utils.reference_cache keeps reference-data versions and payloads here
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "{scheme}://{host}:{port}/{db}".format(
+            scheme="rediss" if redis_config.get("ssl") else "redis",
+            host=redis_config["host"],
+            port=redis_config["port"],
+            db=config("CACHE_REDIS_DB", default=2, cast=int),
+        ),
+        "OPTIONS": {"password": redis_config["password"]},
+    }
+}
+
+# Shared rate-limit counters for utils.throttling (set to None to use per-process counters)
+THROTTLE_REDIS = {
+    **redis_config,
+    "db": config("THROTTLE_REDIS_DB", default=1, cast=int),
+}
+#################### [ END ] ####################
+
+
+#################### [WEBSOCKET CONFIGURATIONS] ####################
+# Seconds a websocket connection reuses the identity resolved from its JWT
+# before reading the user row again (0 disables the cache)
+WEBSOCKET_USER_CACHE_TTL = config("WEBSOCKET_USER_CACHE_TTL", default=60, cast=int)
+WEBSOCKET_USER_CACHE_MAX_SIZE = 10000
+# Seconds during which further notifications of the same type are merged into
+# one batched websocket message per connection (0 sends every notification)
+NOTIFICATION_COALESCE_WINDOW = 0.5
 #################### [ END ] ####################
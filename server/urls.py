@@ -3,6 +3,9 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from utils.metrics import metrics_view
+from utils.profiling import profile_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/auth/", include("users.urls")),
@@ -12,6 +15,8 @@ urlpatterns = [
     path("api/warehouse/", include("warehouse.urls")),
     path("api/permits/", include("permits.urls")),
     path("accounts/", include("allauth.urls")),
+    path("metrics/", metrics_view, name="metrics"),
+    path("api/profiles/<str:profile_id>/", profile_view, name="profile"),
 ]
 
 # Serve static files only in development
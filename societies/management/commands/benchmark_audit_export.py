@@ -0,0 +1,117 @@
+import asyncio
+import csv
+import resource
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from societies.models import AuditLog
+
+BENCHMARK_ACTION = 'benchmark_audit_export'
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Exports the audit log as CSV through the ASGI handler, as daphne serves it, and reports '
+        'time to first byte, total time and peak RSS. Seeds rows first if the table is smaller '
+        'than --rows. Peak RSS only grows, so run each --mode in its own process'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Audit rows to export')
+        parser.add_argument('--mode', choices=['streaming', 'buffered'], default='streaming',
+                            help='streaming: the AuditLogListView export; buffered: the previous in-memory export')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows for later runs')
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(is_active=True, is_staff=True).first()
+        if user is None:
+            raise CommandError('No active staff user found.')
+
+        missing = options['rows'] - AuditLog.objects.count()
+        if missing > 0:
+            self.stdout.write(f'Seeding {missing} audit rows...')
+            for start in range(0, missing, 5000):
+                AuditLog.objects.bulk_create([
+                    AuditLog(
+                        user=user, action=BENCHMARK_ACTION, model='PermitApplication', object_id=i,
+                        ip_address='127.0.0.1', user_agent='benchmark', details={'row': i},
+                    )
+                    for i in range(start, min(start + 5000, missing))
+                ])
+
+        baseline = peak_rss_mb()
+        started = time.perf_counter()
+        try:
+            if options['mode'] == 'streaming':
+                size, first_byte = asyncio.run(self._streaming(user))
+            else:
+                size, first_byte = self._buffered(), None
+            elapsed = time.perf_counter() - started
+            ttfb = f', first byte after {first_byte - started:.2f}s' if first_byte else ''
+            self.stdout.write(
+                f'{options["mode"]}: {size / 1024 / 1024:.1f} MB of CSV in {elapsed:.2f}s{ttfb}, '
+                f'peak RSS {peak_rss_mb():.0f} MB (+{peak_rss_mb() - baseline:.0f} MB during export)'
+            )
+        finally:
+            if missing > 0 and not options['keep']:
+                AuditLog.objects.filter(action=BENCHMARK_ACTION).delete()
+        self.stdout.write(self.style.SUCCESS('Audit export benchmark finished'))
+
+    async def _streaming(self, user):
+        """Drive the export through Django's ASGI handler; returns (body bytes, first-byte time)."""
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'https',
+            'method': 'GET', 'path': '/api/societies/admin/audit-log/', 'query_string': b'format=csv',
+            'headers': [(b'host', b'localhost'), (b'cookie', f'access_token={AccessToken.for_user(user)}'.encode())],
+            'client': ('127.0.0.1', 0), 'server': ('localhost', 443),
+        }
+        done = asyncio.Event()
+        request_sent = False
+        result = {'status': None, 'size': 0, 'first_byte': None}
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await done.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                result['status'] = message['status']
+            elif message['type'] == 'http.response.body' and message.get('body'):
+                if result['first_byte'] is None:
+                    result['first_byte'] = time.perf_counter()
+                result['size'] += len(message['body'])
+
+        with override_settings(ALLOWED_HOSTS=['*']):
+            try:
+                await get_asgi_application()(scope, receive, send)
+            finally:
+                done.set()
+        if result['status'] != 200:
+            raise CommandError(f'Export failed with status {result["status"]}')
+        return result['size'], result['first_byte']
+
+    def _buffered(self):
+        response = HttpResponse(content_type='text/csv')
+        writer = csv.writer(response)
+        writer.writerow(['ID', 'User', 'Action', 'Model', 'Object ID', 'Timestamp', 'IP Address', 'User Agent', 'Details'])
+        for log in AuditLog.objects.all().order_by('-timestamp'):
+            writer.writerow([
+                log.id, log.user.email if log.user else '', log.action, log.model, log.object_id,
+                log.timestamp, log.ip_address, log.user_agent, log.details,
+            ])
+        return len(response.content)
@@ -117,3 +117,7 @@ class AuditLog(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Keyset reads of the CSV export walk (timestamp, id) newest first
+            models.Index(fields=['timestamp', 'id'], name='auditlog_timestamp_id'),
+        ]
@@ -50,6 +50,17 @@ class SocietySerializer(serializers.ModelSerializer):
             'date_rejected'
         ]
 
+    # Users dereferenced by the method fields below
+    related_users = ('manager', 'rejected_by')
+
+    @classmethod
+    def select_related_paths(cls, prefix=''):
+        """
+        select_related() paths that let societies reached through ``prefix`` serialize
+        without extra queries.
+        """
+        return [prefix + field for field in cls.related_users]
+
     def get_manager_name(self, obj):
         return f"{obj.manager.first_name} {obj.manager.last_name}"
 
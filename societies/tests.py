@@ -1,3 +1,131 @@
-from django.test import TestCase
+import csv
+import io
+from datetime import timedelta
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from permits import synthetic
+from users.models import CustomUser
+from utils.testing import LOCAL_SERVICES, client_for, reset_process_state
+from .models import AuditLog, Society
+
+URL = "/api/societies/admin/audit-log/"
+SIZES = {"societies": 4, "factories_per_society": 1, "warehouses": 1, "permits": 10, "notifications": 0}
+
+
+@LOCAL_SERVICES
+class SocietyQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = synthetic.seed_dataset(SIZES)
+        staff = cls.users["staff"]
+        for i in range(3):
+            manager = CustomUser.objects.create_user(f"pending-{i}@example.com", "pass", is_active=True)
+            Society.objects.create(name=f"Pending society {i}", manager=manager, county="Kiambu", sub_county="Ruiru")
+        # Rejected registrations are not pending
+        manager = CustomUser.objects.create_user("rejected@example.com", "pass", is_active=True)
+        Society.objects.create(name="Rejected society", manager=manager, county="Kiambu", sub_county="Ruiru",
+                               rejection_reason="Incomplete", rejected_by=staff)
+
+    def setUp(self):
+        # Start every test from the same process-wide state
+        reset_process_state()
+
+    def get(self, user, url, queries):
+        client_for(self.client, user)
+        # One query loads the requesting user with their society
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_admin_list_is_paginated_in_fixed_queries(self):
+        # The user, the count and the page with its managers and approvers joined
+        body = self.get(self.users["staff"], reverse("admin-society-list") + "?page_size=5", 3)
+        self.assertEqual(body["count"], Society.objects.count())
+        self.assertEqual(len(body["results"]), 5)
+        self.assertIsNotNone(body["next"])
+        self.assertIsNone(body["previous"])
+
+        # The user now comes from the authentication cache
+        body = self.get(self.users["staff"], reverse("admin-society-list") + "?page=2&page_size=5", 2)
+        self.assertEqual(len(body["results"]), Society.objects.count() - 5)
+        self.assertIsNone(body["next"])
+
+    def test_admin_detail_in_fixed_queries(self):
+        society = Society.objects.get(rejection_reason__isnull=False)
+        body = self.get(self.users["staff"], reverse("admin-society-detail", args=[society.pk]), 2)
+        self.assertEqual(body["id"], society.pk)
+
+    def test_pending_registrations_in_fixed_queries(self):
+        body = self.get(self.users["staff"], reverse("admin-society-get-pending-registrations"), 3)
+        self.assertEqual(body["count"], 3)
+        self.assertEqual({society["name"] for society in body["results"]},
+                         {f"Pending society {i}" for i in range(3)})
+
+    def test_manager_list_and_detail_in_fixed_queries(self):
+        manager = self.users["manager"]
+        body = self.get(manager, reverse("society-list"), 2)
+        self.assertEqual([society["id"] for society in body], [manager.managed_society.pk])
+
+        # Cached user, then the society with its manager and rejector joined
+        self.get(manager, reverse("society-detail", args=[manager.managed_society.pk]), 1)
+
+
+@LOCAL_SERVICES
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class AuditLogExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = synthetic.seed_dataset(SIZES)
+        staff, manager = cls.users["staff"], cls.users["manager"]
+        now = timezone.now()
+        # Two rows share a timestamp, so chunks must also be ordered by id
+        for i, (user, action, age) in enumerate([
+            (staff, "approve_society", 3), (manager, "update_society", 2), (staff, "approve_society", 2),
+            (None, "system_cleanup", 1), (staff, "reject_society", 0),
+        ]):
+            log = AuditLog.objects.create(user=user, action=action, model="Society", object_id=i,
+                                          ip_address="10.0.0.1", details={"row": i})
+            AuditLog.objects.filter(pk=log.pk).update(timestamp=now - timedelta(days=age))
+
+    def setUp(self):
+        reset_process_state()
+        client_for(self.client, self.users["staff"])
+        client_for(self.async_client, self.users["staff"])
+
+    def expected(self, logs):
+        return [[str(log.id), log.user.email if log.user else "", log.action, str(log.object_id)] for log in logs]
+
+    def rows(self, content):
+        rows = list(csv.reader(io.StringIO(content.decode())))
+        self.assertEqual(rows[0][:5], ["ID", "User", "Action", "Model", "Object ID"])
+        return [[row[0], row[1], row[2], row[4]] for row in rows[1:]]
+
+    def test_export_streams_every_row_newest_first(self):
+        response = self.client.get(URL, {"format": "csv"}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="audit_logs.csv"')
+        logs = AuditLog.objects.order_by("-timestamp", "-id")
+        self.assertEqual(self.rows(b"".join(response.streaming_content)), self.expected(logs))
+
+    def test_export_applies_the_list_filters(self):
+        staff = self.users["staff"]
+        since = (timezone.now() - timedelta(days=2, hours=1)).isoformat()
+        response = self.client.get(
+            URL, {"format": "csv", "user": staff.pk, "action": "approve", "start_date": since}, secure=True
+        )
+        logs = AuditLog.objects.filter(user=staff, action__icontains="approve", timestamp__gte=since)
+        self.assertEqual(self.rows(b"".join(response.streaming_content)),
+                         self.expected(logs.order_by("-timestamp", "-id")))
+
+    async def test_export_is_an_async_stream_under_asgi(self):
+        response = await self.async_client.get(URL, {"format": "csv"}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        logs = [log async for log in AuditLog.objects.select_related("user").order_by("-timestamp", "-id")]
+        self.assertEqual(self.rows(content), self.expected(logs))
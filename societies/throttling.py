@@ -1,19 +1,22 @@
-from rest_framework.throttling import UserRateThrottle
+from utils.throttling import RedisRateThrottle
 
-class AdminActionThrottle(UserRateThrottle):
+class AdminActionThrottle(RedisRateThrottle):
     """
     Throttle for admin actions to prevent abuse
     """
+    scope = 'admin_action'
     rate = '400/minute'
 
-class SocietyActionThrottle(UserRateThrottle):
+class SocietyActionThrottle(RedisRateThrottle):
     """
     Throttle for society-related actions
     """
+    scope = 'society_action'
     rate = '500/minute'
 
-class RegistrationThrottle(UserRateThrottle):
+class RegistrationThrottle(RedisRateThrottle):
     """
     Throttle for registration attempts
     """
+    scope = 'registration'
     rate = '5/hour'
@@ -22,6 +22,11 @@ from users.utils import notify_admins, notify_user
 from utils.email_utils import send_template_email
 from django.conf import settings
 from rest_framework.views import APIView
+from rest_framework.settings import api_settings
+from utils.db_routing import replica_db
+from utils.exports import CSVRenderer, export_chunk_size, keyset_chunks, stream_csv
+from utils.pagination import StandardResultsSetPagination
+from utils.reference_cache import cached_reference_response, scope_for_user
 
 # Registration Views
 class SocietyRegistrationView(generics.CreateAPIView):
@@ -84,9 +89,10 @@ class SocietyViewSet(viewsets.ModelViewSet):
     serializer_class = SocietySerializer
 
     def get_queryset(self):
+        queryset = Society.objects.select_related(*SocietySerializer.select_related_paths())
         if self.request.user.role == 'ADMIN':
-            return Society.objects.all()
-        return Society.objects.filter(manager=self.request.user)
+            return queryset
+        return queryset.filter(manager=self.request.user)
 
     @transaction.atomic
     def perform_create(self, serializer):
@@ -103,11 +109,13 @@ class AdminSocietyViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAdminUser]
     # throttle_classes = [AdminActionThrottle]
     serializer_class = SocietySerializer
+    pagination_class = StandardResultsSetPagination
 
     def get_queryset(self):
+        queryset = Society.objects.select_related(*SocietySerializer.select_related_paths())
         if self.request.user.role == 'ADMIN':
-            return Society.objects.all().order_by("-date_registered")
-        return Society.objects.filter(manager=self.request.user)
+            return queryset.order_by("-date_registered")
+        return queryset.filter(manager=self.request.user).order_by("-date_registered")
 
     @action(detail=True, methods=['post'])
     @transaction.atomic
@@ -238,10 +246,13 @@ class AdminSocietyViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def get_pending_registrations(self, request):
-        pending = Society.objects.filter(
+        pending = Society.objects.select_related(*SocietySerializer.select_related_paths()).filter(
             is_approved=False,
             rejection_reason__isnull=True
-        )
+        ).order_by("-date_registered")
+        page = self.paginate_queryset(pending)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
         serializer = self.get_serializer(pending, many=True)
         return Response(serializer.data)
 
@@ -274,9 +285,10 @@ class FactoryViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def active_factories(self, request):
         """Get only active factories for permit applications"""
-        queryset = self.get_queryset().filter(is_active=True)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return cached_reference_response(
+            request, ['factories'], scope_for_user(request.user),
+            lambda: self.get_serializer(self.get_queryset().filter(is_active=True), many=True).data,
+        )
 
 class CoffeePriceViewSet(viewsets.ModelViewSet):
     serializer_class = CoffeePriceSerializer
@@ -369,21 +381,13 @@ class CoffeePriceViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def active_prices(self, request):
         """Get only active prices for the current coffee year"""
-        from django.utils import timezone
-        current_date = timezone.now().date()
-        
-        # Determine current coffee year
-        if current_date.month < 10:
-            coffee_year = f"{current_date.year - 1}/{str(current_date.year)[-2:]}"
-        else:
-            coffee_year = f"{current_date.year}/{str(current_date.year + 1)[-2:]}"
-        
-        queryset = self.get_queryset().filter(
-            coffee_year=coffee_year,
-            is_active=True
+        coffee_year = CoffeePrice.get_current_coffee_year()
+        return cached_reference_response(
+            request, ['prices'], f'{scope_for_user(request.user)}|{coffee_year}',
+            lambda: self.get_serializer(
+                self.get_queryset().filter(coffee_year=coffee_year, is_active=True), many=True
+            ).data,
         )
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
 
 class AdminSocietyRegistrationView(generics.CreateAPIView):
     permission_classes = [IsAdminUser]
@@ -400,6 +404,7 @@ class AdminSocietyRegistrationView(generics.CreateAPIView):
 class AuditLogListView(ListAPIView):
     serializer_class = AuditLogSerializer
     permission_classes = [IsAdminUser]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, CSVRenderer]
 
     def get_queryset(self):
         queryset = AuditLog.objects.all().order_by('-timestamp')
@@ -419,26 +424,20 @@ class AuditLogListView(ListAPIView):
 
     def list(self, request, *args, **kwargs):
         if request.query_params.get('format') == 'csv':
-            import csv
-            from django.http import HttpResponse
-            queryset = self.get_queryset()
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = 'attachment; filename="audit_logs.csv"'
-            writer = csv.writer(response)
-            writer.writerow(['ID', 'User', 'Action', 'Model', 'Object ID', 'Timestamp', 'IP Address', 'User Agent', 'Details'])
-            for log in queryset:
-                writer.writerow([
-                    log.id,
-                    log.user.email if log.user else '',
-                    log.action,
-                    log.model,
-                    log.object_id,
-                    log.timestamp,
-                    log.ip_address,
-                    log.user_agent,
-                    log.details
-                ])
-            return response
+            # Read in keyset chunks while the response streams; the user join happens in the query
+            chunks = keyset_chunks(
+                self.get_queryset().using(replica_db(request)),
+                ['id', 'user__email', 'action', 'model', 'object_id',
+                 'timestamp', 'ip_address', 'user_agent', 'details'],
+                ['-timestamp', '-id'],
+                export_chunk_size(),
+            )
+            return stream_csv(
+                request,
+                'audit_logs.csv',
+                ['ID', 'User', 'Action', 'Model', 'Object ID', 'Timestamp', 'IP Address', 'User Agent', 'Details'],
+                ([(log_id, email or '', *rest) for log_id, email, *rest in rows] for rows in chunks),
+            )
         return super().list(request, *args, **kwargs)
 
 class CancelSocietyApplicationView(APIView):
@@ -0,0 +1,12 @@
+from utils.async_views import api_response, async_api_view
+from .models import Notification
+from .serializers import NotificationSerializer
+
+
+@async_api_view()
+async def notification_list(request):
+    """Async-native NotificationViewSet.list."""
+    notifications = [
+        notification async for notification in Notification.objects.filter(recipient=request.user)
+    ]
+    return api_response(NotificationSerializer(notifications, many=True).data)
@@ -0,0 +1,203 @@
+import copy
+import time
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from dj_rest_auth.app_settings import api_settings as rest_auth_settings
+from dj_rest_auth.jwt_auth import JWTCookieAuthentication
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .revocation import revocation_list
+
+
+class Principal:
+    """
+    Role information resolved once per request: who the user is, whether they are
+    staff and which society (if any) they manage.
+    """
+    __slots__ = ('user_id', 'role', 'is_staff', 'managed_society_id')
+
+    def __init__(self, user_id, role, is_staff, managed_society_id):
+        self.user_id = user_id
+        self.role = role
+        self.is_staff = is_staff
+        self.managed_society_id = managed_society_id
+
+    @property
+    def is_society_manager(self):
+        return self.managed_society_id is not None
+
+    @classmethod
+    def for_user(cls, user):
+        if not user or not user.is_authenticated:
+            return cls(None, None, False, None)
+        try:
+            # Already cached when the user was loaded by PrincipalJWTCookieAuthentication
+            society = user.managed_society
+        except ObjectDoesNotExist:
+            society = None
+        return cls(user.pk, user.role, user.is_staff, society.pk if society else None)
+
+
+def get_principal(request):
+    """
+    Return the Principal for this request, resolving it at most once.
+    Works with both DRF and plain Django requests; the value is stored on the
+    underlying HttpRequest so both see the same instance.
+    """
+    http_request = getattr(request, '_request', request)
+    principal = getattr(http_request, '_principal', None)
+    user = request.user
+    if principal is None or principal.user_id != getattr(user, 'pk', None):
+        principal = Principal.for_user(user)
+        http_request._principal = principal
+    return principal
+
+
+class PrincipalJWTCookieAuthentication(JWTCookieAuthentication):
+    """
+    JWT cookie authentication that loads the user together with their managed society
+    in a single query and attaches the resolved Principal to the request.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            http_request = getattr(request, '_request', request)
+            http_request._principal = Principal.for_user(result[0])
+        return result
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = self.load_user(user_id)
+        self.check_user(user, validated_token)
+        return user
+
+    def check_user(self, user, validated_token):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+    def load_user(self, user_id):
+        try:
+            return self.user_model.objects.select_related('managed_society').get(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+
+# user id -> (expires_at, user loaded with managed_society)
+_user_cache = {}
+
+
+def get_cached_user(user_id):
+    entry = _user_cache.get(str(user_id))
+    if entry is not None and entry[0] > time.monotonic():
+        return copy.deepcopy(entry[1])
+    return None
+
+
+def cache_user(user_id, user):
+    ttl = getattr(settings, 'AUTH_USER_CACHE_TTL', 30)
+    if ttl <= 0:
+        return
+    if len(_user_cache) >= getattr(settings, 'AUTH_USER_CACHE_MAX_SIZE', 10000):
+        _user_cache.clear()
+    _user_cache[str(user_id)] = (time.monotonic() + ttl, copy.deepcopy(user))
+
+
+def invalidate_cached_user(user_id):
+    _user_cache.pop(str(user_id), None)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def _invalidate_on_user_change(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender='societies.Society')
+@receiver(post_delete, sender='societies.Society')
+def _invalidate_on_society_change(sender, instance, **kwargs):
+    invalidate_cached_user(instance.manager_id)
+
+
+class CachedJWTCookieAuthentication(PrincipalJWTCookieAuthentication):
+    """
+    JWT cookie authentication that avoids the database in steady state: the signature is
+    verified locally, revocation is checked against the in-process blacklist filter and
+    the user is served from a short-lived per-process cache (AUTH_USER_CACHE_TTL seconds).
+    Each request receives its own copy of the cached user. Unsafe methods always load the
+    user from the database, so writes and the permission checks guarding them never act
+    on a copy that another process has since changed.
+    """
+
+    use_cache = True
+
+    def authenticate(self, request):
+        self.use_cache = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        if jti and revocation_list.is_revoked(jti):
+            raise InvalidToken(_("Token is blacklisted"))
+        return super().get_user(validated_token)
+
+    def load_user(self, user_id):
+        user = get_cached_user(user_id) if self.use_cache else None
+        if user is None:
+            user = super().load_user(user_id)
+            cache_user(user_id, user)
+        return user
+
+    async def aauthenticate(self, request):
+        """
+        authenticate() for async views (GET only, so no CSRF check). The database is only
+        reached, through the async ORM, on a user cache miss or a revocation-filter hit.
+        """
+        header = self.get_header(request)
+        if header is None:
+            raw_token = request.COOKIES.get(rest_auth_settings.JWT_AUTH_COOKIE)
+        else:
+            raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        if jti and await revocation_list.ais_revoked(jti):
+            raise InvalidToken(_("Token is blacklisted"))
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            try:
+                user = await self.user_model.objects.select_related('managed_society').aget(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            cache_user(user_id, user)
+        self.check_user(user, validated_token)
+        request._principal = Principal.for_user(user)
+        return user, validated_token
@@ -1,20 +1,137 @@
+import asyncio
+from django.conf import settings
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
 
+from utils.metrics import WEBSOCKET_CONNECTIONS, WEBSOCKET_OPEN
+
+# Shared group joined by every staff socket, so a staff-wide event is a single publish
+ADMINS_GROUP = "admins"
+
 class NotificationConsumer(AsyncJsonWebsocketConsumer):
     async def connect(self):
         user = self.scope["user"]
         if user.is_authenticated:
             self.group_name = f"user_{user.id}"
-            await self.channel_layer.group_add(self.group_name, self.channel_name)
+            self.groups_joined = [self.group_name]
+            if user.is_staff and user.is_active:
+                self.groups_joined.append(ADMINS_GROUP)
+            for group in self.groups_joined:
+                await self.channel_layer.group_add(group, self.channel_name)
+            # notification type -> contents buffered during the current coalescing window
+            self.pending = {}
+            self.flush_handles = {}
             await self.accept()
+            WEBSOCKET_CONNECTIONS.labels(consumer="notifications", outcome="accepted").inc()
+            WEBSOCKET_OPEN.labels(consumer="notifications").inc()
         else:
+            WEBSOCKET_CONNECTIONS.labels(consumer="notifications", outcome="rejected").inc()
             await self.close()
 
     async def disconnect(self, close_code):
         user = self.scope["user"]
         if user.is_authenticated:
-            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+            WEBSOCKET_OPEN.labels(consumer="notifications").dec()
+            for handle in self.flush_handles.values():
+                handle.cancel()
+            for group in self.groups_joined:
+                await self.channel_layer.group_discard(group, self.channel_name)
 
     async def notify(self, event):
-        await self.send_json(event["content"]) 
\ No newline at end of file
+        await self.send_coalesced(event["content"])
+
+    async def notify_admins(self, event):
+        # One message is published for all staff; each socket fills in its own notification id
+        content = dict(event["content"])
+        content["id"] = event["ids"].get(str(self.scope["user"].id))
+        if content["id"] is None:
+            return
+        await self.send_coalesced(content)
+
+    async def send_coalesced(self, content):
+        """
+        Send the first notification of a type immediately, then merge further notifications
+        of that type arriving within NOTIFICATION_COALESCE_WINDOW into one batched message.
+        """
+        window = getattr(settings, "NOTIFICATION_COALESCE_WINDOW", 0)
+        key = content.get("type")
+        if window <= 0:
+            await self.send_json(content)
+            return
+        if key in self.pending:
+            self.pending[key].append(content)
+            return
+        self.pending[key] = []
+        await self.send_json(content)
+        self.schedule_flush(key, window)
+
+    def schedule_flush(self, key, window):
+        loop = asyncio.get_running_loop()
+        self.flush_handles[key] = loop.call_later(
+            window, lambda: asyncio.ensure_future(self.flush(key, window))
+        )
+
+    async def flush(self, key, window):
+        items = self.pending.get(key)
+        if not items:
+            # Quiet window: close it so the next notification of this type goes out immediately
+            self.pending.pop(key, None)
+            self.flush_handles.pop(key, None)
+            return
+        self.pending[key] = []
+        if len(items) == 1:
+            await self.send_json(items[0])
+        else:
+            await self.send_json({
+                "type": key,
+                "batch": True,
+                "count": len(items),
+                "items": items,
+            })
+        self.schedule_flush(key, window)
+
+class DashboardConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Live permit metrics for staff and society manager dashboards.
+    Sends one snapshot on connect, then the deltas published by permits.dashboard.
+    """
+    async def connect(self):
+        from permits.dashboard import STAFF_DASHBOARD_GROUP, society_dashboard_group
+
+        user = self.scope["user"]
+        self.group_name = None
+        if not user.is_authenticated:
+            WEBSOCKET_CONNECTIONS.labels(consumer="dashboard", outcome="rejected").inc()
+            await self.close()
+            return
+        if user.is_staff:
+            self.group_name = STAFF_DASHBOARD_GROUP
+            self.society_id = None
+        elif getattr(user, "managed_society_id", None) is not None:
+            self.society_id = user.managed_society_id
+            self.group_name = society_dashboard_group(self.society_id)
+        else:
+            WEBSOCKET_CONNECTIONS.labels(consumer="dashboard", outcome="rejected").inc()
+            await self.close()
+            return
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        WEBSOCKET_CONNECTIONS.labels(consumer="dashboard", outcome="accepted").inc()
+        WEBSOCKET_OPEN.labels(consumer="dashboard").inc()
+        await self.send_json({
+            "event": "SNAPSHOT",
+            "metrics": await self.get_snapshot(),
+        })
+
+    async def disconnect(self, close_code):
+        if getattr(self, "group_name", None):
+            WEBSOCKET_OPEN.labels(consumer="dashboard").dec()
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def dashboard_delta(self, event):
+        await self.send_json(event["content"])
+
+    @database_sync_to_async
+    def get_snapshot(self):
+        from permits.dashboard import metrics_snapshot
+        return metrics_snapshot(self.society_id)
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing concurrency cap is reached."""
+
+
+def _check_password(password, encoded):
+    # Django calls the setter only when the password is correct and the hash is outdated
+    outdated = []
+    is_correct = hashers.check_password(password, encoded, setter=outdated.append)
+    return is_correct, bool(outdated)
+
+
+class PasswordHasherPool:
+    """
+    Password hashing with backpressure.
+
+    Async callers (the login view) await the hash on a small thread pool of
+    ``PASSWORD_HASH_WORKERS`` threads, so under daphne the event loop and the shared
+    sync-view thread keep serving other requests while PBKDF2 runs. hashlib releases the
+    GIL while it hashes, so the pool threads run in parallel with the rest of the process.
+    Sync callers hash inline on their own request thread.
+
+    At most ``PASSWORD_HASH_MAX_CONCURRENCY`` hashes run or wait at once; further callers
+    get PasswordHashingBusy straight away instead of queueing behind a login storm.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slots = None
+
+    def _get_slots(self):
+        if self._slots is None:
+            with self._lock:
+                if self._slots is None:
+                    self._slots = threading.BoundedSemaphore(getattr(settings, 'PASSWORD_HASH_MAX_CONCURRENCY', 16))
+        return self._slots
+
+    def _get_executor(self):
+        workers = getattr(settings, 'PASSWORD_HASH_WORKERS', 2)
+        if workers <= 0:
+            return None
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        return self._executor
+
+    def _acquire(self):
+        if not self._get_slots().acquire(blocking=False):
+            raise PasswordHashingBusy()
+
+    def _run(self, func, *args):
+        self._acquire()
+        try:
+            return func(*args)
+        finally:
+            self._slots.release()
+
+    async def _arun(self, func, *args):
+        self._acquire()
+        try:
+            executor = self._get_executor()
+            if executor is None:
+                return func(*args)
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        finally:
+            self._slots.release()
+
+    def check_password(self, user, raw_password):
+        """
+        Equivalent of ``user.check_password``: upgrades the stored hash when the
+        configured hasher or its work factor changed.
+        """
+        is_correct, needs_update = self._run(_check_password, raw_password, user.password)
+        if needs_update:
+            user.password = self._run(hashers.make_password, raw_password)
+            user.save(update_fields=['password'])
+        return is_correct
+
+    async def acheck_password(self, user, raw_password):
+        """check_password() for async views; the hash runs off the event loop."""
+        is_correct, needs_update = await self._arun(_check_password, raw_password, user.password)
+        if needs_update:
+            user.password = await self._arun(hashers.make_password, raw_password)
+            await user.asave(update_fields=['password'])
+        return is_correct
+
+    def set_password(self, user, raw_password):
+        """Equivalent of ``user.set_password``; the caller still saves the user."""
+        user.password = self._run(hashers.make_password, raw_password)
+        user._password = raw_password
+
+
+password_hasher = PasswordHasherPool()
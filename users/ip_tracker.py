@@ -0,0 +1,88 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, F, Value, When
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedIPTracker:
+    """
+    Write-behind buffer for ``CustomUser.last_login_ip``.
+
+    Requests only record the latest address per user in memory. A background thread,
+    started on the first record, writes the buffer back every ``flush_interval`` seconds
+    with one bulk UPDATE per ``batch_size`` users, so users whose address flips on every
+    request (carrier NAT) no longer cost a write per request and no request waits for
+    the write-back.
+    """
+
+    batch_size = 500
+
+    def __init__(self, flush_interval=None):
+        self._flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return getattr(settings, 'IP_TRACKING_FLUSH_INTERVAL', 60)
+
+    def record(self, user_id, ip):
+        with self._lock:
+            self._pending[user_id] = ip
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='ip-tracker', daemon=True)
+                self._thread.start()
+
+    def pending_ip(self, user_id):
+        return self._pending.get(user_id)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush last_login_ip updates: {str(e)}")
+            finally:
+                connections.close_all()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        from django.contrib.auth import get_user_model
+        User = get_user_model()
+        items = list(pending.items())
+        for start in range(0, len(items), self.batch_size):
+            batch = items[start:start + self.batch_size]
+            try:
+                User.objects.filter(pk__in=[user_id for user_id, _ in batch]).update(
+                    last_login_ip=Case(
+                        *[When(pk=user_id, then=Value(ip)) for user_id, ip in batch],
+                        default=F('last_login_ip'),
+                        output_field=User._meta.get_field('last_login_ip'),
+                    )
+                )
+            except Exception as e:
+                logger.error(f"Failed to store last_login_ip for {len(batch)} users: {str(e)}")
+        return len(pending)
+
+
+ip_tracker = BufferedIPTracker()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        ip_tracker.flush()
+    except Exception:
+        pass
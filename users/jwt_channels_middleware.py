@@ -1,18 +1,117 @@
-from urllib.parse import parse_qs
+import time
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.http.cookie import parse_cookie
 from rest_framework_simplejwt.tokens import UntypedToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 
+# user_id -> (expires_at, WebsocketUser). Lives in the event loop's process, so a
+# cache hit never leaves the loop for the database thread pool.
+_user_cache = {}
+
+
+class WebsocketUser:
+    """
+    Minimal, immutable identity attached to ``scope['user']`` for websocket consumers.
+    Carries only what the consumers need, so it can be cached without holding a model instance.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    __slots__ = ('id', 'email', 'role', 'is_staff', 'is_active', 'managed_society_id')
+
+    def __init__(self, id, email, role, is_staff, is_active, managed_society_id=None):
+        self.id = id
+        self.email = email
+        self.role = role
+        self.is_staff = is_staff
+        self.is_active = is_active
+        self.managed_society_id = managed_society_id
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __str__(self):
+        return self.email
+
+
+def _cache_ttl():
+    return getattr(settings, 'WEBSOCKET_USER_CACHE_TTL', 60)
+
+
+def get_cached_user(user_id):
+    entry = _user_cache.get(user_id)
+    if entry is None:
+        return None
+    expires_at, user = entry
+    if expires_at < time.monotonic():
+        _user_cache.pop(user_id, None)
+        return None
+    return user
+
+
+def cache_user(user):
+    ttl = _cache_ttl()
+    if ttl <= 0:
+        return
+    if len(_user_cache) >= getattr(settings, 'WEBSOCKET_USER_CACHE_MAX_SIZE', 10000):
+        # Drop expired entries first; if still full, start over rather than grow unbounded.
+        now = time.monotonic()
+        for key in [k for k, (expires_at, _) in _user_cache.items() if expires_at < now]:
+            del _user_cache[key]
+        if len(_user_cache) >= getattr(settings, 'WEBSOCKET_USER_CACHE_MAX_SIZE', 10000):
+            _user_cache.clear()
+    _user_cache[user.id] = (time.monotonic() + ttl, user)
+
+
+def invalidate_cached_user(user_id):
+    _user_cache.pop(user_id, None)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def _invalidate_on_user_change(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender='societies.Society')
+@receiver(post_delete, sender='societies.Society')
+def _invalidate_on_society_change(sender, instance, **kwargs):
+    # managed_society_id is part of the cached identity
+    invalidate_cached_user(instance.manager_id)
+
+
 @database_sync_to_async
-def get_user(validated_token):
+def _load_user(user_id):
     from django.contrib.auth import get_user_model
     User = get_user_model()
+    row = (
+        User.objects.filter(id=user_id)
+        .values('id', 'email', 'role', 'is_staff', 'is_active', managed_society_id=F('managed_society__id'))
+        .first()
+    )
+    return WebsocketUser(**row) if row else None
+
+
+async def get_user(validated_token):
+    user_id = validated_token['user_id']
+    # simplejwt stores the claim as a string by default
     try:
-        user_id = validated_token['user_id']
-        return User.objects.get(id=user_id)
-    except User.DoesNotExist:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
         return AnonymousUser()
+    user = get_cached_user(user_id)
+    if user is None:
+        user = await _load_user(user_id)
+        if user is None:
+            return AnonymousUser()
+        cache_user(user)
+    return user
 
 class JWTAuthMiddleware:
     """
@@ -26,15 +125,13 @@ class JWTAuthMiddleware:
         if scope["type"] != "websocket":
             return await self.app(scope, receive, send)
 
-        headers = dict(scope.get("headers", {}))
         cookies = {}
-        
+
         # Parse cookies from headers
-        if b'cookie' in headers:
-            from http.cookies import SimpleCookie
-            cookie = SimpleCookie()
-            cookie.load(headers[b'cookie'].decode())
-            cookies = {k: v.value for k, v in cookie.items()}
+        for name, value in scope.get("headers", ()):
+            if name == b'cookie':
+                cookies = parse_cookie(value.decode('latin-1'))
+                break
 
         access_token = cookies.get('access_token')
         scope['user'] = AnonymousUser()
@@ -46,4 +143,4 @@ class JWTAuthMiddleware:
             except (InvalidToken, TokenError) as e:
                 pass
 
-        return await self.app(scope, receive, send)
\ No newline at end of file
+        return await self.app(scope, receive, send)
@@ -0,0 +1,65 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.authentication import (
+    PrincipalJWTCookieAuthentication,
+    CachedJWTCookieAuthentication,
+    _user_cache,
+)
+from users.revocation import revocation_list
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares authenticated requests per second and queries per request between the '
+        'database-backed and the cached JWT cookie authentication classes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000, help='Authentications per class')
+        parser.add_argument('--users', type=int, default=20, help='Number of distinct active users to authenticate as')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = list(User.objects.filter(is_active=True).order_by('id')[:options['users']])
+        if not users:
+            raise CommandError('No active users found. Seed some users first.')
+        tokens = [str(AccessToken.for_user(user)) for user in users]
+
+        _user_cache.clear()
+        revocation_list.sync(force_rebuild=True)
+
+        for authentication_class in (PrincipalJWTCookieAuthentication, CachedJWTCookieAuthentication):
+            rate, queries = self._run(authentication_class(), tokens, options['requests'])
+            self.stdout.write(
+                f'{authentication_class.__name__}: {rate:.0f} requests/s, '
+                f'{queries:.2f} queries/request'
+            )
+        self.stdout.write(self.style.SUCCESS('Authentication benchmark finished'))
+
+    def _run(self, authenticator, tokens, total):
+        factory = RequestFactory()
+        requests = []
+        for token in tokens:
+            http_request = factory.get('/api/permits/')
+            http_request.COOKIES['access_token'] = token
+            requests.append(http_request)
+
+        # Warm up caches so the measurement reflects steady state
+        for http_request in requests:
+            authenticator.authenticate(Request(http_request))
+
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            for i in range(total):
+                if authenticator.authenticate(Request(requests[i % len(requests)])) is None:
+                    raise CommandError('Authentication failed during benchmark')
+            elapsed = time.perf_counter() - started
+        return total / elapsed if elapsed else 0.0, len(captured) / total
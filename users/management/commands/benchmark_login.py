@@ -0,0 +1,125 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.views import SecureLoginView, UserRoleView
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Logs in repeatedly through SecureLoginView (throttling disabled) and reports '
+        'logins per second and database queries per login. With --concurrency > 1 it '
+        'simulates a login storm and measures UserRoleView latency while it runs'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200, help='Total number of logins')
+        parser.add_argument('--users', type=int, default=20, help='Number of distinct active users to log in as')
+        parser.add_argument('--concurrency', type=int, default=1, help='Logins in flight at the same time')
+        parser.add_argument('--password', default='benchmark-password',
+                            help='Password set on the benchmark users before the run')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = list(User.objects.filter(is_active=True).order_by('id')[:options['users']])
+        if not users:
+            raise CommandError('No active users found. Seed some users first.')
+        for user in users:
+            user.set_password(options['password'])
+        User.objects.bulk_update(users, ['password'])
+
+        self.factory = RequestFactory()
+        self.login_view = SecureLoginView.as_view(throttle_classes=[])
+        self.users = users
+        self.password = options['password']
+
+        self.login(0)  # warm up imports, connections and the hashing pool
+        if options['concurrency'] <= 1:
+            self.sequential(options['logins'])
+        else:
+            self.storm(options['logins'], options['concurrency'])
+        self.stdout.write(self.style.SUCCESS('Login benchmark finished'))
+
+    def login(self, index):
+        request = self.factory.post(
+            '/api/auth/login/',
+            data=json.dumps({'login_field': self.users[index % len(self.users)].email, 'password': self.password}),
+            content_type='application/json',
+        )
+        request._dont_enforce_csrf_checks = True
+        return self.login_view(request)
+
+    def sequential(self, total):
+        failures = 0
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            for i in range(total):
+                if self.login(i).status_code != 200:
+                    failures += 1
+            elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'Logins: {total - failures} ok, {failures} failed in {elapsed:.2f}s '
+            f'({total / elapsed if elapsed else 0:.0f} logins/s), {len(captured) / total:.2f} queries/login'
+        )
+
+    def storm(self, total, concurrency):
+        statuses = {}
+        login_latencies = []
+        probe_latencies = []
+        done = threading.Event()
+
+        def timed_login(index):
+            started = time.perf_counter()
+            status_code = self.login(index).status_code
+            login_latencies.append(time.perf_counter() - started)
+            statuses[status_code] = statuses.get(status_code, 0) + 1
+            connections.close_all()
+
+        def probe():
+            # A cheap authenticated endpoint, requested continuously while the storm runs
+            role_view = UserRoleView.as_view(throttle_classes=[])
+            token = str(AccessToken.for_user(self.users[0]))
+            while not done.is_set():
+                request = self.factory.get('/api/auth/user/role/')
+                request.COOKIES['access_token'] = token
+                started = time.perf_counter()
+                role_view(request)
+                probe_latencies.append(time.perf_counter() - started)
+                time.sleep(0.01)
+            connections.close_all()
+
+        probe_thread = threading.Thread(target=probe)
+        probe_thread.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(timed_login, range(total)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        probe_thread.join()
+
+        self.stdout.write(
+            f'Logins: {total} in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f} logins/s), '
+            f'status codes {dict(sorted(statuses.items()))}'
+        )
+        for label, latencies in (('Login', login_latencies), ('UserRoleView during storm', probe_latencies)):
+            ms = sorted(value * 1000 for value in latencies)
+            self.stdout.write(
+                f'{label} latency ms: p50={percentile(ms, 50):.2f} p90={percentile(ms, 90):.2f} '
+                f'p99={percentile(ms, 99):.2f} max={ms[-1] if ms else 0:.2f}'
+            )
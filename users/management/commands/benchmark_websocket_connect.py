@@ -0,0 +1,94 @@
+import asyncio
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Opens many concurrent websocket connections against the notification consumer '
+        'using the in-memory channel layer and reports connect latency percentiles'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=2000, help='Total websocket connections to open')
+        parser.add_argument('--concurrency', type=int, default=500, help='Connections opened at the same time')
+        parser.add_argument('--users', type=int, default=50, help='Number of distinct active users to connect as')
+        parser.add_argument('--cache-ttl', type=int, default=None, help='Override WEBSOCKET_USER_CACHE_TTL (0 disables the cache)')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = list(User.objects.filter(is_active=True).order_by('id')[:options['users']])
+        if not users:
+            raise CommandError('No active users found. Seed some users first.')
+        tokens = [str(AccessToken.for_user(user)) for user in users]
+
+        overrides = {'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}}
+        if options['cache_ttl'] is not None:
+            overrides['WEBSOCKET_USER_CACHE_TTL'] = options['cache_ttl']
+
+        with override_settings(**overrides):
+            latencies, failures, elapsed = asyncio.run(
+                self._run(tokens, options['connections'], options['concurrency'])
+            )
+
+        latencies.sort()
+        ms = [value * 1000 for value in latencies]
+        self.stdout.write(f'Connections: {len(latencies)} ok, {failures} failed in {elapsed:.2f}s '
+                          f'({len(latencies) / elapsed if elapsed else 0:.0f} connects/s)')
+        if ms:
+            self.stdout.write(
+                f'Connect latency ms: mean={statistics.mean(ms):.2f} p50={percentile(ms, 50):.2f} '
+                f'p90={percentile(ms, 90):.2f} p99={percentile(ms, 99):.2f} max={ms[-1]:.2f}'
+            )
+        self.stdout.write(self.style.SUCCESS('Websocket connect benchmark finished'))
+
+    async def _run(self, tokens, connections, concurrency):
+        from channels.testing import WebsocketCommunicator
+        from users.jwt_channels_middleware import JWTAuthMiddleware, _user_cache
+        from channels.routing import URLRouter
+        import users.routing
+
+        _user_cache.clear()
+        application = JWTAuthMiddleware(URLRouter(users.routing.websocket_urlpatterns))
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        failures = 0
+        communicators = []
+
+        async def connect(index):
+            nonlocal failures
+            token = tokens[index % len(tokens)]
+            communicator = WebsocketCommunicator(
+                application,
+                'ws/notifications/',
+                headers=[(b'cookie', f'access_token={token}'.encode())],
+            )
+            async with semaphore:
+                started = time.perf_counter()
+                connected, _ = await communicator.connect(timeout=30)
+                finished = time.perf_counter()
+            if connected:
+                latencies.append(finished - started)
+                communicators.append(communicator)
+            else:
+                failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(connect(i) for i in range(connections)))
+        elapsed = time.perf_counter() - started
+
+        for communicator in communicators:
+            await communicator.disconnect()
+        return latencies, failures, elapsed
@@ -0,0 +1,97 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from users.models import Notification
+
+
+class Command(BaseCommand):
+    help = 'Archives and/or deletes read notifications older than the retention period in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90),
+            help='Delete read notifications older than this many days',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=getattr(settings, 'NOTIFICATION_RETENTION_BATCH_SIZE', 1000),
+            help='Maximum number of rows deleted per transaction',
+        )
+        parser.add_argument(
+            '--archive',
+            metavar='PATH',
+            help='Append each deleted notification as a JSON line to this file before deleting it',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='Seconds to pause between batches to reduce load on the database',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many notifications would be removed',
+        )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        batch_size = options['batch_size']
+        if days < 0:
+            raise CommandError('--days must not be negative')
+        if batch_size <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        cutoff = timezone.now() - timezone.timedelta(days=days)
+        expired = Notification.objects.filter(is_read=True, created_at__lt=cutoff).order_by('id')
+
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.SUCCESS(f'{expired.count()} read notifications older than {days} days would be removed')
+            )
+            return
+
+        archive = open(options['archive'], 'a', encoding='utf-8') if options['archive'] else None
+        deleted_count = 0
+        last_id = 0
+        try:
+            while True:
+                # Walk the table by primary key so each batch is a short index range scan
+                # and the delete holds row locks for one bounded chunk at a time.
+                with transaction.atomic():
+                    batch = expired.filter(id__gt=last_id)
+                    if archive:
+                        rows = list(
+                            batch.values('id', 'recipient_id', 'type', 'message', 'is_read', 'created_at', 'link')[:batch_size]
+                        )
+                        ids = [row['id'] for row in rows]
+                    else:
+                        ids = list(batch.values_list('id', flat=True)[:batch_size])
+                    if not ids:
+                        break
+                    if archive:
+                        for row in rows:
+                            archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+                        archive.flush()
+                    deleted, _ = Notification.objects.filter(id__in=ids).delete()
+                deleted_count += deleted
+                last_id = ids[-1]
+                self.stdout.write(f'Removed {deleted_count} notifications so far')
+                if options['sleep']:
+                    time.sleep(options['sleep'])
+        finally:
+            if archive:
+                archive.close()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully removed {deleted_count} read notifications older than {days} days')
+        )
@@ -1,23 +1,49 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.middleware.csrf import get_token
 from django.core.exceptions import PermissionDenied
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from django.conf import settings
 from rest_framework.authtoken.models import Token as AccessToken
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.response import Response
 from rest_framework import status
+from .ip_tracker import ip_tracker
+
+async def _resolve_user(request):
+    """request.user without a blocking session lookup on the event loop."""
+    user = request.user
+    if isinstance(user, SimpleLazyObject):
+        user = await request.auser()
+    return user
+
 
 class CsrfTokenMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
         response = self.get_response(request)
         # Set CSRF token for authenticated users
         if request.user.is_authenticated:
             response['X-CSRF-Token'] = get_token(request)
-        return response 
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        # DRF views replace request.user with the JWT user; otherwise it is the session user
+        if (await _resolve_user(request)).is_authenticated:
+            response['X-CSRF-Token'] = get_token(request)
+        return response
 
 class SecurityMiddleware:
     """
@@ -26,32 +52,54 @@ class SecurityMiddleware:
     - IP address tracking
     - Suspicious activity detection
     - Session management
+
+    Sync and async capable, so async views (login) are not pinned to the sync thread.
     """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        if request.user.is_authenticated:
-            # Check for account lockout
-            if request.user.account_locked_until and request.user.account_locked_until > timezone.now():
-                raise PermissionDenied("Account is locked. Try again later.")
-
-            # Track IP changes
-            current_ip = request.META.get('REMOTE_ADDR')
-            if request.user.last_login_ip and request.user.last_login_ip != current_ip:
-                request.user.last_login_ip = current_ip
-                request.user.save()
-
-            # Check for suspicious activity
-            if self._is_suspicious_activity(request):
-                request.user.failed_login_attempts += 1
-                if request.user.failed_login_attempts >= settings.MAX_FAILED_ATTEMPTS:
-                    request.user.account_locked_until = timezone.now() + timezone.timedelta(minutes=30)
-                request.user.save()
+        if self.is_async:
+            return self.__acall__(request)
+        if request.user.is_authenticated and self._check(request, request.user):
+            request.user.save(update_fields=['failed_login_attempts', 'account_locked_until'])
 
         response = self.get_response(request)
         return response
 
+    async def __acall__(self, request):
+        user = await _resolve_user(request)
+        if user.is_authenticated and self._check(request, user):
+            await user.asave(update_fields=['failed_login_attempts', 'account_locked_until'])
+        return await self.get_response(request)
+
+    def _check(self, request, user):
+        """Lockout, IP tracking and suspicious-activity checks; True when the user must be saved."""
+        # Check for account lockout
+        if user.account_locked_until and user.account_locked_until > timezone.now():
+            raise PermissionDenied("Account is locked. Try again later.")
+
+        # Track IP changes (buffered, written back periodically by the tracker)
+        current_ip = request.META.get('REMOTE_ADDR')
+        known_ip = ip_tracker.pending_ip(user.pk) or user.last_login_ip
+        if known_ip and known_ip != current_ip:
+            user.last_login_ip = current_ip
+            ip_tracker.record(user.pk, current_ip)
+
+        # Check for suspicious activity
+        if self._is_suspicious_activity(request):
+            user.failed_login_attempts += 1
+            if user.failed_login_attempts >= settings.MAX_FAILED_ATTEMPTS:
+                user.account_locked_until = timezone.now() + timezone.timedelta(minutes=30)
+            return True
+        return False
+
     def _is_suspicious_activity(self, request):
         # Implement your suspicious activity detection logic here
         return False 
@@ -110,6 +110,11 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', 'is_read', 'created_at'], name='notif_recipient_read_created'),
+            # prune_notifications filters on is_read and created_at across all recipients
+            models.Index(fields=['is_read', 'created_at'], name='notif_read_created'),
+        ]
 
     def __str__(self):
         return f"{self.type} for {self.recipient.email} at {self.created_at}";
@@ -0,0 +1,124 @@
+import hashlib
+import math
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings. ``in`` never returns a false negative;
+    false positives happen at roughly ``error_rate`` once ``capacity`` items are added.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """
+    In-process view of the simplejwt blacklist tables.
+
+    A token jti that is not in the Bloom filter is known not to be revoked, so the common
+    case costs no query. A filter hit is confirmed against the database. The filter is
+    topped up with newly blacklisted tokens every ``REVOCATION_SYNC_INTERVAL`` seconds and
+    rebuilt from scratch every ``REVOCATION_REBUILD_INTERVAL`` seconds so expired entries
+    age out. Revocations made in this process are visible immediately; revocations made
+    by other workers become visible after the next sync.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._synced_at = 0.0
+        self._rebuilt_at = 0.0
+        self._last_blacklisted_at = None
+
+    def _sync_interval(self):
+        return getattr(settings, 'REVOCATION_SYNC_INTERVAL', 30)
+
+    def _rebuild_interval(self):
+        return getattr(settings, 'REVOCATION_REBUILD_INTERVAL', 600)
+
+    def sync(self, force_rebuild=False):
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+        now = time.monotonic()
+        rebuild = force_rebuild or self._filter is None or now - self._rebuilt_at >= self._rebuild_interval()
+        blacklisted = BlacklistedToken.objects.all()
+        if rebuild:
+            blacklisted = blacklisted.filter(token__expires_at__gt=timezone.now())
+        elif self._last_blacklisted_at is not None:
+            blacklisted = blacklisted.filter(blacklisted_at__gte=self._last_blacklisted_at)
+        rows = list(blacklisted.values_list('token__jti', 'blacklisted_at'))
+
+        with self._lock:
+            if rebuild:
+                capacity = max(len(rows) * 2, getattr(settings, 'REVOCATION_FILTER_CAPACITY', 100000))
+                self._filter = BloomFilter(capacity)
+                self._rebuilt_at = now
+            for jti, blacklisted_at in rows:
+                self._filter.add(jti)
+                if self._last_blacklisted_at is None or blacklisted_at > self._last_blacklisted_at:
+                    self._last_blacklisted_at = blacklisted_at
+            self._synced_at = now
+
+    def add(self, jti):
+        """Record a revocation made by this process without waiting for the next sync."""
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+
+    def _needs_sync(self):
+        return self._filter is None or time.monotonic() - self._synced_at >= self._sync_interval()
+
+    def is_revoked(self, jti):
+        if self._needs_sync():
+            self.sync()
+        if jti not in self._filter:
+            return False
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+    async def ais_revoked(self, jti):
+        if self._needs_sync():
+            await sync_to_async(self.sync)()
+        if jti not in self._filter:
+            return False
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+        return await BlacklistedToken.objects.filter(token__jti=jti).aexists()
+
+
+revocation_list = RevocationList()
+
+
+def revoke_token(token):
+    """
+    Blacklist any simplejwt token (access or refresh) by its jti and update the local
+    revocation filter. Access tokens get an OutstandingToken row so they can be blacklisted.
+    """
+    from rest_framework_simplejwt.settings import api_settings
+    from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+    outstanding, _ = token.outstand()
+    BlacklistedToken.objects.get_or_create(token=outstanding)
+    revocation_list.add(token[api_settings.JTI_CLAIM])
@@ -1,6 +1,7 @@
 from django.urls import re_path
-from .consumers import NotificationConsumer
+from .consumers import NotificationConsumer, DashboardConsumer
 
 websocket_urlpatterns = [
     re_path(r'ws/notifications/$', NotificationConsumer.as_asgi()),
-] 
\ No newline at end of file
+    re_path(r'ws/dashboard/$', DashboardConsumer.as_asgi()),
+]
@@ -25,6 +25,13 @@ class NotificationPreferencesSerializer(serializers.ModelSerializer):
             'digest_frequency',
         ]
 
+    def update(self, instance, validated_data):
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        # Only write the preference columns, never the rest of the (possibly cached) user row
+        instance.save(update_fields=list(validated_data))
+        return instance
+
 class UserSerializer(serializers.ModelSerializer):
     """
     Serializer for user data in permit applications
@@ -44,6 +51,14 @@ class UserSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'email', 'role']
 
+    @classmethod
+    def select_related_paths(cls, prefix=''):
+        """
+        select_related() paths that let users reached through ``prefix`` serialize without
+        extra queries. The society's manager is the user itself and is filled in by the join.
+        """
+        return [f'{prefix}managed_society', f'{prefix}managed_society__rejected_by']
+
     def get_full_name(self, obj):
         return f"{obj.first_name} {obj.last_name}".strip() or obj.email
 
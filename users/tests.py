@@ -1,3 +1,412 @@
-from django.test import TestCase
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import PBKDF2SHA1PasswordHasher, check_password, make_password
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from permits import synthetic
+from utils import throttling
+from utils.testing import KEEP_TEST_CONNECTIONS, LOCAL_SERVICES
+from utils.throttling import RedisAnonRateThrottle
+
+from . import jwt_channels_middleware
+from .authentication import _user_cache
+from .consumers import ADMINS_GROUP, NotificationConsumer
+from .hashing import password_hasher
+from .ip_tracker import BufferedIPTracker
+from .models import CustomUser, Notification
+from .revocation import revocation_list
+from .serializers import CustomUserDetailsSerializer
+from .utils import notify_admins
+
+
+@LOCAL_SERVICES
+class CachedUserWriteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            "farmer@example.com", "pass", role="FARMER", is_active=True
+        )
+
+    def setUp(self):
+        _user_cache.clear()
+        self.client.cookies["access_token"] = str(AccessToken.for_user(self.user))
+
+    def test_preference_update_keeps_changes_made_elsewhere(self):
+        self.client.get("/api/auth/notification-preferences/", secure=True)  # caches the user
+        # Another process locks the account; this process's cached copy does not see it
+        CustomUser.objects.filter(pk=self.user.pk).update(failed_login_attempts=4)
+
+        response = self.client.put(
+            "/api/auth/notification-preferences/",
+            {"digest_frequency": "daily"},
+            content_type="application/json",
+            secure=True,
+        )
+        self.assertEqual(response.status_code, 200)
+        user = CustomUser.objects.get(pk=self.user.pk)
+        self.assertEqual(user.digest_frequency, "daily")
+        self.assertEqual(user.failed_login_attempts, 4)
+
+
+@LOCAL_SERVICES
+@override_settings(PASSWORD_HASH_WORKERS=0)
+class LoginTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = synthetic.seed_dataset({"societies": 2, "permits": 5, "notifications": 0})["manager"]
+        cls.manager.set_password("pass")
+        cls.manager.save(update_fields=["password"])
+
+    def test_login_payload_matches_user_details_in_fixed_queries(self):
+        # The user with their society (and its rejector), then the outstanding refresh token
+        with self.assertNumQueries(2):
+            response = self.client.post(
+                "/api/auth/login/", {"login_field": self.manager.email, "password": "pass"}, secure=True
+            )
+        self.assertEqual(response.status_code, 200)
+        user = CustomUser.objects.get(pk=self.manager.pk)
+        self.assertEqual(response.json()["user"], json.loads(json.dumps(CustomUserDetailsSerializer(user).data)))
+
+    def test_login_answers_503_when_hashing_is_saturated(self):
+        exhausted = threading.BoundedSemaphore(1)
+        exhausted.acquire()
+        with mock.patch.object(password_hasher, "_slots", exhausted):
+            response = self.client.post(
+                "/api/auth/login/", {"login_field": self.manager.email, "password": "pass"}, secure=True
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertFalse(response.cookies.get("access_token"))
+
+    # The fast hasher first; the PBKDF2 one only verifies the outdated hash below
+    @override_settings(PASSWORD_HASH_WORKERS=1, PASSWORD_HASHERS=[
+        "django.contrib.auth.hashers.MD5PasswordHasher", "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    ])
+    async def test_acheck_password_hashes_on_the_pool(self):
+        user = await CustomUser.objects.aget(pk=self.manager.pk)
+        user.password = make_password("pass")
+        self.assertTrue(await password_hasher.acheck_password(user, "pass"))
+        self.assertFalse(await password_hasher.acheck_password(user, "wrong"))
+
+        # A hash from an outdated hasher is upgraded once the password is verified
+        user.password = PBKDF2SHA1PasswordHasher().encode("pass", "saltsaltsalt", iterations=1000)
+        await user.asave(update_fields=["password"])
+        self.assertFalse(await password_hasher.acheck_password(user, "wrong"))
+        self.assertTrue((await CustomUser.objects.aget(pk=user.pk)).password.startswith("pbkdf2_sha1$"))
+        self.assertTrue(await password_hasher.acheck_password(user, "pass"))
+        stored = (await CustomUser.objects.aget(pk=user.pk)).password
+        self.assertTrue(stored.startswith("md5$"))
+        self.assertTrue(check_password("pass", stored))
+
+
+@LOCAL_SERVICES
+@KEEP_TEST_CONNECTIONS
+class WebsocketUserCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = synthetic.seed_dataset({"societies": 1, "permits": 0, "notifications": 0})["manager"]
+
+    def setUp(self):
+        jwt_channels_middleware._user_cache.clear()
+        self.addCleanup(jwt_channels_middleware._user_cache.clear)
+
+    async def connect(self):
+        scopes = []
+
+        async def app(scope, receive, send):
+            scopes.append(scope)
+
+        headers = [(b"cookie", f"access_token={AccessToken.for_user(self.manager)}".encode())]
+        await jwt_channels_middleware.JWTAuthMiddleware(app)({"type": "websocket", "headers": headers}, None, None)
+        return scopes[0]["user"]
+
+    async def test_user_is_loaded_once_and_reloaded_after_changes(self):
+        load_user = mock.Mock(wraps=jwt_channels_middleware._load_user)
+        with mock.patch.object(jwt_channels_middleware, "_load_user", load_user):
+            user = await self.connect()
+            self.assertEqual((user.id, user.managed_society_id), (self.manager.pk, self.manager.managed_society.pk))
+            self.assertIs(await self.connect(), user)
+            self.assertEqual(load_user.call_count, 1)
+
+            # Saving the user drops the cached identity
+            self.manager.role = "ADMIN"
+            await self.manager.asave(update_fields=["role"])
+            self.assertEqual((await self.connect()).role, "ADMIN")
+            self.assertEqual(load_user.call_count, 2)
+
+            with override_settings(WEBSOCKET_USER_CACHE_TTL=0):
+                jwt_channels_middleware._user_cache.clear()
+                await self.connect()
+                await self.connect()
+            self.assertEqual(load_user.call_count, 4)
+
+    async def test_expired_entries_are_reloaded(self):
+        await self.connect()
+        expires_at, user = jwt_channels_middleware._user_cache[self.manager.pk]
+        jwt_channels_middleware._user_cache[self.manager.pk] = (expires_at - 3600, user)
+        self.assertIsNone(jwt_channels_middleware.get_cached_user(self.manager.pk))
+        self.assertIsNot(await self.connect(), user)
+
+
+@LOCAL_SERVICES
+@KEEP_TEST_CONNECTIONS
+class NotifyAdminsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admins = [
+            CustomUser.objects.create_user(f"admin-{i}@example.com", "pass", is_staff=True, is_active=True)
+            for i in range(3)
+        ]
+        CustomUser.objects.create_user("former-admin@example.com", "pass", is_staff=True, is_active=False)
+        cls.farmer = CustomUser.objects.create_user("farmer@example.com", "pass", role="FARMER", is_active=True)
+
+    def test_one_insert_and_one_publish_for_all_admins(self):
+        layer = mock.Mock(group_send=mock.AsyncMock())
+        with mock.patch("users.utils.get_channel_layer", return_value=layer):
+            # The staff ids, then a single bulk insert
+            with self.assertNumQueries(2):
+                notify_admins("NEW_PERMIT", "A permit was submitted", link="/admin/permits")
+        layer.group_send.assert_called_once()
+        group, event = layer.group_send.call_args.args
+        self.assertEqual(group, ADMINS_GROUP)
+        notifications = Notification.objects.filter(type="NEW_PERMIT")
+        self.assertEqual(event["ids"], {str(n.recipient_id): n.id for n in notifications})
+        self.assertEqual(set(notifications.values_list("recipient_id", flat=True)), {a.pk for a in self.admins})
+
+    async def test_each_staff_socket_receives_its_own_notification(self):
+        from channels.testing import WebsocketCommunicator
+
+        admin = self.admins[0]
+        communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), "/ws/notifications/")
+        communicator.scope["user"] = jwt_channels_middleware.WebsocketUser(
+            admin.pk, admin.email, admin.role, True, True
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await sync_to_async(notify_admins)("NEW_PERMIT", "A permit was submitted")
+        message = await communicator.receive_json_from()
+        notification = await Notification.objects.aget(recipient=admin, type="NEW_PERMIT")
+        self.assertEqual((message["id"], message["message"]), (notification.pk, "A permit was submitted"))
+        await communicator.disconnect()
+
+
+class BufferedIPTrackerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            CustomUser.objects.create_user(f"farmer-{i}@example.com", "pass", role="FARMER", is_active=True)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.tracker = BufferedIPTracker(flush_interval=3600)
+        self.addCleanup(self.tracker._stop.set)
+
+    def test_flush_writes_the_latest_address_per_user_in_one_update(self):
+        for user, ip in zip(self.users, ["10.0.0.1", "10.0.0.2", "10.0.0.3"]):
+            self.tracker.record(user.pk, ip)
+        self.tracker.record(self.users[0].pk, "10.0.0.9")
+        self.assertEqual(self.tracker.pending_ip(self.users[0].pk), "10.0.0.9")
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.tracker.flush(), 3)
+        self.assertEqual(
+            dict(CustomUser.objects.filter(pk__in=[u.pk for u in self.users]).values_list("pk", "last_login_ip")),
+            {self.users[0].pk: "10.0.0.9", self.users[1].pk: "10.0.0.2", self.users[2].pk: "10.0.0.3"},
+        )
+        self.assertIsNone(self.tracker.pending_ip(self.users[0].pk))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.tracker.flush(), 0)
+
+    def test_flush_batches_updates(self):
+        self.tracker.batch_size = 2
+        for user in self.users:
+            self.tracker.record(user.pk, "10.0.0.1")
+        with self.assertNumQueries(2):
+            self.tracker.flush()
+
+
+@LOCAL_SERVICES
+class PruneNotificationsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = CustomUser.objects.create_user("farmer@example.com", "pass", role="FARMER", is_active=True)
+        old = timezone.now() - timedelta(days=100)
+        for i in range(5):
+            for is_read in (True, False):
+                notification = Notification.objects.create(recipient=user, type="info", message=f"old {i}",
+                                                           is_read=is_read)
+                Notification.objects.filter(pk=notification.pk).update(created_at=old)
+        Notification.objects.create(recipient=user, type="info", message="recent", is_read=True)
+
+    def prune(self, *args):
+        call_command("prune_notifications", "--days", "90", *args, stdout=io.StringIO())
+
+    def test_only_old_read_notifications_are_removed_in_batches(self):
+        kept = set(Notification.objects.exclude(is_read=True, message__startswith="old").values_list("id", flat=True))
+        with tempfile.TemporaryDirectory() as directory:
+            archive = os.path.join(directory, "archive.jsonl")
+            self.prune("--batch-size", "2", "--archive", archive)
+            with open(archive, encoding="utf-8") as f:
+                archived = [json.loads(line) for line in f]
+        self.assertEqual(set(Notification.objects.values_list("id", flat=True)), kept)
+        self.assertEqual(len(archived), 5)
+        self.assertTrue(all(row["is_read"] for row in archived))
+
+    def test_dry_run_deletes_nothing(self):
+        self.prune("--dry-run")
+        self.assertEqual(Notification.objects.count(), 11)
+
+
+@LOCAL_SERVICES
+class TokenRevocationTests(TestCase):
+    URL = "/api/auth/user/role/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("farmer@example.com", "pass", role="FARMER", is_active=True)
+
+    def setUp(self):
+        _user_cache.clear()
+        revocation_list.sync(force_rebuild=True)
+
+    def use(self, client, refresh, access):
+        client.cookies["access_token"] = str(access)
+        client.cookies["refresh_token"] = str(refresh)
+        return client
+
+    def test_logout_revokes_both_tokens_in_this_process(self):
+        refresh = RefreshToken.for_user(self.user)
+        access = refresh.access_token
+        self.use(self.client, refresh, access)
+        # Unrevoked tokens miss the filter: the user is the only query
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.URL, secure=True).status_code, 200)
+
+        self.client.post("/api/auth/logout/", secure=True)
+        self.use(self.client, refresh, access)
+        self.assertEqual(self.client.get(self.URL, secure=True).status_code, 401)
+        self.assertTrue(revocation_list.is_revoked(refresh["jti"]))
+        self.assertTrue(revocation_list.is_revoked(access["jti"]))
+        self.assertFalse(revocation_list.is_revoked(RefreshToken.for_user(self.user)["jti"]))
+
+    @override_settings(REVOCATION_SYNC_INTERVAL=0)
+    async def test_revocations_from_other_processes_apply_after_a_sync(self):
+        access = AccessToken.for_user(self.user)
+        self.async_client.cookies["access_token"] = str(access)
+        response = await self.async_client.get("/api/auth/async/notifications/", secure=True)
+        self.assertEqual(response.status_code, 200)
+
+        # Another worker blacklists the token; this process only learns of it by syncing
+        outstanding, _ = await sync_to_async(access.outstand)()
+        await BlacklistedToken.objects.acreate(token=outstanding)
+        response = await self.async_client.get("/api/auth/async/notifications/", secure=True)
+        self.assertEqual(response.status_code, 401)
+
+
+class CompactTokenBlacklistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = CustomUser.objects.create_user("farmer@example.com", "pass", role="FARMER", is_active=True)
+        now = timezone.now()
+        cls.live, cls.expired = [], []
+        for i in range(6):
+            expires_at = now + timedelta(days=1) if i % 2 else now - timedelta(days=1)
+            token = OutstandingToken.objects.create(
+                user=user, jti=f"jti-{i}", token=f"token-{i}", created_at=now - timedelta(days=2),
+                expires_at=expires_at,
+            )
+            (cls.live if i % 2 else cls.expired).append(token.pk)
+            if i < 4:
+                BlacklistedToken.objects.create(token=token)
+
+    def test_only_expired_tokens_are_removed(self):
+        call_command("compact_token_blacklist", "--batch-size", "2", stdout=io.StringIO())
+        self.assertEqual(set(OutstandingToken.objects.values_list("pk", flat=True)), set(self.live))
+        self.assertEqual(set(BlacklistedToken.objects.values_list("token_id", flat=True)), set(self.live[:2]))
+
+    def test_dry_run_deletes_nothing(self):
+        out = io.StringIO()
+        call_command("compact_token_blacklist", "--dry-run", stdout=out)
+        self.assertIn("3 expired outstanding tokens would be removed, 2 of them blacklisted", out.getvalue())
+        self.assertEqual(OutstandingToken.objects.count(), 6)
+
+
+class WindowThrottle(RedisAnonRateThrottle):
+    scope = "window-test"
+    rate = "3/minute"
+
+
+def anonymous_request():
+    request = RequestFactory().get("/", REMOTE_ADDR="10.1.2.3")
+    request.user = AnonymousUser()
+    return request
+
+
+@skipUnless(importlib.util.find_spec("fakeredis") and importlib.util.find_spec("lupa"),
+            "needs fakeredis with Lua support")
+class RedisThrottleWindowTests(SimpleTestCase):
+    def setUp(self):
+        import fakeredis
+
+        client = fakeredis.FakeRedis()
+        patcher = mock.patch.multiple(
+            throttling, _client=client, _script=client.register_script(throttling.SLIDING_WINDOW_SCRIPT),
+            _retry_after=0.0,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.now = 600.0  # the start of a one-minute window
+
+    def check(self):
+        throttle = WindowThrottle()
+        throttle.timer = lambda: self.now
+        return throttle.allow_request(anonymous_request(), None), throttle
+
+    def test_sliding_window(self):
+        self.assertEqual([self.check()[0] for _ in range(4)], [True, True, True, False])
+        allowed, throttle = self.check()
+        self.assertFalse(allowed)
+        self.assertEqual(throttle.wait(), 60)
+
+        # Halfway through the next window the previous one still counts for half: 3 * 0.5 + 1 <= 3
+        self.now += 90
+        self.assertEqual([self.check()[0] for _ in range(2)], [True, False])
+        self.assertEqual(throttling.get_throttle_stats(["window-test"]),
+                         {"window-test": {"allowed": 4, "throttled": 3}})
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache",
+                        "LOCATION": "redis://127.0.0.1:1/0"}},
+    THROTTLE_REDIS={"host": "127.0.0.1", "port": 1},
+)
+class RedisThrottleOutageTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(throttling, _client=None, _script=None, _retry_after=0.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        WindowThrottle.cache.clear()
+
+    def test_falls_back_to_a_local_window_when_redis_is_down(self):
+        # Both Redis and the Redis-backed default cache are unreachable
+        with self.assertLogs("utils.throttling", "WARNING"):
+            results = [WindowThrottle().allow_request(anonymous_request(), None) for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+
+    async def test_async_check_runs_off_the_event_loop(self):
+        with self.assertLogs("utils.throttling", "WARNING"):
+            self.assertTrue(await WindowThrottle().aallow_request(anonymous_request(), None))
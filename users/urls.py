@@ -7,6 +7,7 @@ from django.utils.decorators import method_decorator
 from django.http import HttpResponse, JsonResponse
 from .views import SecureLoginView, SecureLogoutView, UserRoleView, CustomRegisterView, NotificationPreferencesView, NotificationViewSet, PasswordResetRequestView, PasswordResetConfirmView
 from rest_framework.routers import DefaultRouter
+from .async_views import notification_list
 
 @method_decorator(ensure_csrf_cookie, name='dispatch')
 class GetCSRFToken(APIView):
@@ -30,5 +31,6 @@ urlpatterns = [
     path('notification-preferences/', NotificationPreferencesView.as_view(), name='notification-preferences'),
     path('password/forgot/', PasswordResetRequestView.as_view(), name='password_forgot'),
     path('password/reset/confirm/', PasswordResetConfirmView.as_view(), name='password_reset_confirm'),
+    path('async/notifications/', notification_list, name='async_notification_list'),
     path('', include(router.urls)),
 ]
@@ -1,7 +1,18 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections, transaction
+
 from .models import CustomUser, Notification
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from users.serializers import NotificationSerializer
+from utils.metrics import NOTIFICATION_RECIPIENTS, NOTIFICATION_SECONDS
+
+logger = logging.getLogger(__name__)
+
 
 def notify_users(users, type, message, link=None):
     """
@@ -9,10 +20,13 @@ def notify_users(users, type, message, link=None):
     users: a user instance or a list/queryset of users
     """
     from collections.abc import Iterable
+    started = time.perf_counter()
     channel_layer = get_channel_layer()
     if not isinstance(users, Iterable) or isinstance(users, str):
         users = [users]
+    recipients = 0
     for user in users:
+        recipients += 1
         notif = Notification.objects.create(
             recipient=user,
             type=type,
@@ -27,10 +41,64 @@ def notify_users(users, type, message, link=None):
                 "content": NotificationSerializer(notif).data,
             }
         )
+    NOTIFICATION_RECIPIENTS.labels(kind="users").observe(recipients)
+    NOTIFICATION_SECONDS.labels(kind="users").observe(time.perf_counter() - started)
 
 # Backward compatible aliases
 notify_user = notify_users
 
 def notify_admins(type, message, link=None):
-    admins = CustomUser.objects.filter(is_staff=True, is_active=True)
-    notify_users(admins, type, message, link) 
\ No newline at end of file
+    """
+    Send a notification to every active staff user.
+    Rows are written with one bulk insert and the real-time event is published
+    once to the shared admins group; each staff socket picks out its own id.
+    """
+    from .consumers import ADMINS_GROUP
+    started = time.perf_counter()
+    admin_ids = list(CustomUser.objects.filter(is_staff=True, is_active=True).values_list('id', flat=True))
+    if not admin_ids:
+        return
+    notifs = Notification.objects.bulk_create([
+        Notification(recipient_id=admin_id, type=type, message=message, link=link or '')
+        for admin_id in admin_ids
+    ])
+    channel_layer = get_channel_layer()
+    async_to_sync(channel_layer.group_send)(
+        ADMINS_GROUP,
+        {
+            "type": "notify_admins",
+            "content": NotificationSerializer(notifs[0]).data,
+            "ids": {str(notif.recipient_id): notif.id for notif in notifs},
+        }
+    )
+    NOTIFICATION_RECIPIENTS.labels(kind="admins").observe(len(admin_ids))
+    NOTIFICATION_SECONDS.labels(kind="admins").observe(time.perf_counter() - started)
+
+
+_notification_executor = None
+_notification_executor_lock = threading.Lock()
+
+
+def _run_in_background(func, *args):
+    try:
+        func(*args)
+    except Exception as e:
+        logger.error(f"Background notification failed: {str(e)}")
+    finally:
+        connections.close_all()
+
+
+def notify_admins_later(type, message, link=None):
+    """
+    notify_admins() off the request path. Queued once the current transaction commits
+    and run on a single background thread, so the request does not wait for the staff
+    lookup, the insert or the channel-layer publish.
+    """
+    def submit():
+        global _notification_executor
+        with _notification_executor_lock:
+            if _notification_executor is None:
+                _notification_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='notifications')
+        _notification_executor.submit(_run_in_background, notify_admins, type, message, link)
+
+    transaction.on_commit(submit)
@@ -1,15 +1,21 @@
+import json
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
 from django.utils.decorators import method_decorator
+from django.views import View
 from django.views.decorators.csrf import ensure_csrf_cookie, csrf_protect
 from rest_framework import status, viewsets, permissions
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
 from django.contrib.auth import get_user_model
-from rest_framework.throttling import AnonRateThrottle
+from utils.async_views import api_response
+from utils.throttling import RedisAnonRateThrottle
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
+from django.db.models import Case, F, Value, When
 from .serializers import (
     CustomUserDetailsSerializer, LoginSerializer, NotificationPreferencesSerializer, NotificationSerializer,
     PasswordResetRequestSerializer, PasswordResetConfirmSerializer
@@ -20,6 +26,8 @@ from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
 from django.conf import settings
 from django.utils import timezone
 from .models import Notification, PasswordResetToken
+from .revocation import revoke_token
+from .hashing import password_hasher, PasswordHashingBusy
 from django.http import JsonResponse
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
@@ -30,57 +38,98 @@ import secrets
 
 User = get_user_model()
 
-class LoginRateThrottle(AnonRateThrottle):
+class LoginRateThrottle(RedisAnonRateThrottle):
+    scope = 'login'
     rate = '5/minute'
 
-class TokenRefreshRateThrottle(AnonRateThrottle):
+class TokenRefreshRateThrottle(RedisAnonRateThrottle):
+    scope = 'token_refresh'
     rate = '10/minute'
 
-class LogoutRateThrottle(AnonRateThrottle):
+class LogoutRateThrottle(RedisAnonRateThrottle):
+    scope = 'logout'
     rate = '10/minute'
 
-@method_decorator(csrf_protect, name='dispatch')
-class SecureLoginView(APIView):
-    permission_classes = [AllowAny]
-    throttle_classes = [LoginRateThrottle]
+class SecureLoginView(View):
+    """
+    Async login view. Under daphne the password hash is awaited on the hashing thread
+    pool (users.hashing), so a login storm does not hold the thread that runs sync views.
+    CSRF-protected and throttled with LoginRateThrottle like the other auth views.
+    """
+    http_method_names = ['post']
 
-    def post(self, request):
-        serializer = LoginSerializer(data=request.data)
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_protect(super().as_view(**initkwargs))
+
+    async def post(self, request):
+        # Resolve the session user up front; the throttle reads request.user
+        request.user = await request.auser()
+        throttle = LoginRateThrottle()
+        if not await throttle.aallow_request(request, self):
+            wait = throttle.wait()
+            return api_response(
+                {'detail': 'Request was throttled.'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': str(int(wait))} if wait is not None else None,
+            )
+
+        if request.content_type == 'application/json':
+            try:
+                data = json.loads(request.body or b'{}')
+            except ValueError:
+                data = {}
+        else:
+            data = request.POST
+        serializer = LoginSerializer(data=data if isinstance(data, dict) else {})
         if not serializer.is_valid():
-            return Response({'error': 'Invalid credentials.'}, status=400)
+            return api_response({'error': 'Invalid credentials.'}, status=400)
         login_field = serializer.validated_data['login_field']
         password = serializer.validated_data['password']
 
-        user = None
+        lookup = {'email': login_field} if '@' in login_field else {'phone_no': login_field}
         try:
-            user = User.objects.get(email=login_field) if '@' in login_field else User.objects.get(phone_no=login_field)
+            # One query for the user, their society and whoever rejected it (for the response)
+            user = await User.objects.select_related('managed_society__rejected_by').aget(**lookup)
         except User.DoesNotExist:
-            return Response({'error': 'Invalid credentials.'}, status=status.HTTP_401_UNAUTHORIZED)
+            return api_response({'error': 'Invalid credentials.'}, status=status.HTTP_401_UNAUTHORIZED)
 
+        now = timezone.now()
         # Account lockout check
-        if user.account_locked_until and user.account_locked_until > timezone.now():
-            return Response({'error': 'Account is temporarily locked due to multiple failed login attempts. Please try again later.'}, status=status.HTTP_403_FORBIDDEN)
+        if user.account_locked_until and user.account_locked_until > now:
+            return api_response({'error': 'Account is temporarily locked due to multiple failed login attempts. Please try again later.'}, status=status.HTTP_403_FORBIDDEN)
 
-        if not user.check_password(password):
-            user.failed_login_attempts += 1
-            if user.failed_login_attempts >= getattr(settings, 'MAX_FAILED_ATTEMPTS', 5):
-                user.account_locked_until = timezone.now() + timezone.timedelta(minutes=getattr(settings, 'ACCOUNT_LOCKOUT_DURATION', 30))
-            user.save(update_fields=['failed_login_attempts', 'account_locked_until'])
-            return Response({'error': 'Invalid credentials.'}, status=status.HTTP_401_UNAUTHORIZED)
+        try:
+            password_ok = await password_hasher.acheck_password(user, password)
+        except PasswordHashingBusy:
+            return self.busy_response()
 
-        # Reset failed attempts on successful login
+        if not password_ok:
+            # Increment and lock in a single UPDATE so concurrent failures are all counted
+            max_attempts = getattr(settings, 'MAX_FAILED_ATTEMPTS', 5)
+            locked_until = now + timezone.timedelta(minutes=getattr(settings, 'ACCOUNT_LOCKOUT_DURATION', 30))
+            await User.objects.filter(pk=user.pk).aupdate(
+                failed_login_attempts=F('failed_login_attempts') + 1,
+                account_locked_until=Case(
+                    When(failed_login_attempts__gte=max_attempts - 1, then=Value(locked_until)),
+                    default=F('account_locked_until'),
+                ),
+            )
+            return api_response({'error': 'Invalid credentials.'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        # Reset failed attempts on successful login, only when there is something to reset
         if user.failed_login_attempts > 0 or user.account_locked_until:
-            user.failed_login_attempts = 0
-            user.account_locked_until = None
-            user.save(update_fields=['failed_login_attempts', 'account_locked_until'])
+            await User.objects.filter(pk=user.pk).aupdate(failed_login_attempts=0, account_locked_until=None)
 
         # Check if user is active and approved
         if not user.is_active:
-            return Response({'error': 'Invalid credentials.'}, status=status.HTTP_401_UNAUTHORIZED)
+            return api_response({'error': 'Invalid credentials.'}, status=status.HTTP_401_UNAUTHORIZED)
 
-        refresh = RefreshToken.for_user(user)
+        # Stores the outstanding token for the blacklist
+        refresh = await sync_to_async(RefreshToken.for_user)(user)
+        # Serialized from the select_related user above, without further queries
         user_data = CustomUserDetailsSerializer(user).data
-        response = Response({'user': user_data})
+        response = api_response({'user': user_data})
         # Set secure, HTTP-only cookies
         response.set_cookie(
             'access_token',
@@ -100,6 +149,14 @@ class SecureLoginView(APIView):
         )
         return response
 
+    @staticmethod
+    def busy_response():
+        return api_response(
+            {'error': 'Too many sign-in requests are being processed. Please try again shortly.'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={'Retry-After': '1'},
+        )
+
 @method_decorator(csrf_protect, name='dispatch')
 class SecureLogoutView(APIView):
     permission_classes = [AllowAny]
@@ -112,8 +169,13 @@ class SecureLogoutView(APIView):
         try:
             refresh_token = request.COOKIES.get('refresh_token')
             if refresh_token:
-                token = RefreshToken(refresh_token)
-                token.blacklist()
+                revoke_token(RefreshToken(refresh_token))
+        except Exception as e:
+            pass
+        try:
+            access_token = request.COOKIES.get('access_token')
+            if access_token:
+                revoke_token(AccessToken(access_token))
         except Exception as e:
             pass
         return response
@@ -161,7 +223,7 @@ class TokenRefreshView(APIView):
             user = token.get('user_id')
             new_refresh = RefreshToken.for_user(user)
             new_access = new_refresh.access_token
-            token.blacklist()
+            revoke_token(token)
             response = Response({'message': 'Token refreshed'})
             response.set_cookie(
                 'access_token',
@@ -291,7 +353,10 @@ class PasswordResetConfirmView(APIView):
         if not reset_token.is_valid():
             return Response({'error': 'Token expired or already used.'}, status=400)
         # Set new password
-        user.set_password(new_password)
+        try:
+            password_hasher.set_password(user, new_password)
+        except PasswordHashingBusy:
+            return SecureLoginView.busy_response()
         user.save()
         reset_token.mark_used()
         return Response({'message': 'Password reset successful.'})
@@ -0,0 +1,105 @@
+import functools
+import inspect
+
+from django.http import JsonResponse
+from rest_framework.exceptions import APIException
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from utils.pagination import StandardResultsSetPagination
+
+
+def api_response(data, status=200, headers=None):
+    """JSON response encoded the same way DRF's JSONRenderer encodes it."""
+    return JsonResponse(
+        data, status=status, headers=headers, encoder=JSONEncoder, safe=False,
+        json_dumps_params={"separators": (",", ":"), "ensure_ascii": False},
+    )
+
+
+def async_api_view(throttles=None):
+    """
+    Decorator for async-native read-only API views.
+
+    Authenticates with CachedJWTCookieAuthentication.aauthenticate, requires an
+    authenticated user, applies the throttles returned by ``throttles(request)`` and
+    turns DRF exceptions into the same JSON error responses DRF would produce.
+    Everything else is left to the view, which must only use the async ORM.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            from users.authentication import CachedJWTCookieAuthentication
+
+            if request.method not in ("GET", "HEAD"):
+                return api_response({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+            try:
+                result = await CachedJWTCookieAuthentication().aauthenticate(request)
+                if result is None:
+                    return api_response({"detail": "Authentication credentials were not provided."}, status=401)
+                request.user, request.auth = result
+                for throttle in (throttles(request) if throttles else []):
+                    if not await throttle.aallow_request(request, None):
+                        wait = throttle.wait()
+                        return api_response(
+                            {"detail": "Request was throttled."},
+                            status=429,
+                            headers={"Retry-After": str(int(wait))} if wait is not None else None,
+                        )
+                return await view(request, *args, **kwargs)
+            except APIException as e:
+                detail = e.detail if isinstance(e.detail, (list, dict)) else {"detail": e.detail}
+                return api_response(detail, status=e.status_code)
+        return wrapper
+    return decorator
+
+
+async def apaginate(request, queryset, serialize, pagination_class=StandardResultsSetPagination):
+    """
+    Async counterpart of PageNumberPagination for querysets and lists. Returns the same
+    ``{count, next, previous, results}`` payload, or None when the page is out of range.
+    ``serialize`` turns the page's objects into the result list; it may be a coroutine function.
+    """
+    paginator = pagination_class()
+    page_size = paginator.page_size
+    if paginator.page_size_query_param in request.GET:
+        try:
+            page_size = min(int(request.GET[paginator.page_size_query_param]), paginator.max_page_size)
+            if page_size <= 0:
+                page_size = paginator.page_size
+        except ValueError:
+            pass
+
+    if isinstance(queryset, list):
+        count = len(queryset)
+    else:
+        count = await queryset.acount()
+    page_number = request.GET.get(paginator.page_query_param, 1)
+    try:
+        page_number = int(page_number)
+    except ValueError:
+        if page_number not in paginator.last_page_strings:
+            return None
+        page_number = max(1, -(-count // page_size))
+    last_page = max(1, -(-count // page_size))
+    if page_number < 1 or page_number > last_page:
+        return None
+
+    offset = (page_number - 1) * page_size
+    if isinstance(queryset, list):
+        objects = queryset[offset:offset + page_size]
+    else:
+        objects = [obj async for obj in queryset[offset:offset + page_size]]
+
+    url = request.build_absolute_uri()
+    next_url = replace_query_param(url, paginator.page_query_param, page_number + 1) if page_number < last_page else None
+    if page_number <= 1:
+        previous_url = None
+    elif page_number == 2:
+        previous_url = remove_query_param(url, paginator.page_query_param)
+    else:
+        previous_url = replace_query_param(url, paginator.page_query_param, page_number - 1)
+    results = serialize(objects)
+    if inspect.isawaitable(results):
+        results = await results
+    return {"count": count, "next": next_url, "previous": previous_url, "results": results}
@@ -0,0 +1,225 @@
+"""
+Read-replica routing for analytics, exports and reference data.
+
+When DATABASES has a "replica" alias, views decorated with reads_from_replica (and
+code using replica_db() as an explicit ``using()`` hint) read from it; everything else,
+and every write, stays on the primary. Routing falls back to the primary when:
+
+- the replica cannot be reached (it is retried after REPLICA_RETRY_INTERVAL seconds);
+- the current request has already written something (outside untracked_writes());
+- the user wrote something in the last DATABASE_REPLICA_LAG seconds, so they always
+  see their own changes (read-your-writes). ReplicaRoutingMiddleware records this in
+  the shared cache at the end of a request that wrote.
+
+Without a replica the middleware removes itself and all reads go to the primary.
+"""
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed, SynchronousOnlyOperation
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.http import HttpRequest
+from rest_framework.request import Request
+
+logger = logging.getLogger(__name__)
+
+REPLICA = "replica"
+REPLICA_RETRY_INTERVAL = 30
+
+# After a connection error, skip the replica until this monotonic time
+_retry_after = 0.0
+
+
+class _RoutingState:
+    __slots__ = ("use_replica", "wrote")
+
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+_state = ContextVar("db_routing_state", default=None)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def _replica_available():
+    global _retry_after
+    if time.monotonic() < _retry_after:
+        return False
+    replica = connections[REPLICA]
+    if replica.connection is not None:
+        return True
+    try:
+        replica.ensure_connection()
+    except SynchronousOnlyOperation:
+        # Routed from the event loop; the query itself connects in a worker thread
+        return True
+    except DatabaseError as e:
+        _retry_after = time.monotonic() + REPLICA_RETRY_INTERVAL
+        logger.warning(f"Read replica unavailable, using the primary: {str(e)}")
+        return False
+    return True
+
+
+def _sticky_key(user_id):
+    return f"db:recent-write:{user_id}"
+
+
+def _user_id(request):
+    user = getattr(request, "user", None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+def _recently_wrote(request):
+    user_id = _user_id(request)
+    return user_id is not None and cache.get(_sticky_key(user_id)) is not None
+
+
+def replica_db(request=None):
+    """
+    Alias for an explicit ``using()`` hint on a read-only query: the replica if it is
+    configured, reachable and safe for this request and user, otherwise the primary.
+    """
+    if not replica_configured():
+        return DEFAULT_DB_ALIAS
+    state = _state.get()
+    if state is not None and state.wrote:
+        return DEFAULT_DB_ALIAS
+    if request is not None and _recently_wrote(request):
+        return DEFAULT_DB_ALIAS
+    return REPLICA if _replica_available() else DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def replica_reads(request=None, check_user=True):
+    """Route reads made inside the block to the replica (see ReplicaRouter)."""
+    if not replica_configured() or (check_user and request is not None and _recently_wrote(request)):
+        yield
+        return
+    state = _state.get()
+    token = None
+    if state is None:
+        state = _RoutingState()
+        token = _state.set(state)
+    previous, state.use_replica = state.use_replica, True
+    try:
+        yield
+    finally:
+        state.use_replica = previous
+        if token is not None:
+            _state.reset(token)
+
+
+@contextmanager
+def untracked_writes():
+    """
+    Writes inside the block do not move the rest of the request, or the user's next
+    requests, to the primary. For housekeeping the request does not read back, such as
+    expiring overdue permits on the way into a read-only view.
+    """
+    state = _state.get()
+    wrote = state.wrote if state is not None else False
+    try:
+        yield
+    finally:
+        if state is not None:
+            state.wrote = wrote
+
+
+def _find_request(args):
+    return next((arg for arg in args if isinstance(arg, (HttpRequest, Request))), None)
+
+
+def reads_from_replica(view):
+    """Decorator for read-only view functions and viewset actions, sync or async."""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            request = _find_request(args)
+            user_id = _user_id(request) if replica_configured() else None
+            sticky = user_id is not None and await cache.aget(_sticky_key(user_id)) is not None
+            if sticky:
+                return await view(*args, **kwargs)
+            with replica_reads(request, check_user=False):
+                return await view(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with replica_reads(_find_request(args)):
+            return view(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Primary for everything except reads inside replica_reads() before any write."""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is not None and state.use_replica and not state.wrote and _replica_available():
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary
+        return db != REPLICA
+
+
+class ReplicaRoutingMiddleware:
+    """Tracks writes per request and keeps the user on the primary for a while after one."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.lag = getattr(settings, "DATABASE_REPLICA_LAG", 10)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state = _RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        user_id = _user_id(request)
+        if state.wrote and user_id is not None:
+            cache.set(_sticky_key(user_id), 1, self.lag)
+        return response
+
+    async def __acall__(self, request):
+        state = _RoutingState()
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        user_id = _user_id(request)
+        if state.wrote and user_id is not None:
+            await cache.aset(_sticky_key(user_id), 1, self.lag)
+        return response
@@ -0,0 +1,152 @@
+"""
+Opt-in per-request SQL and timing instrumentation.
+
+RequestInstrumentationMiddleware records, for every request, the number of queries and
+total SQL time (through a database execute wrapper), queries repeated with the same
+shape (N+1 candidates), the view name and the response size. It adds a Server-Timing
+header and logs one JSON line per request to the ``utils.instrumentation`` logger; a
+sample of slow requests also logs their queries.
+
+Set REQUEST_INSTRUMENTATION to enable it. When it is off the middleware removes itself
+from the chain at startup and no execute wrapper is installed, so there is no cost.
+"""
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("request_stats", default=None)
+
+_IN_LIST = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def fingerprint(sql):
+    """Query shape with literals and IN-list lengths removed, so N+1 loops collapse to one key."""
+    return _LITERAL.sub("?", _IN_LIST.sub("(...)", sql))
+
+
+class RequestStats:
+    __slots__ = ("queries", "sql_time")
+
+    def __init__(self):
+        self.queries = []
+        self.sql_time = 0.0
+
+    def duplicates(self, threshold):
+        counts = Counter(fingerprint(sql) for sql, _ in self.queries)
+        return [
+            {"sql": sql, "count": count}
+            for sql, count in counts.most_common() if count >= threshold
+        ]
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        stats.sql_time += duration
+        stats.queries.append((sql, duration))
+
+
+def _install(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _install_on_open_connections():
+    for connection in connections.all(initialized_only=True):
+        _install(connection)
+
+
+class RequestInstrumentationMiddleware:
+    """Put first in MIDDLEWARE so the numbers cover the whole middleware chain."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "REQUEST_INSTRUMENTATION", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, "REQUEST_INSTRUMENTATION_SLOW_MS", 500)
+        self.slow_sample_rate = getattr(settings, "REQUEST_INSTRUMENTATION_SLOW_SAMPLE_RATE", 1.0)
+        self.max_logged_queries = getattr(settings, "REQUEST_INSTRUMENTATION_MAX_LOGGED_QUERIES", 100)
+        self.duplicate_threshold = getattr(settings, "REQUEST_INSTRUMENTATION_DUPLICATE_THRESHOLD", 3)
+        # Connections opened from now on (in any thread) get the execute wrapper
+        connection_created.connect(_install, dispatch_uid="utils.instrumentation")
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        _install_on_open_connections()
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        # Sync views and the async ORM run in worker threads; the context variable
+        # follows them there and their connections get the wrapper when opened.
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats, time.perf_counter() - started)
+
+    def _finish(self, request, response, stats, elapsed):
+        total_ms = elapsed * 1000
+        sql_ms = stats.sql_time * 1000
+        timing = f'db;dur={sql_ms:.1f};desc="{len(stats.queries)} queries", app;dur={total_ms:.1f}'
+        existing = response.get("Server-Timing")
+        response["Server-Timing"] = f"{existing}, {timing}" if existing else timing
+
+        match = getattr(request, "resolver_match", None)
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "duration_ms": round(total_ms, 2),
+            "queries": len(stats.queries),
+            "sql_ms": round(sql_ms, 2),
+            # Streamed bodies are produced after the view returns; their size is unknown here
+            "response_bytes": None if response.streaming else len(response.content),
+            "duplicate_queries": stats.duplicates(self.duplicate_threshold),
+        }
+        level = logging.INFO
+        if total_ms >= self.slow_ms:
+            level = logging.WARNING
+            if random.random() < self.slow_sample_rate:
+                record["query_log"] = [
+                    {"sql": sql, "ms": round(duration * 1000, 2)}
+                    for sql, duration in stats.queries[:self.max_logged_queries]
+                ]
+        logger.log(level, json.dumps(record, default=str))
+        return response
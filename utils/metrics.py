@@ -0,0 +1,79 @@
+"""
+Prometheus metrics for the permits workflow, served as text by metrics_view.
+
+Metrics are module-level prometheus_client objects; code paths update them directly.
+Under gunicorn, or any setup with more than one worker process, start the workers with
+PROMETHEUS_MULTIPROC_DIR pointing at an empty directory they share. prometheus_client
+then keeps each process's samples in files there and metrics_view aggregates them on
+every scrape. Call mark_process_dead(worker.pid) from gunicorn's child_exit hook so the
+open-connection gauge forgets exited workers.
+
+The scrape endpoint is disabled unless METRICS_TOKEN is set, and then expects it as a
+bearer token.
+"""
+import hmac
+import os
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+
+PERMITS_CREATED = Counter(
+    "permits_created_total", "Permit applications created", ["source"],
+)
+PERMIT_TRANSITIONS = Counter(
+    "permits_status_transitions_total", "Permit applications moved to a new status", ["status"],
+)
+PDF_RENDER_SECONDS = Histogram(
+    "pdf_render_seconds", "Time spent rendering a PDF with WeasyPrint", ["document"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+NOTIFICATION_RECIPIENTS = Histogram(
+    "notification_recipients", "Recipients of one notification fan-out", ["kind"],
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 1000),
+)
+NOTIFICATION_SECONDS = Histogram(
+    "notification_fanout_seconds", "Time to store and publish one notification fan-out", ["kind"],
+)
+EMAIL_SECONDS = Histogram(
+    "email_send_seconds", "Time to render and send one templated email", ["template", "outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+THROTTLE_REJECTIONS = Counter(
+    "throttle_rejections_total", "Requests rejected by a rate throttle", ["scope"],
+)
+WEBSOCKET_CONNECTIONS = Counter(
+    "websocket_connections_total", "Websocket connection attempts", ["consumer", "outcome"],
+)
+WEBSOCKET_OPEN = Gauge(
+    "websocket_open_connections", "Websocket connections currently open", ["consumer"],
+    multiprocess_mode="livesum",
+)
+
+
+def mark_process_dead(pid):
+    """For gunicorn's child_exit hook in multiprocess mode."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
+
+
+def collect():
+    """Exposition text for this process, or for every worker in multiprocess mode."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def metrics_view(request):
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if not token:
+        raise Http404
+    scheme, _, supplied = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(supplied.encode(), token.encode()):
+        return HttpResponse(status=401, headers={"WWW-Authenticate": 'Bearer realm="metrics"'})
+    return HttpResponse(collect(), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,170 @@
+"""
+Sampling profiler for individual requests.
+
+When PROFILING_ENABLED is set (it is off by default), staff can profile one request by
+adding ``?profile=1`` or an ``X-Profile: 1`` header. With PROFILING_SAMPLE_EVERY = N,
+about one in N other requests is profiled too. While the request runs, a background
+thread samples the stack of the thread handling it every PROFILING_INTERVAL seconds.
+The result is written to PROFILING_DIR in collapsed-stack format
+(``frame;frame;frame count`` per line), which flamegraph.pl, inferno and speedscope
+read directly. The profile id is returned in the X-Profile-Id header and staff can
+fetch the profile from profile_view. Only the newest PROFILING_MAX_FILES profiles are
+kept.
+
+ProfilingMiddleware is sync-only, so it runs in the same thread as sync views. While it
+is enabled, async views run behind it on that thread too and are not sampled meaningfully.
+"""
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import IsAdminUser
+
+logger = logging.getLogger(__name__)
+
+_PROFILE_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def _short_path(filename):
+    marker = f"site-packages{os.sep}"
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    base = str(settings.BASE_DIR) + os.sep
+    return filename[len(base):] if filename.startswith(base) else filename
+
+
+class StackSampler:
+    """Counts the stacks of one thread, sampled from a background thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def profile_dir():
+    return Path(getattr(settings, "PROFILING_DIR", Path(settings.BASE_DIR) / "logs" / "profiles"))
+
+
+def save_profile(profile_id, sampler):
+    """Write the profile and drop the oldest ones beyond PROFILING_MAX_FILES."""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / f"{profile_id}.folded").write_text(sampler.collapsed())
+
+    keep = getattr(settings, "PROFILING_MAX_FILES", 200)
+    profiles = sorted(directory.glob("*.folded"), key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in profiles[keep:]:
+        path.unlink(missing_ok=True)
+
+
+def _is_staff(request):
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    from users.authentication import CachedJWTCookieAuthentication
+
+    try:
+        result = CachedJWTCookieAuthentication().authenticate(request)
+    except APIException:
+        return False
+    return result is not None and result[0].is_staff
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILING_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.interval = getattr(settings, "PROFILING_INTERVAL", 0.005)
+        self.sample_every = getattr(settings, "PROFILING_SAMPLE_EVERY", 0)
+
+    def __call__(self, request):
+        if request.headers.get("X-Profile") == "1" or request.GET.get("profile") == "1":
+            if not _is_staff(request):
+                return self.get_response(request)
+            reason = "requested"
+        elif self.sample_every > 0 and random.randrange(self.sample_every) == 0:
+            reason = "sampled"
+        else:
+            return self.get_response(request)
+
+        # Always unique server-side, so a client cannot overwrite a stored profile; a valid
+        # X-Request-ID is appended to tie the profile to the request's logs
+        profile_id = uuid.uuid4().hex
+        request_id = request.headers.get("X-Request-ID", "")[:31]
+        if _PROFILE_ID.match(request_id):
+            profile_id = f"{profile_id}-{request_id}"
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.stop()
+        elapsed = time.perf_counter() - started
+
+        try:
+            save_profile(profile_id, sampler)
+        except OSError as e:
+            logger.warning(f"Could not save profile {profile_id}: {str(e)}")
+            return response
+        logger.info(
+            f"Profiled {request.method} {request.path} ({reason}) in {elapsed * 1000:.0f}ms: "
+            f"{sum(sampler.samples.values())} samples, profile {profile_id}"
+        )
+        response["X-Profile-Id"] = profile_id
+        return response
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def profile_view(request, profile_id):
+    """A stored profile in collapsed-stack format."""
+    if not _PROFILE_ID.match(profile_id):
+        raise Http404
+    path = profile_dir() / f"{profile_id}.folded"
+    if not path.is_file():
+        raise Http404
+    return HttpResponse(path.read_text(), content_type="text/plain; charset=utf-8")
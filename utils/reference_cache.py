@@ -0,0 +1,149 @@
+import hashlib
+import json
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from utils.db_routing import replica_reads
+
+# Reference datasets and the models whose changes invalidate them. Coffee prices embed
+# grade details and are scoped by society manager, so those models bump them too.
+INVALIDATED_BY = {
+    'permits.CoffeeGrade': ('grades', 'prices'),
+    'warehouse.Warehouse': ('warehouses',),
+    'societies.Factory': ('factories',),
+    'societies.CoffeePrice': ('prices',),
+    'societies.Society': ('factories', 'prices'),
+}
+
+KEY_PREFIX = 'refdata'
+
+logger = logging.getLogger(__name__)
+
+
+def _version_key(name):
+    return f'{KEY_PREFIX}:version:{name}'
+
+
+def _new_version():
+    # The timestamp tells cached_reference_response how recently the dataset changed
+    return f'{int(time.time())}-{uuid.uuid4().hex}'
+
+
+def _changed_at(version):
+    stamp, sep, _ = version.partition('-')
+    return int(stamp) if sep and stamp.isdigit() else 0
+
+
+def get_versions(names):
+    """Current version token of each dataset, creating one for datasets not seen yet."""
+    keys = [_version_key(name) for name in names]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _new_version(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump_versions(names):
+    try:
+        cache.set_many({_version_key(name): _new_version() for name in names}, None)
+    except Exception as e:
+        # Cached payloads of these datasets stay stale until REFERENCE_DATA_CACHE_TIMEOUT
+        logger.error(f"Failed to bump reference data versions {', '.join(names)}: {str(e)}")
+
+
+def scope_for_user(user):
+    """Cache scope for datasets filtered by society manager; admins see everything."""
+    return 'all' if user.role == 'ADMIN' else f'user:{user.pk}'
+
+
+def cached_reference_response(request, names, scope, build):
+    """
+    Conditional GET for reference data. The ETag is derived from the version of every
+    dataset in ``names`` plus ``scope`` (whatever else the payload depends on, e.g. the
+    user it is filtered for). A matching If-None-Match gets a 304; otherwise the payload
+    comes from the shared cache and ``build`` only runs after a change, reading from
+    the replica unless the change was within DATABASE_REPLICA_LAG seconds. When the
+    cache is unreachable the payload is built on every request and the ETag hashes it.
+    """
+    try:
+        versions = get_versions(names)
+    except Exception as e:
+        # Cache outage: serve the data uncached rather than failing the request
+        logger.error(f"Reference data cache unavailable, building {', '.join(names)} uncached: {str(e)}")
+        return _uncached_reference_response(request, names, build)
+    digest = hashlib.md5(f'{scope}|{"|".join(versions)}'.encode()).hexdigest()
+    etag = quote_etag(f'{"-".join(names)}-{digest}')
+
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        key = f'{KEY_PREFIX}:payload:{digest}'
+        try:
+            data = cache.get(key)
+        except Exception as e:
+            logger.error(f"Failed to read cached reference data {', '.join(names)}: {str(e)}")
+            data = None
+        if data is None:
+            # A replica may not have the latest change yet, and the payload is cached
+            # under the new version for a long time, so fresh changes build from the primary
+            lag = getattr(settings, 'DATABASE_REPLICA_LAG', 10)
+            if time.time() - max(map(_changed_at, versions)) < lag:
+                data = build()
+            else:
+                with replica_reads(request):
+                    data = build()
+            try:
+                cache.set(key, data, getattr(settings, 'REFERENCE_DATA_CACHE_TIMEOUT', 86400))
+            except Exception as e:
+                logger.error(f"Failed to cache reference data {', '.join(names)}: {str(e)}")
+        response = Response(data)
+
+    return _finalize(response, etag)
+
+
+def _uncached_reference_response(request, names, build):
+    # Without version tokens the ETag is a hash of the body itself, built from the primary
+    data = build()
+    body = json.dumps(data, cls=JSONEncoder, sort_keys=True).encode()
+    etag = quote_etag(f'{"-".join(names)}-{hashlib.md5(body).hexdigest()}')
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(data)
+    return _finalize(response, etag)
+
+
+def _finalize(response, etag):
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=getattr(settings, 'REFERENCE_DATA_MAX_AGE', 60))
+    return response
+
+
+def _make_receiver(names):
+    def invalidate(sender, **kwargs):
+        # Bump after commit so a concurrent reader cannot cache pre-commit rows under the new version
+        transaction.on_commit(lambda: bump_versions(names))
+    return invalidate
+
+
+def connect_invalidation(app_label):
+    """Connect the INVALIDATED_BY receivers for one app's models; called from its AppConfig.ready()."""
+    for model, names in INVALIDATED_BY.items():
+        if model.partition('.')[0] != app_label:
+            continue
+        receiver = _make_receiver(names)
+        post_save.connect(receiver, sender=model, weak=False, dispatch_uid=f'refdata-save-{model}')
+        post_delete.connect(receiver, sender=model, weak=False, dispatch_uid=f'refdata-delete-{model}')
@@ -0,0 +1,34 @@
+"""Shared helpers for the apps' test suites."""
+from unittest import mock
+
+from django.test import override_settings
+
+# Keep tests off Redis: local cache, in-memory channel layer, per-process throttle counters
+LOCAL_SERVICES = override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    THROTTLE_REDIS=None,
+)
+
+# channels' database_sync_to_async closes "old" connections before each call, which would
+# close the connection holding a TestCase's transaction
+KEEP_TEST_CONNECTIONS = mock.patch("channels.db.close_old_connections", lambda: None)
+
+
+def client_for(client, user):
+    """Authenticate a test client as ``user`` with a JWT access-token cookie."""
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    client.cookies["access_token"] = str(AccessToken.for_user(user))
+    return client
+
+
+def reset_process_state():
+    """Clear the process-wide user cache, grade registry and revocation filter."""
+    from permits.grades import grade_registry
+    from users.authentication import _user_cache
+    from users.revocation import revocation_list
+
+    _user_cache.clear()
+    grade_registry.invalidate()
+    revocation_list.sync(force_rebuild=True)
@@ -0,0 +1,154 @@
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.throttling import SimpleRateThrottle
+
+from utils.metrics import THROTTLE_REJECTIONS
+
+logger = logging.getLogger(__name__)
+
+# Sliding-window counter: the previous window's count is weighted by how much of it
+# still overlaps the sliding window. Two counters per key, so the cost of a check does
+# not depend on the configured rate. Per-scope allowed/throttled totals are kept in a
+# hash in the same round trip.
+#
+# KEYS[1] current window counter, KEYS[2] previous window counter, KEYS[3] scope stats hash
+# ARGV[1] allowed requests per window, ARGV[2] window length in seconds,
+# ARGV[3] fraction of the current window already elapsed (0..1)
+SLIDING_WINDOW_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local estimated = previous * (1 - tonumber(ARGV[3])) + current
+if estimated + 1 > tonumber(ARGV[1]) then
+    redis.call('HINCRBY', KEYS[3], 'throttled', 1)
+    return {0, previous, current}
+end
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]) * 2)
+redis.call('HINCRBY', KEYS[3], 'allowed', 1)
+return {1, previous, current + 1}
+"""
+
+_client = None
+_script = None
+# After a Redis error, skip Redis until this monotonic time instead of paying a timeout per request
+_retry_after = 0.0
+RETRY_INTERVAL = 30
+
+
+def get_redis_client():
+    """Shared Redis client for throttling, or None when THROTTLE_REDIS is not configured."""
+    global _client, _script
+    if _client is None:
+        options = getattr(settings, 'THROTTLE_REDIS', None)
+        if not options:
+            return None
+        import redis
+        _client = redis.Redis(socket_timeout=0.5, socket_connect_timeout=0.5, **options)
+        _script = _client.register_script(SLIDING_WINDOW_SCRIPT)
+    return _client
+
+
+def _mark_unavailable():
+    global _retry_after
+    _retry_after = time.monotonic() + RETRY_INTERVAL
+
+
+def get_throttle_stats(scopes):
+    """Return {scope: {'allowed': n, 'throttled': n}} for the given throttle scopes."""
+    client = get_redis_client()
+    if client is None:
+        return {}
+    pipe = client.pipeline(transaction=False)
+    for scope in scopes:
+        pipe.hgetall(f'throttle:stats:{scope}')
+    stats = {}
+    for scope, values in zip(scopes, pipe.execute()):
+        stats[scope] = {k.decode(): int(v) for k, v in values.items()}
+    return stats
+
+
+class RedisRateThrottle(SimpleRateThrottle):
+    """
+    Rate throttle whose counters live in Redis and are shared by every worker process.
+    Each check is one atomic script call. If Redis is unavailable or not configured the
+    throttle falls back to DRF's history in a per-process memory cache, not the default
+    cache (which is Redis too). Async views call aallow_request().
+    """
+    scope = 'user'
+    cache = LocMemCache('throttle-fallback', {})
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return f'throttle:{self.scope}:{ident}'
+
+    def allow_request(self, request, view):
+        allowed = self._allow_request(request, view)
+        if not allowed:
+            THROTTLE_REJECTIONS.labels(scope=self.scope).inc()
+        return allowed
+
+    async def aallow_request(self, request, view):
+        """allow_request() for async views; the blocking Redis call runs in a worker thread."""
+        return await sync_to_async(self.allow_request, thread_sensitive=False)(request, view)
+
+    def _allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        client = get_redis_client()
+        if client is None or time.monotonic() < _retry_after:
+            return super().allow_request(request, view)
+
+        now = self.timer()
+        window = int(now // self.duration)
+        elapsed = (now % self.duration) / self.duration
+        try:
+            allowed, previous_count, current_count = _script(
+                keys=[
+                    f'{self.key}:{window}',
+                    f'{self.key}:{window - 1}',
+                    f'throttle:stats:{self.scope}',
+                ],
+                args=[self.num_requests, self.duration, elapsed],
+                client=client,
+            )
+        except Exception as e:
+            _mark_unavailable()
+            logger.warning(f"Redis throttle unavailable, using local cache: {str(e)}")
+            return super().allow_request(request, view)
+        self.elapsed, self.previous_count, self.current_count = elapsed, previous_count, current_count
+
+        if not allowed:
+            logger.info(f"Throttled request for {self.key}")
+        return bool(allowed)
+
+    def wait(self):
+        if not hasattr(self, 'elapsed'):
+            return super().wait()
+        # Time until the weighted previous window has decayed enough to admit one request
+        remaining = (1 - self.elapsed) * self.duration
+        if self.previous_count and self.current_count < self.num_requests:
+            needed = (self.previous_count * (1 - self.elapsed) + self.current_count + 1 - self.num_requests)
+            return max(0.0, min(remaining, needed / self.previous_count * self.duration))
+        return remaining
+
+
+class RedisAnonRateThrottle(RedisRateThrottle):
+    """Redis-backed throttle that always keys by client address."""
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None  # Only throttle unauthenticated requests.
+        return f'throttle:{self.scope}:{self.get_ident(request)}'
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class WarehouseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'warehouse'
+
+    def ready(self):
+        from utils.reference_cache import connect_invalidation
+
+        connect_invalidation(self.label)
@@ -5,6 +5,7 @@ from rest_framework.response import Response
 from .models import Warehouse
 from .serializers import WarehouseSerializer
 from rest_framework.decorators import action
+from utils.reference_cache import cached_reference_response
 
 
 class WarehouseViewSet(viewsets.ModelViewSet):
@@ -32,6 +33,7 @@ class WarehouseViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def active_warehouses(self, request):
         """Get only active warehouses for permit applications"""
-        queryset = self.get_queryset().filter(is_active=True)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return cached_reference_response(
+            request, ['warehouses'], 'all',
+            lambda: self.get_serializer(self.get_queryset().filter(is_active=True), many=True).data,
+        )